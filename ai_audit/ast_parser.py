@@ -1,22 +1,37 @@
 """
 ASTパーサー: Python / JavaScript / TypeScript / Dart ソースコードを関数・クラス単位にチャンク化する
+
+analyze_file() はファイルを1回だけ読み込み・解析して、チャンク・スケルトン・
+import 一覧・シンボル表をまとめて返す。parse_chunks() / generate_skeleton() は
+その一部を返す薄いラッパー。
 """
 import ast
 import fnmatch
+import functools
 import os
-from typing import Generator
+import re
+import threading
+from typing import Generator, Iterable
 
+# Python 拡張子セット
+_PY_EXTENSIONS = {".py"}
 # JS/TS 拡張子セット
 _JS_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx"}
 # Dart 拡張子セット
 _DART_EXTENSIONS = {".dart"}
+# スキャン対象の全拡張子
+_SOURCE_EXTENSIONS = _PY_EXTENSIONS | _JS_EXTENSIONS | _DART_EXTENSIONS
 # 除外ディレクトリ
 _EXCLUDE_DIRS = {"__pycache__", ".venv", "venv", ".git", "node_modules", "dist", "build", ".next"}
 
 # ---------------------------------------------------------------------------
-# .aiauditignore サポート
+# .aiauditignore / .gitignore サポート
 # ---------------------------------------------------------------------------
 
+# ディレクトリごとに読み込む除外設定ファイル（同じディレクトリでは先の方が優先）
+_IGNORE_FILES = (".aiauditignore", ".gitignore")
+
+
 def load_aiauditignore(directory: str) -> list[str]:
     """
     指定ディレクトリの .aiauditignore ファイルを読み込み、パターンリストを返す。
@@ -27,23 +42,11 @@ def load_aiauditignore(directory: str) -> list[str]:
       - 空行は無視
       - * はファイル名内の任意の文字列にマッチ
       - ** はディレクトリ区切りを含む任意のパスにマッチ
-      - 末尾の / はディレクトリのみをマッチ（現実装では / を除いたパターンとして扱う）
+      - 末尾の / はディレクトリのみをマッチ（このリストでは / を除いたパターンとして扱う）
+      - 先頭の ! は除外の取り消し（スキャン時のみ有効。このリストには含めない）
     """
     ignore_path = os.path.join(os.path.abspath(directory), ".aiauditignore")
-    if not os.path.exists(ignore_path):
-        return []
-    patterns = []
-    try:
-        with open(ignore_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.rstrip("\n\r")
-                if line.startswith("#") or not line.strip():
-                    continue
-                # 末尾スラッシュはディレクトリ指定なので除去してパターンとして使用
-                patterns.append(line.rstrip("/"))
-    except OSError:
-        pass
-    return patterns
+    return [p.rstrip("/") for p in _read_ignore_file(ignore_path) if not p.startswith("!")]
 
 
 def is_ignored(file_path: str, root_dir: str, patterns: list[str]) -> bool:
@@ -76,10 +79,297 @@ def is_ignored(file_path: str, root_dir: str, patterns: list[str]) -> bool:
     return False
 
 
+def _read_ignore_file(ignore_path: str) -> list[str]:
+    """除外設定ファイルのパターン行を返す（コメント・空行を除く。末尾の / と先頭の ! は残す）。"""
+    patterns = []
+    try:
+        with open(ignore_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n\r")
+                if line.startswith("#") or not line.strip():
+                    continue
+                patterns.append(line.rstrip())
+    except OSError:
+        pass
+    return patterns
+
+
+def _compile_ignore(patterns: list[str]) -> tuple | None:
+    """
+    .gitignore 形式のパターンリストを、1回のマッチで判定できる正規表現にまとめる。
+
+    パターンは後に書かれたものほど優先されるため、逆順に並べた選択肢の
+    最初にマッチしたもの（= 元の順で最後にマッチしたもの）を採用する。
+    ! で始まるパターンにマッチした場合は除外を取り消す。
+
+    Returns:
+        (ディレクトリ用の正規表現, ファイル用の正規表現, 除外取り消しのグループ名の集合)
+        パターンがない場合は None
+    """
+    dir_parts: list[str] = []
+    file_parts: list[str] = []
+    negated: set[str] = set()
+    for i, pattern in reversed(list(enumerate(patterns))):
+        negate = pattern.startswith("!")
+        if negate:
+            pattern = pattern[1:]
+        elif pattern.startswith("\\"):
+            # \# や \! で始まるパターンは先頭文字そのもの
+            pattern = pattern[1:]
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if not pattern:
+            continue
+        # 途中に / を含むパターンは設定ファイルのあるディレクトリからの相対パス、
+        # 含まないパターンは任意の階層のファイル名・ディレクトリ名にマッチする
+        if "/" in pattern:
+            body = _glob_to_regex(pattern.lstrip("/"))
+        else:
+            body = "(?:.*/)?" + _glob_to_regex(pattern)
+        group = f"p{i}"
+        part = f"(?P<{group}>{body})"
+        if negate:
+            negated.add(group)
+        dir_parts.append(part)
+        if not dir_only:
+            file_parts.append(part)
+    if not dir_parts:
+        return None
+    dir_re = re.compile("|".join(dir_parts), re.DOTALL)
+    file_re = re.compile("|".join(file_parts), re.DOTALL) if file_parts else None
+    return dir_re, file_re, negated
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """.gitignore 形式のパターン（/ を含むパス全体）を正規表現に変換する。"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                i += 2
+                if pattern.startswith("/", i):
+                    # a/**/b → a/b, a/x/b, a/x/y/b
+                    out.append("(?:.*/)?")
+                    i += 1
+                else:
+                    out.append(".*")
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def _load_dir_rules(dir_path: str) -> list[tuple]:
+    """ディレクトリ直下の除外設定ファイルを読み込み、コンパイル済みのルールを優先度の低い順に返す。"""
+    rules = []
+    for name in reversed(_IGNORE_FILES):
+        compiled = _compile_ignore(_read_ignore_file(os.path.join(dir_path, name)))
+        if compiled is not None:
+            rules.append(compiled)
+    return rules
+
+
+def _match_ignore(rules: list[tuple], rel: str, is_dir: bool) -> bool:
+    """
+    スキャン中のエントリが除外対象かを返す。
+
+    Args:
+        rules:  (ルールのあるディレクトリの相対パス, コンパイル済みルール) のリスト（浅い順）
+        rel:    スキャンルートからの相対パス（/ 区切り）
+        is_dir: ディレクトリなら True（末尾 / のパターンはディレクトリにだけマッチする）
+    """
+    # 深いディレクトリの設定ほど優先する。どれにもマッチしなければ除外しない
+    for base, (dir_re, file_re, negated) in reversed(rules):
+        regex = dir_re if is_dir else file_re
+        if regex is None:
+            continue
+        m = regex.fullmatch(rel, len(base))
+        if m is not None:
+            return m.lastgroup not in negated
+    return False
+
+
+def _scan(directory: str, extensions: set[str]) -> Generator[str, None, None]:
+    """
+    ディレクトリを os.scandir で再帰スキャンし、拡張子が extensions に含まれるファイルを返す。
+
+    _EXCLUDE_DIRS と除外設定にマッチしたディレクトリには降りない。
+    各ディレクトリの .aiauditignore / .gitignore はそのディレクトリ以下に適用される。
+    ディレクトリ内ではファイル（名前順）を先に返し、その後サブディレクトリを名前順にたどる。
+    """
+    abs_dir = os.path.abspath(directory)
+    # (ディレクトリの絶対パス, ルートからの相対パス（末尾 /）, 親から引き継いだルール)
+    stack = [(abs_dir, "", [])]
+    while stack:
+        dir_path, rel_dir, rules = stack.pop()
+        local = _load_dir_rules(dir_path)
+        if local:
+            rules = rules + [(rel_dir, compiled) for compiled in local]
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                # os.walk と同じくシンボリックリンクのディレクトリはたどらない
+                if name in _EXCLUDE_DIRS or entry.is_symlink():
+                    continue
+                rel = rel_dir + name
+                if rules and _match_ignore(rules, rel, True):
+                    continue
+                subdirs.append((entry.path, rel + "/", rules))
+            elif os.path.splitext(name)[1].lower() in extensions:
+                if rules and _match_ignore(rules, rel_dir + name, False):
+                    continue
+                yield entry.path
+        stack.extend(reversed(subdirs))
+
+
+def select_source_files(directory: str, rel_paths: Iterable[str]) -> list[str]:
+    """
+    directory からの相対パスのリストのうち、スキャン対象となるソースファイルを返す。
+
+    scan_source_files() と同じ除外ルール（_EXCLUDE_DIRS・各階層の .aiauditignore / .gitignore）を
+    ファイルの親ディレクトリだけに適用するため、ディレクトリツリー全体は走査しない。
+    存在しないファイル（削除済みなど）は除く。
+
+    Args:
+        directory: 基準ディレクトリ
+        rel_paths: directory からの相対パス（/ 区切り）
+
+    Returns:
+        対象ファイルの絶対パスのリスト（相対パスの名前順）
+    """
+    abs_dir = os.path.abspath(directory)
+    # 相対ディレクトリパス（末尾 /）→ そこまでに適用されるルール（除外されたディレクトリは None）
+    dir_rules: dict[str, list[tuple] | None] = {"": [("", r) for r in _load_dir_rules(abs_dir)]}
+
+    def _rules_for(rel_dir: str) -> list[tuple] | None:
+        if rel_dir in dir_rules:
+            return dir_rules[rel_dir]
+        parent, _, name = rel_dir[:-1].rpartition("/")
+        parent = parent + "/" if parent else ""
+        rules = _rules_for(parent)
+        if rules is not None:
+            if name in _EXCLUDE_DIRS or (rules and _match_ignore(rules, rel_dir[:-1], True)):
+                rules = None
+            else:
+                local = _load_dir_rules(os.path.join(abs_dir, rel_dir))
+                rules = rules + [(rel_dir, compiled) for compiled in local]
+        dir_rules[rel_dir] = rules
+        return rules
+
+    selected = []
+    for rel in sorted(set(rel_paths)):
+        rel_dir, _, name = rel.rpartition("/")
+        if os.path.splitext(name)[1].lower() not in _SOURCE_EXTENSIONS:
+            continue
+        rules = _rules_for(rel_dir + "/" if rel_dir else "")
+        if rules is None or (rules and _match_ignore(rules, rel, False)):
+            continue
+        full_path = os.path.join(abs_dir, *rel.split("/"))
+        if os.path.isfile(full_path):
+            selected.append(full_path)
+    return selected
+
+
 # ---------------------------------------------------------------------------
 # 公開API（拡張子で自動振り分け）
 # ---------------------------------------------------------------------------
 
+def analyze_file(file_path: str, include_skeleton: bool = True, data: bytes | None = None) -> dict:
+    """
+    ソースファイルを1回だけ読み込み・解析し、チャンク・スケルトン・import・シンボルを返す。
+    拡張子に応じて Python / JS/TS / Dart パーサーを自動選択する。
+
+    Args:
+        file_path:        解析対象ファイルパス（.py / .js / .ts / .jsx / .tsx / .dart）
+        include_skeleton: False の場合はスケルトンを生成しない（"skeleton" は空文字列）
+        data:             読み込み済みのファイル内容（バイト列）。指定した場合はファイルを読まずに
+                          これを解析する（内容のハッシュと解析結果を同じ内容から得るため）
+
+    Returns:
+        解析結果の辞書:
+          - path:     ファイルの絶対パス
+          - lang:     "python" / "javascript" / "typescript" / "dart"
+          - chunks:   parse_chunks() と同形式のチャンクリスト
+          - skeleton: generate_skeleton() と同形式のスケルトンコード
+          - imports:  import しているモジュール名のリスト（記述順・重複なし）
+          - symbols:  定義シンボルのリスト。各辞書は name / type / lineno を持つ
+                      （type は "function" / "class" / "method"）
+        パースエラーやパーサー未インストールの場合は各項目が空になる
+    """
+    abs_path = os.path.abspath(file_path)
+    ext = os.path.splitext(abs_path)[1].lower()
+    if ext in _JS_EXTENSIONS:
+        return _analyze_js(abs_path, include_skeleton, data)
+    if ext in _DART_EXTENSIONS:
+        return _analyze_dart(abs_path, include_skeleton, data)
+    return _analyze_python(abs_path, include_skeleton, data)
+
+
+def _empty_analysis(abs_path: str) -> dict:
+    return {
+        "path": abs_path,
+        "lang": get_lang(abs_path),
+        "chunks": [],
+        "skeleton": "",
+        "imports": [],
+        "symbols": [],
+    }
+
+
+def _read_source(abs_path: str, data: bytes | None = None) -> str:
+    """
+    ソースファイルを読み込む（UTF-8 で読めない場合は latin-1）。
+    data を指定した場合はファイルを読まず、同じ規則で文字列にする（改行は LF にそろえる）。
+    """
+    if data is not None:
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            text = data.decode("latin-1")
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+    try:
+        with open(abs_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(abs_path, "r", encoding="latin-1") as f:
+            return f.read()
+
+
+def _chunk_symbols(chunks: list[dict]) -> list[dict]:
+    """チャンクリストからシンボル表を作る（JS/TS・Dart 用）。"""
+    return [{"name": c["name"], "type": c["type"], "lineno": c["lineno"]} for c in chunks]
+
+
 def parse_chunks(file_path: str) -> list[dict]:
     """
     ソースファイルを解析し、関数・クラス単位のチャンクリストを返す。
@@ -97,12 +387,7 @@ def parse_chunks(file_path: str) -> list[dict]:
           - lineno: int    開始行番号
           - lang: str      "python" / "javascript" / "typescript" / "dart"
     """
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext in _JS_EXTENSIONS:
-        return parse_chunks_js(file_path)
-    if ext in _DART_EXTENSIONS:
-        return parse_chunks_dart(file_path)
-    return _parse_chunks_python(file_path)
+    return analyze_file(file_path, include_skeleton=False)["chunks"]
 
 
 def generate_skeleton(file_path: str) -> str:
@@ -117,18 +402,13 @@ def generate_skeleton(file_path: str) -> str:
         スケルトンコード文字列（実装ブロック除去済み）
         パースエラーの場合は空文字列
     """
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext in _JS_EXTENSIONS:
-        return generate_skeleton_js(file_path)
-    if ext in _DART_EXTENSIONS:
-        return generate_skeleton_dart(file_path)
-    return _generate_skeleton_python(file_path)
+    return analyze_file(file_path)["skeleton"]
 
 
 def scan_python_files(directory: str) -> Generator[str, None, None]:
     """
     ディレクトリを再帰スキャンしてPythonファイルのパスを返す（後方互換維持）。
-    .aiauditignore が存在する場合はそのパターンに従って除外する。
+    .aiauditignore / .gitignore が存在する場合はそのパターンに従って除外する。
 
     Args:
         directory: スキャン対象ディレクトリ
@@ -136,21 +416,13 @@ def scan_python_files(directory: str) -> Generator[str, None, None]:
     Yields:
         Pythonファイルの絶対パス
     """
-    abs_dir = os.path.abspath(directory)
-    patterns = load_aiauditignore(abs_dir)
-    for root, dirs, files in os.walk(abs_dir):
-        dirs[:] = [d for d in dirs if d not in _EXCLUDE_DIRS]
-        for filename in files:
-            if filename.endswith(".py"):
-                full_path = os.path.join(root, filename)
-                if not is_ignored(full_path, abs_dir, patterns):
-                    yield full_path
+    return _scan(directory, _PY_EXTENSIONS)
 
 
 def scan_js_files(directory: str) -> Generator[str, None, None]:
     """
     ディレクトリを再帰スキャンしてJS/TSファイルのパスを返す。
-    .aiauditignore が存在する場合はそのパターンに従って除外する。
+    .aiauditignore / .gitignore が存在する場合はそのパターンに従って除外する。
 
     Args:
         directory: スキャン対象ディレクトリ
@@ -158,21 +430,13 @@ def scan_js_files(directory: str) -> Generator[str, None, None]:
     Yields:
         JS/TSファイルの絶対パス（.js / .jsx / .ts / .tsx）
     """
-    abs_dir = os.path.abspath(directory)
-    patterns = load_aiauditignore(abs_dir)
-    for root, dirs, files in os.walk(abs_dir):
-        dirs[:] = [d for d in dirs if d not in _EXCLUDE_DIRS]
-        for filename in files:
-            if os.path.splitext(filename)[1].lower() in _JS_EXTENSIONS:
-                full_path = os.path.join(root, filename)
-                if not is_ignored(full_path, abs_dir, patterns):
-                    yield full_path
+    return _scan(directory, _JS_EXTENSIONS)
 
 
 def scan_source_files(directory: str) -> Generator[str, None, None]:
     """
     ディレクトリを再帰スキャンしてPython・JS/TS・Dartファイルのパスを返す。
-    .aiauditignore が存在する場合はそのパターンに従って除外する。
+    .aiauditignore / .gitignore が存在する場合はそのパターンに従って除外する。
 
     Args:
         directory: スキャン対象ディレクトリ
@@ -180,16 +444,7 @@ def scan_source_files(directory: str) -> Generator[str, None, None]:
     Yields:
         ソースファイルの絶対パス（.py / .js / .jsx / .ts / .tsx / .dart）
     """
-    abs_dir = os.path.abspath(directory)
-    patterns = load_aiauditignore(abs_dir)
-    for root, dirs, files in os.walk(abs_dir):
-        dirs[:] = [d for d in dirs if d not in _EXCLUDE_DIRS]
-        for filename in files:
-            ext = os.path.splitext(filename)[1].lower()
-            if ext == ".py" or ext in _JS_EXTENSIONS or ext in _DART_EXTENSIONS:
-                full_path = os.path.join(root, filename)
-                if not is_ignored(full_path, abs_dir, patterns):
-                    yield full_path
+    return _scan(directory, _SOURCE_EXTENSIONS)
 
 
 def get_lang(file_path: str) -> str:
@@ -208,27 +463,41 @@ def get_lang(file_path: str) -> str:
 # Python パーサー（既存実装）
 # ---------------------------------------------------------------------------
 
-def _parse_chunks_python(file_path: str) -> list[dict]:
-    """Pythonファイルを解析し、関数・クラス単位のチャンクリストを返す。"""
-    abs_path = os.path.abspath(file_path)
-
-    try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            source = f.read()
-    except UnicodeDecodeError:
-        with open(abs_path, "r", encoding="latin-1") as f:
-            source = f.read()
-
+def _analyze_python(abs_path: str, include_skeleton: bool, data: bytes | None = None) -> dict:
+    """Pythonファイルを1回の ast.parse で解析する（analyze_file() の Python 実装）。"""
+    source = _read_source(abs_path, data)
+    result = _empty_analysis(abs_path)
     try:
         tree = ast.parse(source, filename=abs_path)
     except SyntaxError:
-        return []
+        return result
 
-    chunks = []
     source_lines = source.splitlines(keepends=True)
+    result["chunks"], result["imports"] = _collect_python_chunks(tree, source_lines, abs_path)
+    result["symbols"] = _collect_python_symbols(tree)
+    if include_skeleton:
+        # スケルトン化はASTを書き換えるため、他の情報を集めた後に行う
+        result["skeleton"] = _skeleton_from_tree(tree)
+    return result
+
 
+def _collect_python_chunks(
+    tree: ast.AST,
+    source_lines: list[str],
+    abs_path: str,
+) -> tuple[list[dict], list[str]]:
+    """
+    ASTを1回走査し、関数・クラス単位のチャンク（ネストした定義も含む）と
+    import しているモジュール名（記述順・重複なし。相対importは先頭に .）を収集する。
+    """
+    chunks = []
+    imports: list[tuple[int, str]] = []
     for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        if isinstance(node, ast.Import):
+            imports.extend((node.lineno, alias.name) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.append((node.lineno, "." * node.level + (node.module or "")))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
             code = _extract_source_python(source_lines, node)
             if code:
                 chunks.append({
@@ -252,7 +521,31 @@ def _parse_chunks_python(file_path: str) -> list[dict]:
                 })
 
     chunks.sort(key=lambda c: c["lineno"])
-    return chunks
+    imports.sort(key=lambda item: item[0])
+    return chunks, list(dict.fromkeys(name for _, name in imports))
+
+
+def _collect_python_symbols(tree: ast.Module) -> list[dict]:
+    """モジュール直下の関数・クラスと、クラス直下のメソッド（Class.method）を返す。"""
+    symbols = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append({"name": node.name, "type": "function", "lineno": node.lineno})
+        elif isinstance(node, ast.ClassDef):
+            symbols.append({"name": node.name, "type": "class", "lineno": node.lineno})
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    symbols.append({
+                        "name": f"{node.name}.{item.name}",
+                        "type": "method",
+                        "lineno": item.lineno,
+                    })
+    return symbols
+
+
+def _parse_chunks_python(file_path: str) -> list[dict]:
+    """Pythonファイルを解析し、関数・クラス単位のチャンクリストを返す。"""
+    return _analyze_python(os.path.abspath(file_path), include_skeleton=False)["chunks"]
 
 
 def _extract_source_python(source_lines: list[str], node: ast.AST) -> str:
@@ -303,19 +596,11 @@ def _generate_skeleton_python(file_path: str) -> str:
         スケルトンコード文字列（実装ブロック除去済み）
         パースエラーの場合は空文字列
     """
-    abs_path = os.path.abspath(file_path)
-    try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            source = f.read()
-    except UnicodeDecodeError:
-        with open(abs_path, "r", encoding="latin-1") as f:
-            source = f.read()
+    return _analyze_python(os.path.abspath(file_path), include_skeleton=True)["skeleton"]
 
-    try:
-        tree = ast.parse(source, filename=abs_path)
-    except SyntaxError:
-        return ""
 
+def _skeleton_from_tree(tree: ast.AST) -> str:
+    """ASTをスケルトンに変換して文字列にする（tree は書き換えられる）。"""
     transformer = _SkeletonTransformer()
     skeleton_tree = transformer.visit(tree)
     ast.fix_missing_locations(skeleton_tree)
@@ -330,61 +615,118 @@ def _generate_skeleton_python(file_path: str) -> str:
 # JS/TS パーサー（tree-sitter）
 # ---------------------------------------------------------------------------
 
-def _get_js_parser(file_path: str):
+# tree-sitter の Parser はスレッド間で共有できないため、スレッドごとに文法別の Parser を保持する
+_ts_local = threading.local()
+
+
+def _thread_parser(grammar: str, factory):
+    """
+    呼び出しスレッド用の Parser を返す（文法ごとに初回のみ factory() で生成する）。
+    factory() が None を返した場合（未インストール）もその結果を使い回す。
+    """
+    parsers = getattr(_ts_local, "parsers", None)
+    if parsers is None:
+        parsers = _ts_local.parsers = {}
+    if grammar not in parsers:
+        parsers[grammar] = factory()
+    return parsers[grammar]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_js_language(grammar: str):
     """
-    ファイルの拡張子に応じた tree-sitter Parser を返す。
-    tree-sitter が未インストールの場合は None を返す。
+    JS/TS の tree-sitter Language を返す（プロセス内で文法ごとに1回だけ読み込む）。
+    grammar は "javascript" / "typescript" / "tsx"。未インストールの場合は None を返す。
     """
     try:
         import tree_sitter_javascript as tsjs
         import tree_sitter_typescript as tsts
-        from tree_sitter import Language, Parser as TSParser
+        from tree_sitter import Language
     except ImportError:
-        return None, None
+        return None
+
+    if grammar == "typescript":
+        return Language(tsts.language_typescript())
+    if grammar == "tsx":
+        return Language(tsts.language_tsx())
+    return Language(tsjs.language())
+
 
+def _get_js_parser(file_path: str):
+    """
+    ファイルの拡張子に応じた tree-sitter Parser と Language を返す。
+    tree-sitter が未インストールの場合は (None, None) を返す。
+    """
     ext = os.path.splitext(file_path)[1].lower()
-    if ext in (".ts",):
-        lang = Language(tsts.language_typescript())
-    elif ext in (".tsx",):
-        lang = Language(tsts.language_tsx())
+    if ext == ".ts":
+        grammar = "typescript"
+    elif ext == ".tsx":
+        grammar = "tsx"
     else:
         # .js / .jsx
-        lang = Language(tsjs.language())
+        grammar = "javascript"
 
-    return TSParser(lang), lang
+    lang = _get_js_language(grammar)
+    if lang is None:
+        return None, None
 
+    def _new_parser():
+        from tree_sitter import Parser as TSParser
+        return TSParser(lang)
 
-def parse_chunks_js(file_path: str) -> list[dict]:
-    """
-    JS/TSファイルを解析し、関数・クラス・アロー関数・メソッド単位のチャンクリストを返す。
+    return _thread_parser(grammar, _new_parser), lang
 
-    Args:
-        file_path: 解析対象のJS/TSファイルパス
 
-    Returns:
-        チャンクの辞書リスト（parse_chunks と同形式）
-    """
-    abs_path = os.path.abspath(file_path)
+def _analyze_js(abs_path: str, include_skeleton: bool, data: bytes | None = None) -> dict:
+    """JS/TSファイルを1回の tree-sitter 解析で処理する（analyze_file() の JS/TS 実装）。"""
+    result = _empty_analysis(abs_path)
     parser, _ = _get_js_parser(abs_path)
     if parser is None:
-        return []
-
-    try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            source = f.read()
-    except UnicodeDecodeError:
-        with open(abs_path, "r", encoding="latin-1") as f:
-            source = f.read()
+        return result
 
+    source = _read_source(abs_path, data)
     source_bytes = source.encode("utf-8")
     tree = parser.parse(source_bytes)
     source_lines = source.splitlines(keepends=True)
-    lang = get_lang(abs_path)
 
-    chunks = []
-    _collect_js_chunks(tree.root_node, source_bytes, source_lines, abs_path, lang, chunks)
+    chunks: list[dict] = []
+    _collect_js_chunks(tree.root_node, source_bytes, source_lines, abs_path, result["lang"], chunks)
     chunks.sort(key=lambda c: c["lineno"])
-    return chunks
+    result["chunks"] = chunks
+    result["imports"] = _collect_js_imports(tree.root_node, source_bytes)
+    result["symbols"] = _chunk_symbols(chunks)
+
+    if include_skeleton:
+        skeleton_lines = list(source_lines)  # コピー
+        _strip_js_function_bodies(tree.root_node, source_bytes, skeleton_lines)
+        result["skeleton"] = "".join(skeleton_lines)
+    return result
+
+
+def _collect_js_imports(root, source_bytes: bytes) -> list[str]:
+    """トップレベルの import 文（import ... from "x"）の読み込み元を記述順・重複なしで返す。"""
+    imports: list[str] = []
+    for node in root.children:
+        if node.type != "import_statement":
+            continue
+        source_node = node.child_by_field_name("source")
+        if source_node is not None:
+            text = source_bytes[source_node.start_byte:source_node.end_byte].decode("utf-8")
+            imports.append(text.strip("'\"`"))
+    return list(dict.fromkeys(imports))
+
+
+def parse_chunks_js(file_path: str) -> list[dict]:
+    """
+    JS/TSファイルを解析し、関数・クラス・アロー関数・メソッド単位のチャンクリストを返す。
+
+    Args:
+        file_path: 解析対象のJS/TSファイルパス
+
+    Returns:
+        チャンクの辞書リスト（parse_chunks と同形式）
+    """
+    return _analyze_js(os.path.abspath(file_path), include_skeleton=False)["chunks"]
 
 
 def _collect_js_chunks(
@@ -511,26 +853,7 @@ def generate_skeleton_js(file_path: str) -> str:
         スケルトンコード文字列
         パースエラーまたは tree-sitter 未インストールの場合は空文字列
     """
-    abs_path = os.path.abspath(file_path)
-    parser, _ = _get_js_parser(abs_path)
-    if parser is None:
-        return ""
-
-    try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            source = f.read()
-    except UnicodeDecodeError:
-        with open(abs_path, "r", encoding="latin-1") as f:
-            source = f.read()
-
-    source_bytes = source.encode("utf-8")
-    tree = parser.parse(source_bytes)
-    source_lines = source.splitlines(keepends=True)
-
-    skeleton_lines = list(source_lines)  # コピー
-    _strip_js_function_bodies(tree.root_node, source_bytes, skeleton_lines)
-
-    return "".join(skeleton_lines)
+    return _analyze_js(os.path.abspath(file_path), include_skeleton=True)["skeleton"]
 
 
 def _strip_js_function_bodies(node, source_bytes: bytes, skeleton_lines: list[str]) -> None:
@@ -593,9 +916,13 @@ def _replace_block_with_stub(block_node, skeleton_lines: list[str]) -> None:
 
 def _get_dart_parser():
     """
-    tree-sitter-language-pack から Dart パーサーを返す。
+    tree-sitter-language-pack から Dart パーサーを返す（スレッドごとに初回のみ生成）。
     未インストールの場合は None を返す。
     """
+    return _thread_parser("dart", _new_dart_parser)
+
+
+def _new_dart_parser():
     try:
         from tree_sitter_language_pack import get_parser
         return get_parser("dart")
@@ -603,36 +930,47 @@ def _get_dart_parser():
         return None
 
 
-def parse_chunks_dart(file_path: str) -> list[dict]:
-    """
-    Dartファイルを解析し、クラス・トップレベル関数単位のチャンクリストを返す。
+# Dart の import / export 文（import 'package:x/y.dart' as z; 等）
+_DART_IMPORT_RE = re.compile(r"""^\s*(?:import|export)\s+['"]([^'"]+)['"]""", re.MULTILINE)
 
-    Args:
-        file_path: 解析対象の Dart ファイルパス
 
-    Returns:
-        チャンクの辞書リスト（parse_chunks と同形式）
-    """
-    abs_path = os.path.abspath(file_path)
+def _analyze_dart(abs_path: str, include_skeleton: bool, data: bytes | None = None) -> dict:
+    """Dartファイルを1回の tree-sitter 解析で処理する（analyze_file() の Dart 実装）。"""
+    result = _empty_analysis(abs_path)
     parser = _get_dart_parser()
     if parser is None:
-        return []
-
-    try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            source = f.read()
-    except UnicodeDecodeError:
-        with open(abs_path, "r", encoding="latin-1") as f:
-            source = f.read()
+        return result
 
+    source = _read_source(abs_path, data)
     source_bytes = source.encode("utf-8")
     tree = parser.parse(source_bytes)
     source_lines = source.splitlines(keepends=True)
 
-    chunks = []
+    chunks: list[dict] = []
     _collect_dart_chunks(tree.root_node, source_bytes, source_lines, abs_path, chunks)
     chunks.sort(key=lambda c: c["lineno"])
-    return chunks
+    result["chunks"] = chunks
+    result["imports"] = list(dict.fromkeys(_DART_IMPORT_RE.findall(source)))
+    result["symbols"] = _chunk_symbols(chunks)
+
+    if include_skeleton:
+        skeleton_lines = list(source_lines)
+        _strip_dart_function_bodies(tree.root_node, source_bytes, skeleton_lines)
+        result["skeleton"] = "".join(skeleton_lines)
+    return result
+
+
+def parse_chunks_dart(file_path: str) -> list[dict]:
+    """
+    Dartファイルを解析し、クラス・トップレベル関数単位のチャンクリストを返す。
+
+    Args:
+        file_path: 解析対象の Dart ファイルパス
+
+    Returns:
+        チャンクの辞書リスト（parse_chunks と同形式）
+    """
+    return _analyze_dart(os.path.abspath(file_path), include_skeleton=False)["chunks"]
 
 
 def _collect_dart_chunks(node, source_bytes, source_lines, abs_path, chunks):
@@ -706,26 +1044,7 @@ def generate_skeleton_dart(file_path: str) -> str:
         スケルトンコード文字列
         パースエラーまたは未インストールの場合は空文字列
     """
-    abs_path = os.path.abspath(file_path)
-    parser = _get_dart_parser()
-    if parser is None:
-        return ""
-
-    try:
-        with open(abs_path, "r", encoding="utf-8") as f:
-            source = f.read()
-    except UnicodeDecodeError:
-        with open(abs_path, "r", encoding="latin-1") as f:
-            source = f.read()
-
-    source_bytes = source.encode("utf-8")
-    tree = parser.parse(source_bytes)
-    source_lines = source.splitlines(keepends=True)
-
-    skeleton_lines = list(source_lines)
-    _strip_dart_function_bodies(tree.root_node, source_bytes, skeleton_lines)
-
-    return "".join(skeleton_lines)
+    return _analyze_dart(os.path.abspath(file_path), include_skeleton=True)["skeleton"]
 
 
 def _strip_dart_function_bodies(node, source_bytes: bytes, skeleton_lines: list[str]) -> None:
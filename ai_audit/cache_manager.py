@@ -2,39 +2,145 @@
 キャッシュマネージャー: SQLiteによるチャンクハッシュ管理と監査結果の永続化
 
 DBの保存先: AI_AUDIT_DATA_DIR 環境変数（デフォルト: ~/.ai_audit/cache.db）
+
+テーブル:
+  chunk_cache        : チャンクIDごとのコードハッシュ（旧形式の変更検知。後方互換のため残す）
+  audit_cache        : チャンクID × ウェアごとの監査フィンガープリント
+                       （コードハッシュ・モデル名・ウェアプロンプトのハッシュから算出）
+  audit_results      : 監査結果（チャンクID × ウェア）
+  llm_response_cache : LLMレスポンスのコンテンツアドレス型キャッシュ
+                       （モデル名・ウェア・JSONモード・プロンプト全体のSHA-256 をキーにする）
+  file_cache         : ファイルごとのサイズ・更新時刻・内容ハッシュ（parse_cache が利用する）
+  parse_results      : 解析結果（チャンクリスト・スケルトン）。ファイル内容のハッシュをキーにし、
+                       最終使用日時の古い順に削除する（LRU）
+
+接続管理:
+  接続はスレッドごとに1本を開いたまま使い回す（監査ワーカーからの同時利用に対応）。
+  WALモード・synchronous=NORMAL・大きめのページキャッシュを設定し、SQL文は
+  sqlite3 の文キャッシュで再利用される。複数の書き込みを1コミットにまとめたい場合は
+  transaction() の中で各関数を呼ぶ。
 """
 import hashlib
 import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
 
-from dotenv import load_dotenv
-
-load_dotenv()
+from .config_manager import load_env
 
 
 def _get_db_path() -> str:
+    load_env()
     data_dir_raw = os.getenv("AI_AUDIT_DATA_DIR", "~/.ai_audit")
     data_dir = Path(data_dir_raw).expanduser()
     data_dir.mkdir(parents=True, exist_ok=True)
     return str(data_dir / "cache.db")
 
 
+# ロック待ちの上限（秒）。WALでも書き込みは同時に1つのため、他スレッドのコミットを待つ
+_BUSY_TIMEOUT = 30.0
+# ページキャッシュ（負値はKiB単位）と、接続ごとに保持するSQL文キャッシュの数
+_CACHE_SIZE_KIB = 20000
+_CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_paths: set[str] = set()
+
+
 def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(_get_db_path())
+    """
+    呼び出しスレッド用の接続を返す（初回のみ開いて、以降は使い回す）。
+    AI_AUDIT_DATA_DIR が変わった場合は開き直す。
+    """
+    db_path = _get_db_path()
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == db_path:
+        return conn
+    if conn is not None:
+        conn.close()
+
+    conn = sqlite3.connect(db_path, timeout=_BUSY_TIMEOUT, cached_statements=_CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{_CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    _local.conn = conn
+    _local.path = db_path
+    _local.depth = 0
     return conn
 
 
-def init_db() -> None:
+def close_db() -> None:
+    """呼び出しスレッドの接続を閉じる（次回の利用時に開き直す）。"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction():
     """
-    SQLiteスキーマを初期化する（冪等）。
-    アプリケーション起動時に一度呼び出す。
+    ブロック内の書き込みを1トランザクションにまとめる（ネスト可、最外側でコミット）。
+    例外が発生した場合はロールバックする。
+
+    使用例:
+        with transaction():
+            for ...:
+                save_audit_result(...)
     """
     conn = _connect()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+
+    _local.depth = 1
+    try:
+        with conn:
+            yield conn
+    finally:
+        _local.depth = 0
+
+
+@contextmanager
+def _write():
+    """単発の書き込み用。transaction() の内側ではコミットを外側に任せる。"""
+    conn = _connect()
+    if _local.depth:
+        yield conn
+        return
     with conn:
-        conn.executescript("""
+        yield conn
+
+
+def init_db() -> None:
+    """
+    SQLiteスキーマを初期化する（冪等）。
+    未適用のマイグレーション（_MIGRATIONS）を適用し、PRAGMA user_version を更新する。
+    同じDBに対してはプロセス内で一度だけ実行し、2回目以降の呼び出しは何もしない。
+    """
+    db_path = _get_db_path()
+    if db_path in _initialized_paths:
+        return
+    with _init_lock:
+        if db_path in _initialized_paths:
+            return
+        _create_schema(_connect())
+        _initialized_paths.add(db_path)
+
+
+# スキーマのマイグレーション（PRAGMA user_version で適用済みのバージョンを管理する）。
+# 変更は既存の項目を書き換えず、末尾に (バージョン, SQL) を追加する。
+_MIGRATIONS: list[tuple[int, str]] = [
+    (1, """
             CREATE TABLE IF NOT EXISTS chunk_cache (
                 chunk_id TEXT PRIMARY KEY,
                 hash TEXT NOT NULL,
@@ -51,8 +157,88 @@ def init_db() -> None:
                 status TEXT DEFAULT 'open',
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP
             );
-        """)
-    conn.close()
+
+            CREATE TABLE IF NOT EXISTS audit_cache (
+                chunk_id TEXT NOT NULL,
+                wear_type TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                last_audited_at DATETIME NOT NULL,
+                PRIMARY KEY (chunk_id, wear_type)
+            );
+
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                wear_type TEXT NOT NULL,
+                json_mode INTEGER NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at DATETIME NOT NULL,
+                last_used_at DATETIME NOT NULL
+            );
+    """),
+    (2, """
+            CREATE INDEX IF NOT EXISTS idx_audit_results_chunk_wear
+                ON audit_results (chunk_id, wear_type);
+            CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used
+                ON llm_response_cache (last_used_at);
+            CREATE INDEX IF NOT EXISTS idx_llm_response_cache_created
+                ON llm_response_cache (created_at);
+    """),
+    (3, """
+            CREATE TABLE IF NOT EXISTS file_cache (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                updated_at DATETIME NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS parse_results (
+                parse_key TEXT PRIMARY KEY,
+                chunks TEXT,
+                skeleton TEXT,
+                last_used_at DATETIME NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_parse_results_last_used
+                ON parse_results (last_used_at);
+    """),
+]
+
+# parse_results の列のうち、解析結果として保存できるもの
+_PARSE_FIELDS = ("chunks", "skeleton")
+# 最終使用日時の更新間隔（秒）。読み出しのたびに書き込まないよう、古くなった場合だけ更新する
+_TOUCH_INTERVAL_SEC = 86400
+
+# IN 句に渡すプレースホルダー数の上限（古い SQLite の上限 999 に合わせる）
+_MAX_QUERY_PARAMS = 500
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    """未適用のマイグレーションを順に適用する（1バージョンごとに1トランザクション）。"""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, sql in _MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            conn.executescript(f"BEGIN;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+
+def _chunk_id_range(file_path: str) -> tuple[str, str]:
+    """
+    ファイル内の全チャンクIDを含む範囲 [lower, upper) を返す。
+    chunk_id は "<絶対パス>:<名前>" 形式のため、主キー・インデックスの範囲検索で取得できる。
+    """
+    prefix = os.path.abspath(file_path) + ":"
+    return prefix, prefix[:-1] + chr(ord(":") + 1)
+
+
+def _batched(items: list[str]) -> list[list[str]]:
+    return [items[i:i + _MAX_QUERY_PARAMS] for i in range(0, len(items), _MAX_QUERY_PARAMS)]
 
 
 def compute_hash(code: str) -> str:
@@ -69,15 +255,13 @@ def get_chunk_hash(chunk_id: str) -> str | None:
     row = conn.execute(
         "SELECT hash FROM chunk_cache WHERE chunk_id = ?", (chunk_id,)
     ).fetchone()
-    conn.close()
     return row["hash"] if row else None
 
 
 def update_chunk_hash(chunk_id: str, hash_value: str) -> None:
     """チャンクのハッシュをUPSERTする。"""
-    conn = _connect()
     now = datetime.now(timezone.utc).isoformat()
-    with conn:
+    with _write() as conn:
         conn.execute(
             """
             INSERT INTO chunk_cache (chunk_id, hash, last_audited_at)
@@ -88,7 +272,81 @@ def update_chunk_hash(chunk_id: str, hash_value: str) -> None:
             """,
             (chunk_id, hash_value, now),
         )
-    conn.close()
+
+
+def get_chunk_hashes(chunk_ids: list[str]) -> dict[str, str]:
+    """
+    複数チャンクのハッシュをまとめて取得する。
+
+    Returns:
+        {chunk_id: hash}（キャッシュにないチャンクはキーを持たない）
+    """
+    conn = _connect()
+    result: dict[str, str] = {}
+    for batch in _batched(list(chunk_ids)):
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(
+            f"SELECT chunk_id, hash FROM chunk_cache WHERE chunk_id IN ({placeholders})", batch
+        ).fetchall()
+        result.update((r["chunk_id"], r["hash"]) for r in rows)
+    return result
+
+
+def compute_audit_fingerprint(code_hash: str, model: str, wear_hash: str) -> str:
+    """
+    監査結果の再利用可否を判定するフィンガープリントを返す。
+    コード・モデル・ウェアプロンプトのいずれかが変われば値が変わる。
+    """
+    return hashlib.sha256(f"{code_hash}\x00{model}\x00{wear_hash}".encode("utf-8")).hexdigest()
+
+
+def get_audit_fingerprints(chunk_id: str) -> dict[str, str]:
+    """
+    チャンクのウェアごとの監査フィンガープリントを返す。
+
+    Returns:
+        {wear_type: fingerprint}（未監査のウェアはキーを持たない）
+    """
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT wear_type, fingerprint FROM audit_cache WHERE chunk_id = ?", (chunk_id,)
+    ).fetchall()
+    return {r["wear_type"]: r["fingerprint"] for r in rows}
+
+
+def get_audit_fingerprints_for_file(file_path: str) -> dict[str, dict[str, str]]:
+    """
+    ファイル内の全チャンクの監査フィンガープリントを1クエリで返す。
+
+    Returns:
+        {chunk_id: {wear_type: fingerprint}}
+    """
+    lower, upper = _chunk_id_range(file_path)
+    rows = _connect().execute(
+        "SELECT chunk_id, wear_type, fingerprint FROM audit_cache"
+        " WHERE chunk_id >= ? AND chunk_id < ?",
+        (lower, upper),
+    ).fetchall()
+    result: dict[str, dict[str, str]] = {}
+    for r in rows:
+        result.setdefault(r["chunk_id"], {})[r["wear_type"]] = r["fingerprint"]
+    return result
+
+
+def update_audit_fingerprint(chunk_id: str, wear_type: str, fingerprint: str) -> None:
+    """チャンク × ウェアの監査フィンガープリントをUPSERTする。"""
+    now = datetime.now(timezone.utc).isoformat()
+    with _write() as conn:
+        conn.execute(
+            """
+            INSERT INTO audit_cache (chunk_id, wear_type, fingerprint, last_audited_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(chunk_id, wear_type) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                last_audited_at = excluded.last_audited_at
+            """,
+            (chunk_id, wear_type, fingerprint, now),
+        )
 
 
 def save_audit_result(chunk_id: str, wear_type: str, issues: list[dict]) -> None:
@@ -100,45 +358,262 @@ def save_audit_result(chunk_id: str, wear_type: str, issues: list[dict]) -> None
         wear_type: 使用したウェア名（例: "security", "readability"）
         issues:    LLMから返されたissuesリスト
     """
-    conn = _connect()
-    with conn:
+    with _write() as conn:
         # 既存の同じ(chunk_id, wear_type)の結果を削除
         conn.execute(
             "DELETE FROM audit_results WHERE chunk_id = ? AND wear_type = ?",
             (chunk_id, wear_type),
         )
-        for issue in issues:
-            conn.execute(
-                """
-                INSERT INTO audit_results
-                    (chunk_id, wear_type, severity, description, suggestion, status)
-                VALUES (?, ?, ?, ?, ?, 'open')
-                """,
+        conn.executemany(
+            """
+            INSERT INTO audit_results
+                (chunk_id, wear_type, severity, description, suggestion, status)
+            VALUES (?, ?, ?, ?, ?, 'open')
+            """,
+            [
                 (
                     chunk_id,
                     wear_type,
                     issue.get("severity"),
                     issue.get("description"),
                     issue.get("suggestion"),
-                ),
-            )
-    conn.close()
+                )
+                for issue in issues
+            ],
+        )
 
 
-def get_audit_results(chunk_id: str) -> list[dict]:
+def get_audit_results(chunk_id: str, wear_type: str | None = None) -> list[dict]:
     """
-    チャンクの全監査結果を返す。
+    チャンクの監査結果を返す。
 
     Args:
-        chunk_id: チャンクの識別子
+        chunk_id:  チャンクの識別子
+        wear_type: 指定した場合はそのウェアの結果のみを返す
 
     Returns:
         監査結果の辞書リスト
     """
     conn = _connect()
-    rows = conn.execute(
-        "SELECT * FROM audit_results WHERE chunk_id = ? ORDER BY wear_type, severity",
-        (chunk_id,),
-    ).fetchall()
-    conn.close()
+    if wear_type is None:
+        rows = conn.execute(
+            "SELECT * FROM audit_results WHERE chunk_id = ? ORDER BY wear_type, severity",
+            (chunk_id,),
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT * FROM audit_results WHERE chunk_id = ? AND wear_type = ? ORDER BY severity",
+            (chunk_id, wear_type),
+        ).fetchall()
     return [dict(r) for r in rows]
+
+
+def get_audit_results_for_file(file_path: str) -> dict[str, list[dict]]:
+    """
+    ファイル内の全チャンクの監査結果を1クエリで返す。
+
+    Args:
+        file_path: 監査対象ファイルのパス
+
+    Returns:
+        {chunk_id: 監査結果の辞書リスト}（各リストは get_audit_results() と同じ並び順）
+    """
+    lower, upper = _chunk_id_range(file_path)
+    rows = _connect().execute(
+        "SELECT * FROM audit_results WHERE chunk_id >= ? AND chunk_id < ?"
+        " ORDER BY chunk_id, wear_type, severity",
+        (lower, upper),
+    ).fetchall()
+    result: dict[str, list[dict]] = {}
+    for r in rows:
+        result.setdefault(r["chunk_id"], []).append(dict(r))
+    return result
+
+
+def get_cached_response(cache_key: str, ttl_seconds: int | None = None) -> str | None:
+    """
+    LLMレスポンスキャッシュから応答を取得する（ヒット時は最終使用日時を更新）。
+
+    Args:
+        cache_key:   llm_client が算出したキャッシュキー
+        ttl_seconds: 作成からの有効期間（秒）。None の場合は期限なし
+
+    Returns:
+        キャッシュされたレスポンス文字列。存在しないか期限切れの場合は None
+    """
+    conn = _connect()
+    row = conn.execute(
+        "SELECT response, created_at FROM llm_response_cache WHERE cache_key = ?",
+        (cache_key,),
+    ).fetchone()
+    if row is None:
+        return None
+
+    now = datetime.now(timezone.utc)
+    if ttl_seconds is not None:
+        age = (now - datetime.fromisoformat(row["created_at"])).total_seconds()
+        if age > ttl_seconds:
+            return None
+
+    with _write() as conn:
+        conn.execute(
+            "UPDATE llm_response_cache SET last_used_at = ? WHERE cache_key = ?",
+            (now.isoformat(), cache_key),
+        )
+    return row["response"]
+
+
+def save_cached_response(
+    cache_key: str,
+    model: str,
+    wear_type: str,
+    json_mode: bool,
+    prompt_hash: str,
+    response: str,
+) -> None:
+    """LLMレスポンスをキャッシュに保存する（同じキーがあれば上書き）。"""
+    now = datetime.now(timezone.utc).isoformat()
+    with _write() as conn:
+        conn.execute(
+            """
+            INSERT INTO llm_response_cache
+                (cache_key, model, wear_type, json_mode, prompt_hash, response, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                response = excluded.response,
+                created_at = excluded.created_at,
+                last_used_at = excluded.last_used_at
+            """,
+            (cache_key, model, wear_type, int(json_mode), prompt_hash, response, now, now),
+        )
+
+
+def evict_response_cache(max_entries: int | None = None, ttl_seconds: int | None = None) -> int:
+    """
+    LLMレスポンスキャッシュを掃除する。
+
+    期限切れ（作成から ttl_seconds 超過）のエントリを削除したうえで、
+    件数が max_entries を超える場合は最終使用日時の古い順に削除する（LRU）。
+
+    Returns:
+        削除した件数
+    """
+    deleted = 0
+    with _write() as conn:
+        if ttl_seconds is not None:
+            cutoff = datetime.fromtimestamp(
+                datetime.now(timezone.utc).timestamp() - ttl_seconds, timezone.utc
+            ).isoformat()
+            deleted += conn.execute(
+                "DELETE FROM llm_response_cache WHERE created_at < ?", (cutoff,)
+            ).rowcount
+        if max_entries is not None:
+            deleted += conn.execute(
+                """
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache
+                    ORDER BY last_used_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (max_entries,),
+            ).rowcount
+    return deleted
+
+
+def get_file_fingerprint(path: str) -> dict | None:
+    """
+    ファイルのサイズ・更新時刻・内容ハッシュを返す。存在しない場合は None を返す。
+
+    Returns:
+        size, mtime_ns, content_hash をキーに持つ辞書
+    """
+    row = _connect().execute(
+        "SELECT size, mtime_ns, content_hash FROM file_cache WHERE path = ?", (path,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def save_file_fingerprint(path: str, size: int, mtime_ns: int, content_hash: str) -> None:
+    """ファイルのサイズ・更新時刻・内容ハッシュをUPSERTする。"""
+    now = datetime.now(timezone.utc).isoformat()
+    with _write() as conn:
+        conn.execute(
+            """
+            INSERT INTO file_cache (path, size, mtime_ns, content_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                content_hash = excluded.content_hash,
+                updated_at = excluded.updated_at
+            """,
+            (path, size, mtime_ns, content_hash, now),
+        )
+
+
+def get_parse_result(parse_key: str, field: str) -> str | None:
+    """
+    保存済みの解析結果を返す（最終使用日時は一定間隔ごとに更新する）。
+
+    Args:
+        parse_key: parse_cache が算出したキー（ファイル内容のハッシュを含む）
+        field:     "chunks" または "skeleton"
+
+    Returns:
+        保存された文字列。未保存の場合は None
+    """
+    if field not in _PARSE_FIELDS:
+        raise ValueError(f"不明な解析結果の種類です: {field}")
+    row = _connect().execute(
+        f"SELECT {field} AS value, last_used_at FROM parse_results WHERE parse_key = ?",
+        (parse_key,),
+    ).fetchone()
+    if row is None or row["value"] is None:
+        return None
+
+    now = datetime.now(timezone.utc)
+    if (now - datetime.fromisoformat(row["last_used_at"])).total_seconds() > _TOUCH_INTERVAL_SEC:
+        with _write() as conn:
+            conn.execute(
+                "UPDATE parse_results SET last_used_at = ? WHERE parse_key = ?",
+                (now.isoformat(), parse_key),
+            )
+    return row["value"]
+
+
+def save_parse_result(parse_key: str, chunks: str | None = None, skeleton: str | None = None) -> None:
+    """解析結果を保存する（None を渡した種類は保存済みの値を残す）。"""
+    now = datetime.now(timezone.utc).isoformat()
+    with _write() as conn:
+        conn.execute(
+            """
+            INSERT INTO parse_results (parse_key, chunks, skeleton, last_used_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(parse_key) DO UPDATE SET
+                chunks = COALESCE(excluded.chunks, parse_results.chunks),
+                skeleton = COALESCE(excluded.skeleton, parse_results.skeleton),
+                last_used_at = excluded.last_used_at
+            """,
+            (parse_key, chunks, skeleton, now),
+        )
+
+
+def evict_parse_results(max_entries: int) -> int:
+    """
+    解析結果の件数が max_entries を超える場合、最終使用日時の古い順に削除する（LRU）。
+
+    Returns:
+        削除した件数
+    """
+    with _write() as conn:
+        return conn.execute(
+            """
+            DELETE FROM parse_results WHERE parse_key IN (
+                SELECT parse_key FROM parse_results
+                ORDER BY last_used_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (max_entries,),
+        ).rowcount
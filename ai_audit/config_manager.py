@@ -19,6 +19,20 @@
 
 【任意設定項目】
   LLM_MAX_OUTPUT_TOKENS : 最大出力トークン数（未設定=モデルのデフォルト最大値を使用）
+  LLM_MAX_CONCURRENCY   : LLM への同時リクエスト数の上限（未設定=4）
+  LLM_MIN_CONCURRENCY   : 同時リクエスト数を自動調整するときの下限（未設定=1）
+  LLM_ADAPTIVE_CONCURRENCY : 0 の場合、同時リクエスト数を自動調整せず上限で固定する（未設定=1）
+  LLM_HTTP_POOL_SIZE    : HTTP Keep-Alive 接続プールのサイズ（未設定=LLM_MAX_CONCURRENCY）
+  AI_AUDIT_COMBINE_WEARS: 1 の場合、監査の全ウェアを1リクエストにまとめる（未設定=0）
+  AI_AUDIT_PACK_CHUNKS  : 1 の場合、小さいチャンクを束ねて1リクエストで送る（未設定=0）
+  LLM_PROMPT_CACHE_HINTS: プロンプトキャッシュのヒント（cache_prompt,prompt_cache_key。未設定=なし）
+  LLM_RESPONSE_CACHE    : 0 の場合、LLMレスポンスキャッシュを使わない（未設定=1）
+  LLM_RESPONSE_CACHE_TTL_DAYS    : レスポンスキャッシュの有効日数（未設定=30）
+  LLM_RESPONSE_CACHE_MAX_ENTRIES : レスポンスキャッシュの最大件数（未設定=50000）
+  AI_AUDIT_PARSE_CACHE_MAX_ENTRIES : 解析キャッシュ（チャンク・スケルトン）の最大件数（未設定=20000）
+  AI_AUDIT_PARSE_WORKERS : ソース解析に使うプロセス数（未設定=CPUコア数。1 で並列化しない）
+  AI_AUDIT_SERVE_DEBOUNCE_MS : serve で同じファイルの監査依頼をまとめる待ち時間（ミリ秒。未設定=300）
+  LLM_STREAM            : 1 の場合、LLM の応答をストリーミング（SSE）で受け取る（未設定=0）
 
 【config コマンドの動作】
   `python main.py config model`         → .env の LLM_MODEL_NAME を書き換える
@@ -26,13 +40,9 @@
 """
 import os
 import re
+import threading
 from pathlib import Path
 
-import requests
-from dotenv import load_dotenv
-
-load_dotenv()
-
 # 必須環境変数の定義
 # LLM_API_KEY は任意（Ollama など API キー不要な環境では未設定でよい）
 _REQUIRED_VARS = [
@@ -40,6 +50,53 @@ _REQUIRED_VARS = [
     ("LLM_MODEL_NAME",   "使用するモデル名（例: gpt-oss:120b）"),
 ]
 
+# LLM_MAX_CONCURRENCY 未設定時の同時リクエスト数
+_DEFAULT_MAX_CONCURRENCY = 4
+
+# LLMレスポンスキャッシュの既定値（有効日数・最大件数）
+_DEFAULT_RESPONSE_CACHE_TTL_DAYS = 30
+_DEFAULT_RESPONSE_CACHE_MAX_ENTRIES = 50000
+_DEFAULT_PARSE_CACHE_MAX_ENTRIES = 20000
+# serve で連続した保存をまとめる待ち時間（ミリ秒）
+_DEFAULT_SERVE_DEBOUNCE_MS = 300
+
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_env() -> None:
+    """
+    .env を環境変数に読み込む（プロセスで最初の1回だけ。以降は何もしない）。
+    設定を読む関数はすべて最初にこれを呼ぶため、呼び出し側で意識する必要はない。
+    python-dotenv の import も .env が見つかった場合の初回まで遅らせる。
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            env_path = _find_dotenv()
+            if env_path is not None:
+                from dotenv import load_dotenv
+                load_dotenv(env_path)
+            _env_loaded = True
+
+
+def _find_dotenv() -> Path | None:
+    """
+    load_dotenv() と同じ順で .env を探す（このモジュールのディレクトリから親へ。
+    PyInstaller でビルドしたバイナリではカレントディレクトリから親へ）。
+    見つからなければ python-dotenv を読み込まずに済ませる。
+    """
+    import sys
+    start = Path.cwd() if getattr(sys, "frozen", False) else Path(__file__).resolve().parent
+    for directory in (start, *start.parents):
+        candidate = directory / ".env"
+        if candidate.is_file():
+            return candidate
+    return None
+
 
 def _get_env_path() -> Path:
     """プロジェクトの .env ファイルパスを返す。"""
@@ -61,6 +118,7 @@ def validate_env() -> None:
     未設定の項目があればエラーメッセージを出力して sys.exit(1) する。
     """
     import sys
+    load_env()
     missing = [
         (var, desc) for var, desc in _REQUIRED_VARS if not os.getenv(var, "").strip()
     ]
@@ -80,6 +138,15 @@ def validate_env() -> None:
     sys.exit(1)
 
 
+def _env_flag(key: str, default: bool = False) -> bool:
+    """環境変数を真偽値として読む（1 / true / yes / on を真とみなす）。"""
+    load_env()
+    raw = os.getenv(key, "").strip().lower()
+    if not raw:
+        return default
+    return raw in ("1", "true", "yes", "on")
+
+
 def load_config() -> dict:
     """
     .env から全設定を読み込んで返す。
@@ -90,15 +157,76 @@ def load_config() -> dict:
         api_key:           API キー
         model_name:        使用するモデル名
         max_output_tokens: 最大出力トークン数（None=モデルのデフォルト最大値）
+        max_concurrency:   LLM への同時リクエスト数の上限（1以上）
+        min_concurrency:   同時リクエスト数を自動調整するときの下限（1以上 max_concurrency 以下）
+        adaptive_concurrency: バックエンドの応答時間・過負荷応答に応じて同時リクエスト数を自動調整するか
+        http_pool_size:    HTTP 接続プールのサイズ（未設定時は max_concurrency と同じ）
+        combine_wears:     監査の全ウェアを1リクエストにまとめるか
+        pack_chunks:       小さいチャンクを束ねて1リクエストで送るか
+        prompt_cache_hints: バックエンドに渡すプロンプトキャッシュのヒント名のリスト
+        response_cache:    LLMレスポンスキャッシュを使うか
+        response_cache_ttl_days:    レスポンスキャッシュの有効日数
+        response_cache_max_entries: レスポンスキャッシュの最大件数
+        parse_cache_max_entries:    解析キャッシュ（チャンク・スケルトン）の最大件数
+        parse_workers:     ソース解析に使うプロセス数（1以上）
+        serve_debounce_ms: serve で同じファイルの監査依頼をまとめる待ち時間（ミリ秒）
+        stream:            LLM の応答をストリーミング（SSE）で受け取るか
     """
+    load_env()
     _raw_max = os.getenv("LLM_MAX_OUTPUT_TOKENS", "").strip()
     max_output_tokens: int | None = int(_raw_max) if _raw_max else None
 
+    _raw_conc = os.getenv("LLM_MAX_CONCURRENCY", "").strip()
+    max_concurrency = max(1, int(_raw_conc)) if _raw_conc else _DEFAULT_MAX_CONCURRENCY
+
+    _raw_min_conc = os.getenv("LLM_MIN_CONCURRENCY", "").strip()
+    min_concurrency = min(max(1, int(_raw_min_conc)), max_concurrency) if _raw_min_conc else 1
+
+    _raw_pool = os.getenv("LLM_HTTP_POOL_SIZE", "").strip()
+    http_pool_size = max(1, int(_raw_pool)) if _raw_pool else max_concurrency
+
+    combine_wears = _env_flag("AI_AUDIT_COMBINE_WEARS")
+    pack_chunks = _env_flag("AI_AUDIT_PACK_CHUNKS")
+
+    prompt_cache_hints = [
+        h.strip() for h in os.getenv("LLM_PROMPT_CACHE_HINTS", "").split(",") if h.strip()
+    ]
+
+    response_cache = _env_flag("LLM_RESPONSE_CACHE", default=True)
+    _raw_ttl = os.getenv("LLM_RESPONSE_CACHE_TTL_DAYS", "").strip()
+    response_cache_ttl_days = int(_raw_ttl) if _raw_ttl else _DEFAULT_RESPONSE_CACHE_TTL_DAYS
+    _raw_entries = os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "").strip()
+    response_cache_max_entries = (
+        int(_raw_entries) if _raw_entries else _DEFAULT_RESPONSE_CACHE_MAX_ENTRIES
+    )
+    _raw_parse_entries = os.getenv("AI_AUDIT_PARSE_CACHE_MAX_ENTRIES", "").strip()
+    parse_cache_max_entries = (
+        int(_raw_parse_entries) if _raw_parse_entries else _DEFAULT_PARSE_CACHE_MAX_ENTRIES
+    )
+    _raw_parse_workers = os.getenv("AI_AUDIT_PARSE_WORKERS", "").strip()
+    parse_workers = max(1, int(_raw_parse_workers)) if _raw_parse_workers else (os.cpu_count() or 1)
+    _raw_debounce = os.getenv("AI_AUDIT_SERVE_DEBOUNCE_MS", "").strip()
+    serve_debounce_ms = max(0, int(_raw_debounce)) if _raw_debounce else _DEFAULT_SERVE_DEBOUNCE_MS
+
     return {
         "api_base_url":      os.getenv("LLM_API_BASE_URL", ""),
         "api_key":           os.getenv("LLM_API_KEY", ""),
         "model_name":        os.getenv("LLM_MODEL_NAME", ""),
         "max_output_tokens": max_output_tokens,
+        "max_concurrency":   max_concurrency,
+        "min_concurrency":   min_concurrency,
+        "adaptive_concurrency": _env_flag("LLM_ADAPTIVE_CONCURRENCY", default=True),
+        "http_pool_size":    http_pool_size,
+        "combine_wears":     combine_wears,
+        "pack_chunks":       pack_chunks,
+        "prompt_cache_hints": prompt_cache_hints,
+        "response_cache":    response_cache,
+        "response_cache_ttl_days":    response_cache_ttl_days,
+        "response_cache_max_entries": response_cache_max_entries,
+        "parse_cache_max_entries":    parse_cache_max_entries,
+        "parse_workers":     parse_workers,
+        "serve_debounce_ms": serve_debounce_ms,
+        "stream":            _env_flag("LLM_STREAM"),
     }
 
 
@@ -160,7 +288,10 @@ def fetch_ollama_models(base_url: str | None = None) -> list[dict]:
           - quantization: str   （例: MXFP4）
           - size_gb: float      ファイルサイズ (GB)
     """
+    import requests
+
     if base_url is None:
+        load_env()
         base_url = os.getenv("LLM_API_BASE_URL", "")
 
     if not base_url:
@@ -200,6 +331,7 @@ def fetch_ollama_models(base_url: str | None = None) -> list[dict]:
 
 def print_model_list(models: list[dict]) -> None:
     """モデル一覧をインデックス付きで表示する。"""
+    load_env()
     current = os.getenv("LLM_MODEL_NAME", "")
 
     print(f"\n{'No':>3}  {'モデル名':<35} {'パラメータ':>10}  {'量子化':<10} {'サイズ':>7}")
@@ -0,0 +1,81 @@
+"""
+Git 連携: 変更のあったファイルだけを処理対象にする
+
+CI のプルリクエスト検証などで、基準となるリビジョンから変更されたファイルだけを
+監査・抽出するために使う。ファイル一覧は git の差分とインデックスから取得し、
+ディレクトリツリーは走査しない。
+
+  --since <ref>   : <ref> と HEAD の merge-base から作業ツリーまでの差分
+                    （コミット済み・未コミットの変更を含む）
+  --changed-only  : HEAD から作業ツリーまでの差分（未コミットの変更のみ）
+
+どちらも未追跡（.gitignore されていない）ファイルを含み、削除されたファイルは含まない。
+取得したファイルには scan_source_files() と同じ拡張子・除外ルールを適用する。
+"""
+import os
+import subprocess
+
+from .ast_parser import select_source_files
+
+
+def changed_source_files(directory: str, since: str | None = None) -> list[str]:
+    """
+    directory 配下で変更のあったソースファイルの絶対パスを返す。
+
+    Args:
+        directory: 対象ディレクトリ（git リポジトリ内であること）
+        since:     比較の基準とするリビジョン（ブランチ名・タグ・コミット）。
+                   None の場合は HEAD と比較する（未コミットの変更のみ）
+
+    Returns:
+        ソースファイルの絶対パスのリスト（相対パスの名前順）
+
+    Raises:
+        RuntimeError: git が見つからない、リポジトリ外、リビジョンが存在しない場合
+    """
+    abs_dir = os.path.abspath(directory)
+    _git(abs_dir, ["rev-parse", "--show-toplevel"], error=f"git リポジトリではありません: {abs_dir}")
+    base = _merge_base(abs_dir, since) if since else "HEAD"
+
+    # --relative: directory 配下に限定し、directory からの相対パスで出力する
+    changed = _git_paths(abs_dir, ["diff", "--name-only", "--relative", "--diff-filter=d", base])
+    untracked = _git_paths(abs_dir, ["ls-files", "--others", "--exclude-standard"])
+    return select_source_files(abs_dir, changed + untracked)
+
+
+def _merge_base(abs_dir: str, since: str) -> str:
+    """
+    since と HEAD の merge-base を返す。
+    浅いクローンなどで merge-base が求まらない場合は since 自体と比較する。
+    """
+    _git(abs_dir, ["rev-parse", "--verify", "--quiet", f"{since}^{{commit}}"],
+         error=f"リビジョンが見つかりません: {since}")
+    try:
+        return _git(abs_dir, ["merge-base", since, "HEAD"]).strip()
+    except RuntimeError:
+        return since
+
+
+def _git_paths(abs_dir: str, args: list[str]) -> list[str]:
+    """NUL 区切り（-z）で出力させた git のパス一覧を返す。"""
+    output = _git(abs_dir, args + ["-z"])
+    return [p for p in output.split("\0") if p]
+
+
+def _git(abs_dir: str, args: list[str], error: str | None = None) -> str:
+    """git コマンドを directory で実行し、標準出力を返す。"""
+    try:
+        proc = subprocess.run(
+            ["git", *args],
+            cwd=abs_dir,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+    except FileNotFoundError:
+        raise RuntimeError("git コマンドが見つかりません。git をインストールしてください。")
+    if proc.returncode != 0:
+        detail = proc.stderr.strip().splitlines()[:1]
+        raise RuntimeError(error or f"git {args[0]} に失敗しました: {' '.join(detail)}")
+    return proc.stdout
@@ -0,0 +1,222 @@
+"""
+インクリメンタル解析: エディタからの保存ごとの監査で、変更箇所だけを解析し直す
+
+常駐プロセス（serve 等）で同じファイルを繰り返し監査する場合に使う。
+ファイルごとに前回の tree-sitter Tree・ソース・チャンクをメモリに保持し、
+次回は前回との差分から tree.edit() を適用して parser.parse(old_tree=...) で
+インクリメンタルに再解析する。
+
+  - JS/TS: 変更範囲に重なるトップレベルの定義だけからチャンクを取り出してハッシュを計算し、
+           それ以外のチャンクは前回の結果（コード・ハッシュ）を行番号だけ更新して使い回す
+  - Dart : 再解析はインクリメンタルに行い、チャンクの取り出しは全体で行う
+  - Python（tree-sitter を使わない）: ast で全体を解析し、前回とコードを比較する
+
+どの場合も、前回からコードが変わったチャンクの chunk_id を changed として返す。
+保持するファイル数は _MAX_FILES まで（最終使用の古い順に破棄）。
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .ast_parser import (
+    _JS_EXTENSIONS,
+    _DART_EXTENSIONS,
+    _collect_dart_chunks,
+    _collect_js_chunks,
+    _get_dart_parser,
+    _get_js_parser,
+    _read_source,
+    analyze_file,
+    get_lang,
+)
+from .cache_manager import compute_hash
+
+# 前回の解析結果を保持するファイル数の上限
+_MAX_FILES = 256
+
+_lock = threading.Lock()
+_states: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def parse_incremental(file_path: str) -> dict:
+    """
+    ファイルを解析し、前回の解析から変わったチャンクを返す。
+
+    Returns:
+        解析結果の辞書:
+          - chunks:  parse_chunks() と同形式のチャンクリスト
+          - hashes:  chunk_id → コードのハッシュ（compute_hash() と同じ値）
+          - changed: 前回からコードが変わった（または新しく現れた）チャンクの chunk_id の集合。
+                     前回の結果がない場合は全チャンク
+          - incremental: 前回の Tree を使ってインクリメンタルに再解析した場合 True
+    """
+    abs_path = os.path.abspath(file_path)
+    ext = os.path.splitext(abs_path)[1].lower()
+    with _lock:
+        prev = _states.pop(abs_path, None)
+        if ext in _JS_EXTENSIONS or ext in _DART_EXTENSIONS:
+            state, result = _parse_tree_sitter(abs_path, ext, prev)
+        else:
+            state, result = _parse_whole(abs_path, prev)
+        if state is not None:
+            _states[abs_path] = state
+            while len(_states) > _MAX_FILES:
+                _states.popitem(last=False)
+    return result
+
+
+def forget(file_path: str) -> None:
+    """ファイルの保持している解析結果を破棄する（削除・リネーム時など）。"""
+    with _lock:
+        _states.pop(os.path.abspath(file_path), None)
+
+
+def _parse_whole(abs_path: str, prev: dict | None) -> tuple[dict, dict]:
+    """ファイル全体を解析し、前回のチャンクとコードを比較する。"""
+    chunks = analyze_file(abs_path, include_skeleton=False)["chunks"]
+    prev_hashes = prev["hashes"] if prev else {}
+    hashes = {c["chunk_id"]: compute_hash(c["code"]) for c in chunks}
+    changed = {cid for cid, h in hashes.items() if prev_hashes.get(cid) != h}
+    state = {"hashes": hashes}
+    return state, _result(chunks, hashes, changed, incremental=False)
+
+
+def _parse_tree_sitter(abs_path: str, ext: str, prev: dict | None) -> tuple[dict | None, dict]:
+    """tree-sitter でインクリメンタルに再解析する（パーサー未インストール時は空の結果）。"""
+    if ext in _JS_EXTENSIONS:
+        parser, _ = _get_js_parser(abs_path)
+    else:
+        parser = _get_dart_parser()
+    if parser is None:
+        return None, _result([], {}, set(), incremental=False)
+
+    source = _read_source(abs_path)
+    source_bytes = source.encode("utf-8")
+    if prev is not None and prev["source"] == source_bytes:
+        return prev, _result(prev["chunks"], prev["hashes"], set(), incremental=True)
+
+    if prev is not None:
+        old_tree = prev["tree"]
+        edit = _edit_range(prev["source"], source_bytes)
+        old_tree.edit(*edit)
+        tree = parser.parse(source_bytes, old_tree)
+        start, _, new_end = edit[:3]
+        # チャンクのコードは行単位で取り出すため、変更範囲も行の範囲で扱う
+        changed_rows = [
+            (r.start_point[0], r.end_point[0]) for r in old_tree.changed_ranges(tree)
+        ]
+        changed_rows.append((_point(source_bytes, start)[0], _point(source_bytes, new_end)[0]))
+    else:
+        tree = parser.parse(source_bytes)
+        changed_rows = None
+
+    source_lines = source.splitlines(keepends=True)
+    if ext in _JS_EXTENSIONS:
+        chunks, hashes, by_node = _collect_js_incremental(
+            tree, source_bytes, source_lines, abs_path, prev, changed_rows,
+            shift=(edit[2] - edit[1], edit[1]) if prev is not None else None,
+        )
+    else:
+        chunks = []
+        _collect_dart_chunks(tree.root_node, source_bytes, source_lines, abs_path, chunks)
+        hashes = {c["chunk_id"]: compute_hash(c["code"]) for c in chunks}
+        by_node = {}
+    chunks.sort(key=lambda c: c["lineno"])
+
+    prev_hashes = prev["hashes"] if prev else {}
+    changed = {cid for cid, h in hashes.items() if prev_hashes.get(cid) != h}
+    state = {
+        "source": source_bytes,
+        "tree": tree,
+        "chunks": chunks,
+        "hashes": hashes,
+        "by_node": by_node,
+    }
+    return state, _result(chunks, hashes, changed, incremental=prev is not None)
+
+
+def _collect_js_incremental(tree, source_bytes, source_lines, abs_path, prev, changed_rows, shift):
+    """
+    JS/TS のトップレベル定義ごとにチャンクを集める。
+    変更のあった行に重ならない定義は、前回その位置にあった定義のチャンクを使い回す。
+
+    Returns:
+        (チャンクリスト, chunk_id → ハッシュ, 定義の開始バイト → その定義のチャンク)
+    """
+    lang = get_lang(abs_path)
+    prev_by_node = prev["by_node"] if prev else {}
+    prev_hashes = prev["hashes"] if prev else {}
+
+    chunks: list[dict] = []
+    hashes: dict[str, str] = {}
+    by_node: dict[int, list[dict]] = {}
+    for node in tree.root_node.children:
+        reused = None
+        if changed_rows is not None and not _overlaps(node, changed_rows):
+            delta, old_end = shift
+            old_start = node.start_byte - delta if node.start_byte >= old_end + delta else node.start_byte
+            reused = prev_by_node.get(old_start)
+
+        if reused is not None:
+            node_chunks = [dict(c, lineno=node.start_point.row + 1) for c in reused]
+            for c in node_chunks:
+                hashes[c["chunk_id"]] = prev_hashes[c["chunk_id"]]
+        else:
+            node_chunks = []
+            _collect_js_chunks(node, source_bytes, source_lines, abs_path, lang, node_chunks)
+            for c in node_chunks:
+                hashes[c["chunk_id"]] = compute_hash(c["code"])
+
+        if node_chunks:
+            by_node[node.start_byte] = node_chunks
+            chunks.extend(node_chunks)
+    return chunks, hashes, by_node
+
+
+def _overlaps(node, rows: list[tuple[int, int]]) -> bool:
+    """ノードの行範囲が変更のあった行範囲のいずれかと重なるか。"""
+    first, last = node.start_point[0], node.end_point[0]
+    return any(start <= last and first <= end for start, end in rows)
+
+
+def _edit_range(old: bytes, new: bytes) -> tuple:
+    """
+    前回と今回のソースの共通の先頭・末尾を除いた差分を、tree.edit() の引数として返す。
+
+    Returns:
+        (start_byte, old_end_byte, new_end_byte, start_point, old_end_point, new_end_point)
+    """
+    limit = min(len(old), len(new))
+    start = _common_length(lambda n: old[:n] == new[:n], limit)
+    suffix = _common_length(
+        lambda n: old[len(old) - n:] == new[len(new) - n:], limit - start
+    )
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+    return (
+        start, old_end, new_end,
+        _point(old, start), _point(old, old_end), _point(new, new_end),
+    )
+
+
+def _common_length(matches, limit: int) -> int:
+    """matches(n) が真となる最大の n（0〜limit）を二分探索で求める（比較はスライス単位で行う）。"""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if matches(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _point(source: bytes, offset: int) -> tuple[int, int]:
+    """バイトオフセットを tree-sitter の (行, 列バイト) に変換する。"""
+    row = source.count(b"\n", 0, offset)
+    col = offset - (source.rfind(b"\n", 0, offset) + 1)
+    return row, col
+
+
+def _result(chunks: list[dict], hashes: dict[str, str], changed: set[str], incremental: bool) -> dict:
+    return {"chunks": chunks, "hashes": hashes, "changed": changed, "incremental": incremental}
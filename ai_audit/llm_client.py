@@ -8,18 +8,143 @@ LLMクライアント: GPT-oss-120b等のOpenAI互換APIへのリクエスト送
   LLM_API_KEY           : APIキー（Ollama の場合は "ollama" 等、任意の文字列でOK）  ※必須
   LLM_MODEL_NAME        : 使用するモデル名（例: gpt-oss:120b）  ※必須
   LLM_MAX_OUTPUT_TOKENS : 最大出力トークン数（未設定=モデルのデフォルト最大値を使用）
+  LLM_MAX_CONCURRENCY   : 同時リクエスト数の上限（未設定=4）。並列監査のワーカー数に使用
+  LLM_MIN_CONCURRENCY   : 同時リクエスト数を自動調整するときの下限（未設定=1）
+  LLM_ADAPTIVE_CONCURRENCY : 0 の場合、同時リクエスト数を LLM_MAX_CONCURRENCY で固定する（未設定=1）
+  LLM_HTTP_POOL_SIZE    : 接続先ごとに保持する Keep-Alive 接続数（未設定=LLM_MAX_CONCURRENCY）
+  LLM_PROMPT_CACHE_HINTS: バックエンドに渡すプロンプトキャッシュのヒント（カンマ区切り、未設定=なし）
+                            cache_prompt     → llama.cpp server の "cache_prompt": true
+                            prompt_cache_key → OpenAI 互換の "prompt_cache_key"（システムプロンプトのハッシュ）
+  LLM_RESPONSE_CACHE             : 0 の場合、レスポンスキャッシュを使わない（未設定=1）
+  LLM_RESPONSE_CACHE_TTL_DAYS    : レスポンスキャッシュの有効日数（未設定=30）
+  LLM_RESPONSE_CACHE_MAX_ENTRIES : レスポンスキャッシュの最大件数（未設定=50000、超過分は LRU で削除）
+
+HTTP接続はプロセス共通の requests.Session で再利用する。
+チャンクごとに TCP/TLS ハンドシェイクをやり直さないよう、
+接続プールのサイズは同時リクエスト数に合わせる。
+
+非同期版 acall_llm は httpx（任意依存）の AsyncClient を使い、
+LLM_MAX_CONCURRENCY のセマフォで同時実行数を制限する。
+
+同時リクエスト数の自動調整（LLM_ADAPTIVE_CONCURRENCY、既定で有効）:
+  同期・非同期・ストリーミングのすべての送信は、プロセス共通の送信枠（AIMD）を通す。
+  応答時間が安定している間は上限を LLM_MAX_CONCURRENCY まで少しずつ増やし、
+  応答時間の悪化・429/503/504・タイムアウトで減らす。Retry-After の間は新しい送信を止める。
+  失敗時のリトライはジッター付きの指数バックオフで待つ。
+  現在の上限・送信中の数・応答時間のパーセンタイルは get_concurrency_stats() で確認できる。
+
+プロンプトキャッシュ:
+  メッセージは常に「システムプロンプト（ウェア）→ 固定の指示文 → コード」の順で組み立てるため、
+  同じウェアのリクエストはバイト単位で同一の前置き（プレフィックス）を共有する。
+  vLLM / llama.cpp の自動プレフィックスキャッシュが効いたかどうかは、レスポンスの
+  usage（prompt_tokens_details.cached_tokens）から集計し get_usage_stats() で確認できる。
+
+レスポンスキャッシュ:
+  (モデル名, ウェア, JSONモード, 最大出力トークン数, システム+ユーザープロンプトのSHA-256) を
+  キーに、成功したレスポンスを SQLite（cache_manager）に保存する。同じプロンプトは
+  ファイルの移動・リネーム・ユースケースをまたいでもネットワークに出ずに再利用される。
+
+ストリーミング（LLM_STREAM / 呼び出し元の指定）:
+  stream_llm は "stream": true で送信し、SSE で届いた本文の断片を順に返す
+  （Markdown を生成するユースケースは受信しながら出力ファイルに書き込む）。
+  stream_issues は JSON の "issues" 配列を受信しながら解析し、指摘を1件閉じるごとに返す。
 """
+import hashlib
 import json
 import os
+import random
+import sys
+import threading
 import time
+import weakref
+from collections import deque
+from contextlib import closing
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+
+from .cache_manager import evict_response_cache, get_cached_response, init_db, save_cached_response
 
-import requests
-from dotenv import load_dotenv
+# requests・asyncio は読み込みに時間がかかるため、LLM を呼ぶまで import しない
+# （キャッシュヒットだけで終わる監査では読み込まない）
+if TYPE_CHECKING:
+    import asyncio
 
-load_dotenv()
+    import requests
 
 _MAX_RETRIES = 3
-_RETRY_DELAY = 2  # 秒
+# リトライの待ち時間（秒）: 失敗ごとに倍にした値（上限 _RETRY_MAX_DELAY）の半分〜全体からランダムに選ぶ
+# （同時に失敗したリクエストのリトライが同じ時刻に重ならないようにする）
+_RETRY_BASE_DELAY = 2.0
+_RETRY_MAX_DELAY = 30.0
+# Retry-After で指定された待ち時間の上限（秒）
+_MAX_RETRY_AFTER = 300.0
+
+# 同時リクエスト数の自動調整（AIMD）
+# 過負荷とみなす HTTP ステータス（タイムアウトも過負荷とみなす）
+_OVERLOAD_STATUSES = (429, 503, 504)
+# 自動調整の開始値（LLM_MAX_CONCURRENCY がこれより小さければ上限から始める）
+_INITIAL_CONCURRENCY = 4
+# 上限を減らすときに掛ける係数（過負荷応答・タイムアウト / 応答時間の悪化）
+_OVERLOAD_DECREASE = 0.5
+_LATENCY_DECREASE = 0.9
+# 直近の応答時間（短期の指数移動平均）が長期の平均のこの倍数を超えたら悪化とみなす
+_LATENCY_TOLERANCE = 2.0
+_SHORT_LATENCY_ALPHA = 0.3
+_LONG_LATENCY_ALPHA = 0.02
+# 応答時間で上限を調整し始めるまでに必要な記録数
+_MIN_LATENCY_SAMPLES = 10
+# パーセンタイルの計算に使う直近の応答時間の件数
+_LATENCY_WINDOW = 512
+# 非同期版で送信枠の空きを確認し直す間隔（秒。空くまで倍々に伸ばす）
+_SLOT_POLL_MIN_INTERVAL = 0.01
+_SLOT_POLL_MAX_INTERVAL = 0.2
+
+# プロセス共通の HTTP セッション（_get_session() で遅延生成）
+_session: "requests.Session | None" = None
+_session_lock = threading.Lock()
+
+# プロセス内のトークン使用量の集計（get_usage_stats() で参照）
+_usage_stats = {
+    "requests": 0,
+    "prompt_tokens": 0,
+    "cached_prompt_tokens": 0,
+    "completion_tokens": 0,
+    "response_cache_hits": 0,
+}
+_usage_lock = threading.Lock()
+
+# 同時リクエスト数の自動調整の状態（_acquire_slot() / _release_slot() で更新）
+#   limit:          現在の上限（小数。整数部分の数まで同時に送る。初回の送信時に設定する）
+#   blocked_until:  Retry-After で指示された送信再開時刻（time.monotonic()）
+#   last_decrease:  最後に上限を減らした時刻（これより前に送り始めたリクエストの結果では減らさない）
+#   short_latency / long_latency: 応答時間の短期・長期の指数移動平均（秒）
+_limiter: dict = {
+    "limit": None,
+    "min": 1,
+    "max": 1,
+    "adaptive": True,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "blocked_until": 0.0,
+    "last_decrease": 0.0,
+    "short_latency": None,
+    "long_latency": None,
+    "samples": 0,
+    "overloads": 0,
+}
+_limiter_cond = threading.Condition()
+_latencies: "deque[float]" = deque(maxlen=_LATENCY_WINDOW)
+
+# レスポンスキャッシュ: 何回保存するごとに期限切れ・件数超過のエントリを掃除するか
+_EVICT_EVERY = 200
+_response_cache_lock = threading.Lock()
+_response_cache_state = {"ready": False, "saves": 0}
+
+# イベントループごとの非同期クライアント状態（_get_async_state() で遅延生成）
+_async_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+class StreamCancelled(RuntimeError):
+    """呼び出し元の指示でストリーミング応答の受信を中止した。"""
 
 
 def _get_settings() -> dict:
@@ -29,20 +154,43 @@ def _get_settings() -> dict:
     return load_config()
 
 
-def call_llm(system_prompt: str, user_content: str, json_mode: bool = True) -> str:
+def _get_session() -> "requests.Session":
     """
-    LLM APIを呼び出し、レスポンステキストを返す。
+    プロセス共通の HTTP セッションを返す（初回呼び出し時に生成）。
 
-    Args:
-        system_prompt: システムプロンプト（ウェア）
-        user_content:  ユーザーメッセージ（解析対象コード等）
-        json_mode:     JSONフォーマットでのレスポンスを要求するか
+    Keep-Alive 接続を HTTPAdapter のプールで保持し、並列ワーカー間で共有する。
+    プールサイズは LLM_HTTP_POOL_SIZE（未設定時は LLM_MAX_CONCURRENCY）に合わせ、
+    同時リクエスト数ぶんの接続が使い回されるようにする。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
 
-    Returns:
-        LLMのレスポンス文字列。JSONモード時はJSON文字列。
+                pool_size = _get_settings()["http_pool_size"]
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
 
-    Raises:
-        RuntimeError: 最大リトライ回数を超えてもAPIが成功しない場合
+
+def close_session() -> None:
+    """共有 HTTP セッションを閉じる（以降の呼び出しでは新しいセッションを生成する）。"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _build_request(system_prompt: str, user_content: str, json_mode: bool) -> tuple[str, dict, dict]:
+    """
+    chat/completions 呼び出しの (URL, ヘッダー, ペイロード) を組み立てる。
+    同期版 call_llm と非同期版 acall_llm で同じペイロードを送るための共通処理。
     """
     cfg = _get_settings()
     base_url          = cfg["api_base_url"]
@@ -71,21 +219,738 @@ def call_llm(system_prompt: str, user_content: str, json_mode: bool = True) -> s
     if json_mode:
         payload["response_format"] = {"type": "json_object"}
 
+    # プロンプトキャッシュのヒント（対応していないバックエンドもあるため設定時のみ付与）
+    hints = cfg["prompt_cache_hints"]
+    if "cache_prompt" in hints:
+        payload["cache_prompt"] = True
+    if "prompt_cache_key" in hints:
+        prefix_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+        payload["prompt_cache_key"] = f"ai_audit-{prefix_hash}"
+
+    return url, headers, payload
+
+
+def _extract_content(data: dict) -> str:
+    """chat/completions のレスポンスJSONから本文を取り出す（KeyError は呼び出し元でリトライ扱い）。"""
+    content = data["choices"][0]["message"]["content"]
+    _record_usage(data)
+    return content
+
+
+def _record_usage(data: dict) -> None:
+    """
+    レスポンスの usage をプロセス内の集計に加算する。
+    キャッシュ済みトークン数は OpenAI / vLLM 形式（prompt_tokens_details.cached_tokens）、
+    なければ llama.cpp 形式（timings.cache_n）から読む。
+    """
+    usage = data.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens")
+    if cached is None:
+        cached = (data.get("timings") or {}).get("cache_n", 0)
+
+    with _usage_lock:
+        _usage_stats["requests"] += 1
+        _usage_stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        _usage_stats["cached_prompt_tokens"] += cached or 0
+        _usage_stats["completion_tokens"] += usage.get("completion_tokens") or 0
+
+
+def get_usage_stats() -> dict:
+    """
+    このプロセスで成功したLLM呼び出しのトークン使用量を返す。
+
+    Returns:
+        requests:             成功したリクエスト数
+        prompt_tokens:        入力トークン数の合計
+        cached_prompt_tokens: うちバックエンドのプレフィックスキャッシュで処理されたトークン数
+        completion_tokens:    出力トークン数の合計
+        response_cache_hits:  レスポンスキャッシュから返した呼び出し数（requests には含まない）
+    """
+    with _usage_lock:
+        return dict(_usage_stats)
+
+
+def reset_usage_stats() -> None:
+    """トークン使用量の集計をリセットする。"""
+    with _usage_lock:
+        for key in _usage_stats:
+            _usage_stats[key] = 0
+
+
+def format_usage_stats(stats: dict | None = None) -> str:
+    """トークン使用量を1行の表示用文字列にする（キャッシュ済み/未キャッシュの内訳付き）。"""
+    stats = stats or get_usage_stats()
+    prompt = stats["prompt_tokens"]
+    cached = stats["cached_prompt_tokens"]
+    ratio = f"{cached / prompt:.0%}" if prompt else "-"
+    return (
+        f"LLM {stats['requests']} リクエスト / 入力 {prompt} トークン"
+        f"（キャッシュ済み {cached} / 未キャッシュ {prompt - cached}, キャッシュ率 {ratio}）"
+        f" / 出力 {stats['completion_tokens']} トークン"
+        f" / 応答キャッシュヒット {stats['response_cache_hits']} 件"
+    )
+
+
+def get_concurrency_stats() -> dict:
+    """
+    同時リクエスト数の自動調整の状態と、直近のリクエストの応答時間を返す。
+
+    Returns:
+        limit:          現在の同時リクエスト数の上限（自動調整前は None）
+        in_flight:      送信中のリクエスト数
+        peak_in_flight: このプロセスで同時に送信したリクエスト数の最大
+        overloads:      過負荷応答（429/503/504）・タイムアウトの回数
+        latency_p50 / latency_p90 / latency_p99:
+                        直近 _LATENCY_WINDOW 件の成功したリクエストの応答時間（秒。記録がなければ None）
+    """
+    with _limiter_cond:
+        limit = _limiter["limit"]
+        stats = {
+            "limit": int(limit) if limit is not None else None,
+            "in_flight": _limiter["in_flight"],
+            "peak_in_flight": _limiter["peak_in_flight"],
+            "overloads": _limiter["overloads"],
+        }
+        latencies = sorted(_latencies)
+    for p in (50, 90, 99):
+        # nearest-rank 法
+        index = max(0, -(-len(latencies) * p // 100) - 1)
+        stats[f"latency_p{p}"] = round(latencies[index], 3) if latencies else None
+    return stats
+
+
+def format_concurrency_stats(stats: dict | None = None) -> str:
+    """同時リクエスト数と応答時間のパーセンタイルを1行の表示用文字列にする。"""
+    stats = stats or get_concurrency_stats()
+
+    def _sec(value: float | None) -> str:
+        return f"{value:.2f}s" if value is not None else "-"
+
+    return (
+        f"同時リクエスト 上限 {stats['limit'] if stats['limit'] is not None else '-'}"
+        f"（送信中 {stats['in_flight']} / 最大 {stats['peak_in_flight']}）"
+        f" / 応答時間 p50 {_sec(stats['latency_p50'])} p90 {_sec(stats['latency_p90'])}"
+        f" p99 {_sec(stats['latency_p99'])}"
+        f" / 過負荷応答 {stats['overloads']} 回"
+    )
+
+
+def _response_cache_key(
+    cfg: dict, system_prompt: str, user_content: str, json_mode: bool, wear_type: str
+) -> tuple[str, str]:
+    """レスポンスキャッシュの (キャッシュキー, プロンプトハッシュ) を返す。"""
+    prompt_hash = hashlib.sha256(
+        f"{system_prompt}\x00{user_content}".encode("utf-8")
+    ).hexdigest()
+    key_source = "\x00".join([
+        cfg["model_name"],
+        wear_type,
+        "json" if json_mode else "text",
+        str(cfg["max_output_tokens"]),
+        prompt_hash,
+    ])
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest(), prompt_hash
+
+
+def _ensure_response_cache() -> None:
+    """初回利用時にDBスキーマを初期化する。"""
+    if not _response_cache_state["ready"]:
+        with _response_cache_lock:
+            if not _response_cache_state["ready"]:
+                init_db()
+                _response_cache_state["ready"] = True
+
+
+def _lookup_response(cfg: dict, cache_key: str) -> str | None:
+    """レスポンスキャッシュを参照する（無効時・ミス時は None）。"""
+    if not cfg["response_cache"]:
+        return None
+    _ensure_response_cache()
+    cached = get_cached_response(cache_key, ttl_seconds=cfg["response_cache_ttl_days"] * 86400)
+    if cached is not None:
+        with _usage_lock:
+            _usage_stats["response_cache_hits"] += 1
+    return cached
+
+
+def _store_response(
+    cfg: dict,
+    cache_key: str,
+    prompt_hash: str,
+    wear_type: str,
+    json_mode: bool,
+    content: str,
+) -> None:
+    """
+    レスポンスをキャッシュに保存する。
+    JSONモードでJSONとして解釈できない応答は、壊れた結果を固定化しないよう保存しない。
+    """
+    if not cfg["response_cache"]:
+        return
+    if json_mode:
+        try:
+            json.loads(content)
+        except json.JSONDecodeError:
+            return
+
+    _ensure_response_cache()
+    save_cached_response(cache_key, cfg["model_name"], wear_type, json_mode, prompt_hash, content)
+
+    with _response_cache_lock:
+        _response_cache_state["saves"] += 1
+        evict_now = _response_cache_state["saves"] % _EVICT_EVERY == 1
+    if evict_now:
+        evict_response_cache(
+            max_entries=cfg["response_cache_max_entries"],
+            ttl_seconds=cfg["response_cache_ttl_days"] * 86400,
+        )
+
+
+# ---------------------------------------------------------------------------
+# 同時リクエスト数の自動調整・リトライ
+# ---------------------------------------------------------------------------
+
+def _init_limiter() -> None:
+    """初回の送信時に上限・下限を設定から読み込む（_limiter_cond を保持して呼ぶ）。"""
+    if _limiter["limit"] is not None:
+        return
+    cfg = _get_settings()
+    _limiter["max"] = cfg["max_concurrency"]
+    _limiter["min"] = cfg["min_concurrency"]
+    _limiter["adaptive"] = cfg["adaptive_concurrency"]
+    if _limiter["adaptive"]:
+        _limiter["limit"] = float(max(_limiter["min"], min(_limiter["max"], _INITIAL_CONCURRENCY)))
+    else:
+        _limiter["limit"] = float(_limiter["max"])
+
+
+def _acquire_slot(block: bool = True) -> dict | None:
+    """
+    LLMリクエストの送信枠を1つ取る。送信中の数が上限に達していれば空くまで待ち、
+    Retry-After で待つよう指示されている間は空きがあっても待つ。
+
+    Args:
+        block: False の場合は待たずに None を返す
+
+    Returns:
+        _release_slot() に渡す送信枠
+    """
+    with _limiter_cond:
+        _init_limiter()
+        while True:
+            wait = _limiter["blocked_until"] - time.monotonic()
+            if wait <= 0 and _limiter["in_flight"] < int(_limiter["limit"]):
+                break
+            if not block:
+                return None
+            _limiter_cond.wait(timeout=wait if wait > 0 else None)
+        _limiter["in_flight"] += 1
+        _limiter["peak_in_flight"] = max(_limiter["peak_in_flight"], _limiter["in_flight"])
+        return {
+            "start": time.monotonic(),
+            # 上限いっぱいまで使っているときだけ上限を増やす（使い切っていない上限を増やし続けない）
+            "saturated": _limiter["in_flight"] >= int(_limiter["limit"]),
+        }
+
+
+async def _aacquire_slot() -> dict:
+    """
+    _acquire_slot() の非同期版。空きがなければイベントループを止めずに間隔を空けて確認し直す。
+    待っている間にタスクがキャンセルされても送信枠を取ったまま残らない
+    （スレッドで待つと、キャンセル後にスレッドが取った送信枠を返す者がいなくなる）。
+    """
+    import asyncio
+
+    interval = _SLOT_POLL_MIN_INTERVAL
+    while True:
+        slot = _acquire_slot(block=False)
+        if slot is not None:
+            return slot
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, _SLOT_POLL_MAX_INTERVAL)
+
+
+def _release_slot(slot: dict, ok: bool, error: Exception | None = None) -> None:
+    """
+    送信枠を返し、リクエストの結果から同時リクエスト数の上限を調整する（AIMD）。
+
+      - 過負荷（429/503/504・タイムアウト）: 上限を半分にする。Retry-After があればその間は送信しない
+      - 成功: 応答時間を記録する。直近の応答時間が長期の平均の _LATENCY_TOLERANCE 倍以内なら
+              上限を 1/上限 だけ増やし（上限ぶん成功するごとにおよそ1増える）、超えていれば少し減らす
+      - それ以外の失敗・途中で読むのをやめたストリーミング: 調整しない
+
+    上限を減らすのは前回減らした後に送り始めたリクエストの結果だけにする
+    （同時に失敗したリクエストの数だけ繰り返し減らさないため）。
+    """
+    now = time.monotonic()
+    with _limiter_cond:
+        _limiter["in_flight"] -= 1
+        if error is not None and _is_overload(error):
+            _limiter["overloads"] += 1
+            retry_after = _retry_after(error)
+            if retry_after:
+                _limiter["blocked_until"] = max(_limiter["blocked_until"], now + retry_after)
+            _decrease_limit(slot, _OVERLOAD_DECREASE, now)
+        elif ok:
+            _record_latency(slot, now - slot["start"], now)
+        _limiter_cond.notify_all()
+
+
+def _record_latency(slot: dict, latency: float, now: float) -> None:
+    """成功したリクエストの応答時間を記録し、上限を調整する（_limiter_cond を保持して呼ぶ）。"""
+    _latencies.append(latency)
+    _limiter["samples"] += 1
+    short, long_ = _limiter["short_latency"], _limiter["long_latency"]
+    if short is None:
+        short = long_ = latency
+    else:
+        short += _SHORT_LATENCY_ALPHA * (latency - short)
+        long_ += _LONG_LATENCY_ALPHA * (latency - long_)
+    _limiter["short_latency"], _limiter["long_latency"] = short, long_
+
+    if not _limiter["adaptive"]:
+        return
+    if _limiter["samples"] >= _MIN_LATENCY_SAMPLES and short > long_ * _LATENCY_TOLERANCE:
+        _decrease_limit(slot, _LATENCY_DECREASE, now)
+    elif slot["saturated"]:
+        _limiter["limit"] = min(float(_limiter["max"]), _limiter["limit"] + 1 / _limiter["limit"])
+
+
+def _decrease_limit(slot: dict, factor: float, now: float) -> None:
+    """上限に factor を掛けて減らす（_limiter_cond を保持して呼ぶ）。"""
+    if not _limiter["adaptive"] or slot["start"] < _limiter["last_decrease"]:
+        return
+    _limiter["limit"] = max(float(_limiter["min"]), _limiter["limit"] * factor)
+    _limiter["last_decrease"] = now
+
+
+def _is_overload(error: Exception) -> bool:
+    """バックエンドの過負荷を示すエラー（429/503/504・タイムアウト）か。"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status in _OVERLOAD_STATUSES:
+        return True
+    # requests / httpx は使う側でしか import していないため、読み込み済みの場合だけ判定する
+    requests_mod = sys.modules.get("requests")
+    if requests_mod is not None and isinstance(error, requests_mod.Timeout):
+        return True
+    httpx_mod = sys.modules.get("httpx")
+    return httpx_mod is not None and isinstance(error, httpx_mod.TimeoutException)
+
+
+def _retry_after(error: Exception) -> float | None:
+    """エラーレスポンスの Retry-After（秒数または HTTP 日付）を秒数で返す（なければ None）。"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), _MAX_RETRY_AFTER)
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """
+    attempt 回目の失敗の後、リトライまで待つ秒数を返す。
+    ジッター付きの指数バックオフで、Retry-After が指定されていればそれより短くしない。
+    """
+    ceiling = min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    delay = random.uniform(ceiling / 2, ceiling)
+    return max(delay, _retry_after(error) or 0.0)
+
+
+def call_llm(
+    system_prompt: str,
+    user_content: str,
+    json_mode: bool = True,
+    wear_type: str = "",
+    use_cache: bool = True,
+    validate: Callable[[str], bool] | None = None,
+) -> str:
+    """
+    LLM APIを呼び出し、レスポンステキストを返す。
+
+    Args:
+        system_prompt: システムプロンプト（ウェア）
+        user_content:  ユーザーメッセージ（解析対象コード等）
+        json_mode:     JSONフォーマットでのレスポンスを要求するか
+        wear_type:     ウェア名（レスポンスキャッシュのキーと記録に使用）
+        use_cache:     False の場合はレスポンスキャッシュを参照しない（結果は保存する）
+        validate:      レスポンスを受け取った後に呼ぶ関数。False を返した場合はキャッシュに保存しない
+                       （呼び出し元が結果を採用しなかった応答を、次回の再試行で返さないため）
+
+    Returns:
+        LLMのレスポンス文字列。JSONモード時はJSON文字列。
+
+    Raises:
+        RuntimeError: 最大リトライ回数を超えてもAPIが成功しない場合
+    """
+    cfg = _get_settings()
+    cache_key, prompt_hash = _response_cache_key(cfg, system_prompt, user_content, json_mode, wear_type)
+    if use_cache:
+        cached = _lookup_response(cfg, cache_key)
+        if cached is not None:
+            return cached
+
+    import requests
+
+    url, headers, payload = _build_request(system_prompt, user_content, json_mode)
+
     last_error: Exception | None = None
     for attempt in range(1, _MAX_RETRIES + 1):
+        slot = _acquire_slot()
+        content = error = None
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=3600)
+            response = _get_session().post(url, headers=headers, json=payload, timeout=3600)
             response.raise_for_status()
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
+            content = _extract_content(response.json())
         except (requests.RequestException, KeyError, json.JSONDecodeError) as e:
-            last_error = e
+            error = last_error = e
+        finally:
+            _release_slot(slot, content is not None, error)
+        if content is not None:
+            if validate is None or validate(content):
+                _store_response(cfg, cache_key, prompt_hash, wear_type, json_mode, content)
+            return content
+        if attempt < _MAX_RETRIES:
+            time.sleep(_retry_delay(attempt, error))
+
+    raise RuntimeError(f"LLM API呼び出しに失敗しました（{_MAX_RETRIES}回試行）: {last_error}")
+
+
+# ---------------------------------------------------------------------------
+# ストリーミング（SSE）
+# ---------------------------------------------------------------------------
+
+def stream_llm(
+    system_prompt: str,
+    user_content: str,
+    json_mode: bool = False,
+    wear_type: str = "",
+    use_cache: bool = True,
+    validate: Callable[[str], bool] | None = None,
+) -> Iterator[str]:
+    """
+    call_llm のストリーミング版。"stream": true で送信し、応答本文を受信した断片ごとに返す。
+
+    レスポンスキャッシュにヒットした場合は、保存済みの本文を1つの断片として返す。
+    受信し終えた本文は call_llm と同じキーでキャッシュに保存する（途中で読むのをやめた場合と、
+    validate が False を返した場合は保存しない）。
+    リトライは最初の断片を返す前に失敗した場合だけ行う（返した断片は取り消せないため）。
+    バックエンドが SSE ではなく通常の JSON で応答した場合は、本文全体を1つの断片として返す。
+
+    Raises:
+        RuntimeError: 最大リトライ回数を超えても接続できない場合、または受信の途中で失敗した場合
+    """
+    cfg = _get_settings()
+    cache_key, prompt_hash = _response_cache_key(cfg, system_prompt, user_content, json_mode, wear_type)
+    if use_cache:
+        cached = _lookup_response(cfg, cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    import requests
+
+    url, headers, payload = _build_request(system_prompt, user_content, json_mode)
+    payload["stream"] = True
+    # 最後のイベントで usage を返させる（トークン使用量の集計用）
+    payload["stream_options"] = {"include_usage": True}
+
+    last_error: Exception | None = None
+    for attempt in range(1, _MAX_RETRIES + 1):
+        parts: list[str] = []
+        slot = _acquire_slot()
+        done = False
+        error = None
+        try:
+            with _get_session().post(url, headers=headers, json=payload, stream=True, timeout=3600) as response:
+                response.raise_for_status()
+                for delta in _iter_stream_content(response):
+                    parts.append(delta)
+                    yield delta
+            done = True
+        except (requests.RequestException, KeyError, json.JSONDecodeError) as e:
+            error = last_error = e
+            if parts:
+                raise RuntimeError(f"LLM APIのストリーミング応答が途中で途切れました: {e}") from e
+        finally:
+            # 応答時間は受信し終えるまでの時間（呼び出し元が読むのをやめた場合は記録しない）
+            _release_slot(slot, done, error)
+        if done:
+            content = "".join(parts)
+            if validate is None or validate(content):
+                _store_response(cfg, cache_key, prompt_hash, wear_type, json_mode, content)
+            return
+        if attempt < _MAX_RETRIES:
+            time.sleep(_retry_delay(attempt, error))
+
+    raise RuntimeError(f"LLM API呼び出しに失敗しました（{_MAX_RETRIES}回試行）: {last_error}")
+
+
+def _iter_stream_content(response: "requests.Response") -> Iterator[str]:
+    """
+    SSE の data: 行を順に読み、choices[0].delta.content を返す。
+    usage を含むイベント（stream_options.include_usage）はトークン使用量の集計に加算する。
+    """
+    if "text/event-stream" not in response.headers.get("Content-Type", ""):
+        yield _extract_content(response.json())
+        return
+
+    usage_event: dict = {}
+    for line in response.iter_lines():
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        event = json.loads(data)
+        if event.get("usage"):
+            usage_event = event
+        for choice in event.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content and choice.get("index", 0) == 0:
+                yield content
+    _record_usage(usage_event)
+
+
+def stream_issues(
+    system_prompt: str,
+    user_content: str,
+    wear_type: str = "",
+    use_cache: bool = True,
+    cancelled: Callable[[], bool] | None = None,
+) -> Iterator[dict]:
+    """
+    JSONモードで stream_llm を呼び、応答の "issues" 配列の要素を1件閉じるごとに返す
+    （配列全体・応答全体の受信を待たない）。
+
+    応答全体を受信しても issues 配列が見つからなかった場合（JSON の前後に文章が付いた等）は、
+    parse_json_response() で全体を解釈し直した issues を返す。
+
+    Args:
+        cancelled: 断片を受信するごとに呼ぶ関数。True を返したら受信を中止する
+                   （接続を閉じて送信枠を返し、StreamCancelled を送出する）
+
+    Raises:
+        StreamCancelled: cancelled() が True を返した場合
+        RuntimeError:    LLM API呼び出しに失敗した場合
+    """
+    parts: list[str] = []
+
+    def _deltas() -> Iterator[str]:
+        # 中止時は stream_llm を明示的に閉じ、レスポンスの接続と送信枠をすぐに返す
+        with closing(stream_llm(system_prompt, user_content, json_mode=True,
+                                wear_type=wear_type, use_cache=use_cache)) as stream:
+            for delta in stream:
+                if cancelled is not None and cancelled():
+                    raise StreamCancelled("呼び出し元の指示で受信を中止しました")
+                parts.append(delta)
+                yield delta
+
+    found = False
+    for issue in _iter_issue_elements(_deltas()):
+        found = True
+        yield issue
+    if not found:
+        yield from parse_json_response("".join(parts)).get("issues", [])
+
+
+def _iter_issue_elements(deltas: Iterable[str]) -> Iterator:
+    """
+    JSON テキストの断片を順に受け取り、トップレベルのオブジェクトの "issues" 配列の要素を
+    閉じた順に json.loads して返す。解釈できない要素は読み飛ばす。
+
+    文字列リテラル（エスケープを含む）とかっこの深さだけを追跡する簡易な字句解析で、
+    要素の区切り（深さが配列の直下の , と ]）を見つける。
+    """
+    depth = 0
+    in_string = escape = False
+    key_chars: list[str] | None = None  # トップレベルで読んでいる文字列（キー判定用）
+    last_string = None
+    expect_array = False  # "issues": の直後
+    array_depth = 0       # issues 配列の直下の深さ（0 = 配列の外）
+    done = False
+    element: list[str] = []  # 読み途中の要素の、前の断片までの部分
+    element_start: int | None = None
+
+    for delta in deltas:
+        if done:
+            continue
+        if element_start is not None:
+            element_start = 0
+        for i, ch in enumerate(delta):
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+                    if key_chars is not None:
+                        last_string = "".join(key_chars)
+                        key_chars = None
+                elif key_chars is not None:
+                    key_chars.append(ch)
+                continue
+            if ch in " \t\r\n":
+                continue
+
+            if array_depth and depth == array_depth:
+                if ch in ",]":
+                    if element_start is not None:
+                        text = "".join(element) + delta[element_start:i]
+                        element, element_start = [], None
+                        try:
+                            yield json.loads(text)
+                        except json.JSONDecodeError:
+                            pass
+                    if ch == "]":
+                        depth -= 1
+                        done = True
+                        break
+                    continue
+                if element_start is None:
+                    element_start = i
+
+            if ch == '"':
+                in_string = True
+                if depth == 1 and not array_depth:
+                    key_chars = []
+            elif ch == ":":
+                expect_array = depth == 1 and last_string == "issues"
+                continue
+            elif ch in "{[":
+                depth += 1
+                if expect_array and ch == "[":
+                    array_depth = depth
+            elif ch in "}]":
+                depth -= 1
+            expect_array = False
+
+        if element_start is not None:
+            element.append(delta[element_start:])
+
+
+# ---------------------------------------------------------------------------
+# 非同期クライアント（asyncio）
+# ---------------------------------------------------------------------------
+
+def _get_async_state() -> dict:
+    """
+    実行中のイベントループ専用のセマフォと httpx.AsyncClient を返す。
+    asyncio のプリミティブはループをまたいで使えないため、ループごとに生成する。
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    state = _async_states.get(loop)
+    if state is None:
+        limit = _get_settings()["max_concurrency"]
+        client = None
+        try:
+            import httpx
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                timeout=3600,
+            )
+        except ImportError:
+            pass
+        state = {"semaphore": asyncio.Semaphore(limit), "client": client}
+        _async_states[loop] = state
+    return state
+
+
+async def acall_llm(
+    system_prompt: str,
+    user_content: str,
+    json_mode: bool = True,
+    wear_type: str = "",
+    use_cache: bool = True,
+    validate: Callable[[str], bool] | None = None,
+) -> str:
+    """
+    call_llm の非同期版。LLM APIを呼び出し、レスポンステキストを返す。
+
+    同時実行数は LLM_MAX_CONCURRENCY のセマフォで制限する。
+    httpx がインストールされていれば非同期HTTPで送信し、スレッドを消費しない。
+    未インストールの場合は call_llm をスレッドで実行する（同時実行数の制限は同じ）。
+    ペイロード・リトライ回数・バックオフ・レスポンスキャッシュは call_llm と共通。
+
+    Args:
+        system_prompt: システムプロンプト（ウェア）
+        user_content:  ユーザーメッセージ（解析対象コード等）
+        json_mode:     JSONフォーマットでのレスポンスを要求するか
+        wear_type:     ウェア名（レスポンスキャッシュのキーと記録に使用）
+        use_cache:     False の場合はレスポンスキャッシュを参照しない（結果は保存する）
+        validate:      レスポンスを受け取った後に呼ぶ関数。False を返した場合はキャッシュに保存しない
+
+    Returns:
+        LLMのレスポンス文字列。JSONモード時はJSON文字列。
+
+    Raises:
+        RuntimeError: 最大リトライ回数を超えてもAPIが成功しない場合
+    """
+    import asyncio
+
+    state = _get_async_state()
+    if state["client"] is None:
+        async with state["semaphore"]:
+            return await asyncio.to_thread(
+                call_llm, system_prompt, user_content, json_mode, wear_type, use_cache, validate
+            )
+
+    cfg = _get_settings()
+    cache_key, prompt_hash = _response_cache_key(cfg, system_prompt, user_content, json_mode, wear_type)
+    if use_cache:
+        cached = await asyncio.to_thread(_lookup_response, cfg, cache_key)
+        if cached is not None:
+            return cached
+
+    async with state["semaphore"]:
+        client = state["client"]
+        import httpx
+        url, headers, payload = _build_request(system_prompt, user_content, json_mode)
+
+        last_error: Exception | None = None
+        for attempt in range(1, _MAX_RETRIES + 1):
+            slot = await _aacquire_slot()
+            content = error = None
+            try:
+                response = await client.post(url, headers=headers, json=payload)
+                response.raise_for_status()
+                content = _extract_content(response.json())
+            except (httpx.HTTPError, KeyError, json.JSONDecodeError) as e:
+                error = last_error = e
+            finally:
+                _release_slot(slot, content is not None, error)
+            if content is not None:
+                if validate is None or validate(content):
+                    await asyncio.to_thread(
+                        _store_response, cfg, cache_key, prompt_hash, wear_type, json_mode, content
+                    )
+                return content
             if attempt < _MAX_RETRIES:
-                time.sleep(_RETRY_DELAY * attempt)
+                await asyncio.sleep(_retry_delay(attempt, error))
 
     raise RuntimeError(f"LLM API呼び出しに失敗しました（{_MAX_RETRIES}回試行）: {last_error}")
 
 
+async def aclose_async_client() -> None:
+    """実行中のイベントループに紐づく httpx.AsyncClient を閉じる。"""
+    import asyncio
+
+    state = _async_states.pop(asyncio.get_running_loop(), None)
+    if state and state["client"] is not None:
+        await state["client"].aclose()
+
+
 def parse_json_response(raw: str) -> dict:
     """
     LLMのレスポンスをJSONとしてパースする。
@@ -0,0 +1,292 @@
+"""
+解析キャッシュ: 変更のないファイルの AST 解析を省略する
+
+2段階のキャッシュを cache_manager のテーブルに保存する:
+  file_cache    : パス → (サイズ, 更新時刻, 内容ハッシュ)
+  parse_results : 内容ハッシュ → 解析結果（チャンクリスト・スケルトン）
+
+解析結果はファイル内容のハッシュ（と拡張子・PARSER_VERSION）をキーにするため、
+全ユースケースで共有され、ファイルの移動や同一内容のコピーでも再利用される。
+キャッシュにない場合は analyze_file() で1回だけ解析し、チャンクとスケルトンを両方保存する
+（チャンクだけが必要な監査の後に設計書生成を実行しても、再解析しない）。
+件数が AI_AUDIT_PARSE_CACHE_MAX_ENTRIES を超えた分は最終使用日時の古い順に削除する。
+
+内容ハッシュの判定:
+  1. os.stat のサイズと mtime_ns が保存値と一致 → ファイルを読まずに保存済みのハッシュを使う
+  2. 一致しない場合はファイルを読んでハッシュを計算し、保存し直す
+更新時刻の粒度より短い間隔で書き換えられたファイルを見逃さないよう、
+直近に更新されたファイルは mtime を保存せず、次回は必ず内容を読んで確認する。
+
+大量のファイルを順に解析する場合は iter_chunks() / iter_skeletons() を使う。
+キャッシュにないファイルをまとめてプロセスプールで並列に解析し（AI_AUDIT_PARSE_WORKERS）、
+結果は渡されたファイルの順に返す。
+
+公開API:
+  get_chunks(file_path)       : parse_chunks() のキャッシュ付き版
+  get_skeleton(file_path)     : generate_skeleton() のキャッシュ付き版
+  iter_chunks(file_paths)     : (ファイルパス, チャンクリスト) をファイル順に返す
+  iter_skeletons(file_paths)  : (ファイルパス, スケルトン) をファイル順に返す
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Iterable, Iterator
+
+from .ast_parser import analyze_file
+from .cache_manager import (
+    evict_parse_results,
+    get_file_fingerprint,
+    get_parse_result,
+    init_db,
+    save_file_fingerprint,
+    save_parse_result,
+)
+from .config_manager import load_config
+
+# 解析結果の形式や解析ロジックを変えたら上げる（保存済みの結果を無効にする）
+PARSER_VERSION = 1
+
+# この秒数以内に更新されたファイルは mtime を信用しない
+_RACY_WINDOW_SEC = 2.0
+# 解析結果をこの件数保存するごとに古いエントリを掃除する
+_EVICT_EVERY = 200
+
+# 並列解析: ワーカー1つあたりに1度に割り当てるファイル数の目安と、
+# プロセスプールを使う最小のキャッシュミス件数（少なければ起動コストの方が大きい）
+_FILES_PER_WORKER = 64
+_MIN_POOL_FILES = 32
+
+_save_lock = threading.Lock()
+_save_count = 0
+
+
+def get_chunks(file_path: str) -> list[dict]:
+    """
+    ソースファイルのチャンクリストを返す（parse_chunks() と同じ形式）。
+    内容が解析済みのファイルは解析せずに保存済みの結果を返す。
+    """
+    abs_path = os.path.abspath(file_path)
+    stored = _cached(abs_path, "chunks")
+    if isinstance(stored, str):
+        return _load_chunks(stored, abs_path)
+    return stored["chunks"]
+
+
+def iter_chunks(file_paths: Iterable[str], workers: int | None = None) -> Iterator[tuple[str, list[dict]]]:
+    """
+    複数ファイルのチャンクリストを、渡された順に (ファイルの絶対パス, チャンクリスト) で返す。
+    キャッシュにないファイルはプロセスプールで並列に解析する。
+
+    Args:
+        file_paths: 解析対象ファイルパスのイテラブル（ジェネレーターも可。少しずつ読み進める）
+        workers:    解析プロセス数（None の場合は AI_AUDIT_PARSE_WORKERS。1 なら並列化しない）
+    """
+    for abs_path, stored in _iter_parsed(file_paths, "chunks", workers):
+        if isinstance(stored, str):
+            yield abs_path, _load_chunks(stored, abs_path)
+        else:
+            yield abs_path, stored["chunks"]
+
+
+def iter_skeletons(file_paths: Iterable[str], workers: int | None = None) -> Iterator[tuple[str, str]]:
+    """
+    複数ファイルのスケルトンを、渡された順に (ファイルの絶対パス, スケルトン) で返す。
+    キャッシュにないファイルはプロセスプールで並列に解析する。
+    """
+    for abs_path, stored in _iter_parsed(file_paths, "skeleton", workers):
+        yield abs_path, stored if isinstance(stored, str) else stored["skeleton"]
+
+
+def get_skeleton(file_path: str) -> str:
+    """
+    ソースファイルのスケルトンコードを返す（generate_skeleton() と同じ形式）。
+    内容が解析済みのファイルは解析せずに保存済みの結果を返す。
+    """
+    stored = _cached(os.path.abspath(file_path), "skeleton")
+    if isinstance(stored, str):
+        return stored
+    return stored["skeleton"]
+
+
+def _cached(abs_path: str, field: str) -> str | dict:
+    """
+    parse_results に保存済みの field 列の文字列を返す。
+    保存されていない場合は _analyze_for_cache() で解析してチャンク・スケルトンを保存し、
+    解析結果の辞書を返す。
+    """
+    stored = _lookup(abs_path, field)
+    if stored is not None:
+        return stored
+    result = _analyze_for_cache(abs_path)
+    _store(abs_path, result)
+    return result
+
+
+def _lookup(abs_path: str, field: str) -> str | None:
+    """保存済みの解析結果を探す（未保存・ファイルが読めない場合は None）。"""
+    init_db()
+    content_hash = _content_hash(abs_path)
+    if content_hash is None:
+        return None
+    return get_parse_result(_parse_key(abs_path, content_hash), field)
+
+
+def _store(abs_path: str, result: dict) -> None:
+    """
+    _analyze_for_cache() の結果のうちチャンク・スケルトンを保存する。
+    キーには解析した内容そのもののハッシュを使う（_lookup() の後にファイルが保存し直されても、
+    新しい内容の解析結果を古い内容のキーで保存しない）。
+    """
+    save_parse_result(
+        _parse_key(abs_path, result["content_hash"]),
+        chunks=_dump_chunks(result["chunks"]),
+        skeleton=result["skeleton"],
+    )
+    _maybe_evict()
+
+
+def _iter_parsed(file_paths: Iterable[str], field: str, workers: int | None) -> Iterator[tuple[str, str | dict]]:
+    """
+    ファイルを一定件数ずつ区切り、区切りごとにキャッシュを引いてミスした分を並列に解析する。
+    (絶対パス, _cached() と同形式の値) をファイル順に返す。
+    """
+    if workers is None:
+        workers = load_config()["parse_workers"]
+    window_size = max(1, workers) * _FILES_PER_WORKER
+    # pool: 作成したプロセスプール / broken: プールが壊れたため以降は並列化しない
+    state: dict = {"pool": None, "broken": False}
+    try:
+        window: list[str] = []
+        for file_path in file_paths:
+            window.append(os.path.abspath(file_path))
+            if len(window) >= window_size:
+                yield from _parse_window(window, field, workers, state)
+                window = []
+        if window:
+            yield from _parse_window(window, field, workers, state)
+    finally:
+        if state["pool"] is not None:
+            state["pool"].shutdown(cancel_futures=True)
+
+
+def _parse_window(window: list[str], field: str, workers: int, state: dict):
+    """
+    1区切り分のファイルを処理して結果を順に yield する。
+    プロセスプールは必要になった時点で作成し、state["pool"] に保持して次の区切りでも使う。
+    """
+    lookups = [_lookup(abs_path, field) for abs_path in window]
+    misses = [abs_path for abs_path, stored in zip(window, lookups) if stored is None]
+
+    if workers > 1 and len(misses) >= _MIN_POOL_FILES and not state["broken"]:
+        if state["pool"] is None:
+            # プロセスプールを使うときだけ読み込む（起動時間に含めない）
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # 呼び出し元がスレッドを使っていても安全なよう、fork ではなく spawn で起動する
+            state["pool"] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        analyzed = _pool_map(misses, workers, state)
+    else:
+        analyzed = map(_analyze_for_cache, misses)
+
+    for abs_path, stored in zip(window, lookups):
+        if stored is None:
+            stored = next(analyzed)
+            _store(abs_path, stored)
+        yield abs_path, stored
+
+
+def _pool_map(misses: list[str], workers: int, state: dict):
+    """
+    プロセスプールで misses を解析した結果を順に返す。
+    ワーカーが異常終了してプールが壊れた場合（BrokenProcessPool）は、残りを
+    このプロセスで順に解析し、以降の区切りでもプールを使わない。
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    done = 0
+    try:
+        chunksize = max(1, len(misses) // (workers * 4))
+        for result in state["pool"].map(_analyze_for_cache, misses, chunksize=chunksize):
+            done += 1
+            yield result
+    except BrokenProcessPool as e:
+        print(f"[WARN] 解析プロセスが異常終了したため、並列解析を中止して順に解析します: {e}",
+              file=sys.stderr)
+        state["pool"].shutdown(cancel_futures=True)
+        state["pool"] = None
+        state["broken"] = True
+        yield from map(_analyze_for_cache, misses[done:])
+
+
+def _analyze_for_cache(abs_path: str) -> dict:
+    """
+    解析プロセスで実行する: ファイルを1回だけ読み、その内容のハッシュと、同じ内容を解析した
+    チャンク・スケルトンだけを返す。
+    """
+    with open(abs_path, "rb") as f:
+        data = f.read()
+    result = analyze_file(abs_path, data=data)
+    return {
+        "chunks": result["chunks"],
+        "skeleton": result["skeleton"],
+        "content_hash": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def _content_hash(abs_path: str) -> str | None:
+    """ファイル内容のハッシュを返す（stat が保存値と一致すればファイルを読まない）。"""
+    try:
+        st = os.stat(abs_path)
+    except OSError:
+        return None
+
+    entry = get_file_fingerprint(abs_path)
+    if entry is not None and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["content_hash"]
+
+    try:
+        with open(abs_path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+    mtime_ns = st.st_mtime_ns
+    if time.time() - st.st_mtime < _RACY_WINDOW_SEC:
+        mtime_ns = -1
+    save_file_fingerprint(abs_path, st.st_size, mtime_ns, content_hash)
+    return content_hash
+
+
+def _parse_key(abs_path: str, content_hash: str) -> str:
+    """解析結果のキー（同じ内容でも拡張子が違えば別の解析器を使うため区別する）。"""
+    ext = os.path.splitext(abs_path)[1].lower()
+    return f"v{PARSER_VERSION}:{ext}:{content_hash}"
+
+
+def _dump_chunks(chunks: list[dict]) -> str:
+    """チャンクリストを保存用のJSONにする（パスに依存する chunk_id は保存しない）。"""
+    return json.dumps(
+        [{k: v for k, v in chunk.items() if k != "chunk_id"} for chunk in chunks],
+        ensure_ascii=False,
+    )
+
+
+def _load_chunks(raw: str, abs_path: str) -> list[dict]:
+    """保存済みのチャンクリストに、読み出し元ファイルの chunk_id を付け直す。"""
+    return [{"chunk_id": f"{abs_path}:{chunk['name']}", **chunk} for chunk in json.loads(raw)]
+
+
+def _maybe_evict() -> None:
+    """一定件数の保存ごとに、上限を超えた古い解析結果を削除する。"""
+    global _save_count
+    with _save_lock:
+        _save_count += 1
+        evict_now = _save_count % _EVICT_EVERY == 1
+    if evict_now:
+        evict_parse_results(load_config()["parse_cache_max_entries"])
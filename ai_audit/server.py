@@ -0,0 +1,460 @@
+"""
+常駐サーバー: 監査・設計思想の抽出・検索を JSON-RPC 2.0 で受け付ける（serve サブコマンド）
+
+VSCode 拡張などから保存のたびに main.py を起動し直すと、毎回 requests・dotenv・
+tree-sitter などの import と SQLite の初期化が発生する。serve で起動した1つのプロセスに
+リクエストを送れば、パーサー・DB 接続・HTTP 接続プール・前回の解析結果
+（incremental_parser）がプロセス内に残り、2回目以降はすぐに処理を始められる。
+
+プロトコル: 1行に1つの JSON-RPC 2.0 メッセージ（UTF-8、改行区切り）
+  stdio（既定）: 標準入力からリクエストを読み、標準出力へレスポンスを書く。
+                 標準出力はプロトコル専用になるため、ログはすべて標準エラー出力へ出す
+  --port N     : 127.0.0.1:N の TCP で待ち受ける（接続ごとに同じ形式）
+
+メソッド:
+  ping                                   → {"pid": プロセスID}
+  audit        {path, force?, write_json?, stream?} → _audit.json と同じ形式の辞書（+ output_path）
+  extract_why  {directory, force?}       → null
+  search_why   {query, top_k?}           → search_why() の結果リスト
+  stats                                  → {"usage": トークン使用量, "concurrency": 同時リクエスト数・応答時間}
+  shutdown                               → null（応答後にサーバーを終了する）
+
+リクエストは並列に処理し、レスポンスは処理が終わった順に返す（id で対応付ける）。
+id のないリクエスト（通知）にはレスポンスを返さない。
+
+保存の連打に備え、audit は同じファイルごとにまとめて処理する:
+  - 依頼が届いてから AI_AUDIT_SERVE_DEBOUNCE_MS の間に次の依頼が届けば待ち直し、
+    最後の依頼から待ち時間が過ぎたら最新の内容を1回だけ監査する
+  - 監査中に次の依頼が届いた場合は、内容が変わったチャンクの未送信のLLMリクエストを中止し
+    （変わっていないチャンクの結果はそのまま保存する）、監査が終わり次第最新の内容で監査し直す
+  - まとめられた依頼には、すべて最新の内容の監査結果を返す
+
+audit で stream: true（省略時は LLM_STREAM）を指定すると、LLMの応答をストリーミングで受け取り、
+指摘が1件確定するごとにレスポンスより先に通知を送る:
+  {"jsonrpc": "2.0", "method": "audit/issue",
+   "params": {"path": ..., "chunk_id": ..., "wear_type": ..., "issue": {...}}}
+通知は途中経過で、最終的な結果はレスポンスが正となる（監査し直しになった場合は
+古い内容への指摘も通知されるほか、キャッシュヒットしたチャンクの指摘は通知しない）。
+"""
+import json
+import os
+import socketserver
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+# リクエストを並列に処理するスレッド数
+_MAX_WORKERS = 4
+
+# JSON-RPC 2.0 のエラーコード
+_PARSE_ERROR = -32700
+_INVALID_REQUEST = -32600
+_METHOD_NOT_FOUND = -32601
+_INVALID_PARAMS = -32602
+_SERVER_ERROR = -32000
+
+
+class _InvalidParams(ValueError):
+    """リクエストのパラメーターが不正（JSON-RPC の Invalid params として返す）。"""
+
+
+def serve(port: int | None = None) -> None:
+    """
+    サーバーを起動し、shutdown を受け取るか入力が閉じられるまでリクエストを処理する。
+
+    Args:
+        port: TCP で待ち受けるポート番号（None の場合は標準入出力を使う）
+    """
+    from .cache_manager import init_db
+
+    # 監査処理の print() がプロトコルに混ざらないよう、ログは標準エラー出力へ回す
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    from .config_manager import load_config
+
+    init_db()
+    _warm_up()
+    stop = threading.Event()
+    _stopping.clear()
+    # 閉じる順（逆順）: リクエスト処理 → 監査 → LLMリクエスト（投入済みの監査がLLMプールを使い終えてから閉じる）
+    with ThreadPoolExecutor(max_workers=load_config()["max_concurrency"],
+                            thread_name_prefix="ai_audit-llm") as llm_pool, \
+            ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="ai_audit-audit") as audit_pool, \
+            ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="ai_audit-serve") as executor:
+        _pools.update(audit=audit_pool, llm=llm_pool)
+        try:
+            if port is None:
+                print(f"[INFO] ai_audit サーバーを起動しました（stdio, pid={os.getpid()}）")
+                _serve_stream(sys.stdin.buffer, protocol_out.buffer, executor, stop)
+            else:
+                _serve_tcp(port, executor, stop)
+        finally:
+            # スレッドプールを閉じる前に、待ち時間中のタイマーから監査が投入されないようにする
+            _cancel_pending_audits()
+    print("[INFO] ai_audit サーバーを終了しました")
+
+
+def _warm_up() -> None:
+    """
+    最初のリクエストで待たせないよう、監査に使うモジュールを起動時に読み込んでおく
+    （CLI では遅延させている requests の import と HTTP セッションの生成もここで済ませる）。
+    """
+    from . import llm_client, parse_cache, usecase_a  # noqa: F401
+    llm_client._get_session()
+
+
+def _serve_tcp(port: int, executor: ThreadPoolExecutor, stop: threading.Event) -> None:
+    """127.0.0.1 の TCP で待ち受け、接続ごとに _serve_stream() で処理する。"""
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            _serve_stream(self.rfile, self.wfile, executor, stop)
+            if stop.is_set():
+                threading.Thread(target=server.shutdown, daemon=True).start()
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer(("127.0.0.1", port), _Handler) as server:
+        server.daemon_threads = True
+        print(f"[INFO] ai_audit サーバーを起動しました（127.0.0.1:{port}, pid={os.getpid()}）")
+        server.serve_forever()
+
+
+def _serve_stream(reader, writer, executor: ThreadPoolExecutor, stop: threading.Event) -> None:
+    """
+    1本の入出力ストリームからリクエストを読み、ワーカースレッドで処理してレスポンスを書く。
+    入力が閉じられた場合は、処理中のリクエストのレスポンスを書き終えてから戻る。
+    """
+    write_lock = threading.Lock()
+    pending = []
+
+    def _send(message: dict) -> None:
+        data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+        with write_lock:
+            try:
+                writer.write(data)
+                writer.flush()
+            except (OSError, ValueError):
+                pass  # クライアントが切断済み
+
+    def _notify(method: str, params: dict) -> None:
+        _send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            _send(_error(None, _PARSE_ERROR, f"JSON を解析できません: {e}"))
+            continue
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            _send(_error(request.get("id") if isinstance(request, dict) else None,
+                         _INVALID_REQUEST, "method がありません"))
+            continue
+
+        if request["method"] == "shutdown":
+            _wait_responses(pending)
+            if "id" in request:
+                _send({"jsonrpc": "2.0", "id": request["id"], "result": None})
+            stop.set()
+            return
+
+        pending = [f for f in pending if not _responded(f)]
+        pending.append(executor.submit(_handle, request, _send, _notify))
+
+    _wait_responses(pending)
+
+
+def _responded(future: Future) -> bool:
+    """_handle() の Future について、レスポンスの送信まで終わったか。"""
+    if not future.done():
+        return False
+    result = future.result()
+    return not isinstance(result, Future) or result.done()
+
+
+def _wait_responses(pending: list[Future]) -> None:
+    """受け付けたリクエストの処理（後から結果が決まる audit を含む）がすべて終わるまで待つ。"""
+    wait(pending)
+    wait([f.result() for f in pending if isinstance(f.result(), Future)])
+
+
+def _handle(request: dict, send, notify) -> Future | None:
+    """
+    1件のリクエストを処理し、id があればレスポンスを送る。
+    メソッドが Future を返した場合は、結果が決まった時点でレスポンスを送り、その Future を返す。
+    notify(method, params) はレスポンスより先にクライアントへ通知を送る関数（接続ごとに1つ）。
+    """
+    params = request.get("params") or {}
+    handler = _METHODS.get(request["method"])
+    if handler is None:
+        response = _error(request.get("id"), _METHOD_NOT_FOUND, f"不明なメソッドです: {request['method']}")
+    elif not isinstance(params, dict):
+        response = _error(request.get("id"), _INVALID_PARAMS, "params はオブジェクトで指定してください")
+    else:
+        response = _call(request, handler, params, notify)
+        result = response.get("result")
+        if isinstance(result, Future):
+            result.add_done_callback(lambda f: _reply(request, send, _call(request, f.result)))
+            return result
+    _reply(request, send, response)
+    return None
+
+
+def _reply(request: dict, send, response: dict) -> None:
+    if "id" in request:
+        send(response)
+
+
+def _call(request: dict, fn, *args) -> dict:
+    """fn(*args) を呼び、その戻り値または例外を JSON-RPC のレスポンスにする。"""
+    request_id = request.get("id")
+    try:
+        return {"jsonrpc": "2.0", "id": request_id, "result": fn(*args)}
+    except _InvalidParams as e:
+        return _error(request_id, _INVALID_PARAMS, str(e))
+    except SystemExit as e:
+        # 処理中の sys.exit()（依存パッケージ未インストールなど）でサーバーを止めない
+        return _error(request_id, _SERVER_ERROR,
+                      f"処理が中断されました（終了コード {e.code}）。詳細は標準エラー出力を参照してください")
+    except Exception as e:
+        print(f"[ERROR] {request['method']} の処理に失敗しました: {e}", file=sys.stderr)
+        return _error(request_id, _SERVER_ERROR, str(e))
+
+
+def _error(request_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+# ---------------------------------------------------------------------------
+# メソッド
+# ---------------------------------------------------------------------------
+
+def _ping(params: dict, notify) -> dict:
+    return {"pid": os.getpid()}
+
+
+def _audit(params: dict, notify) -> Future:
+    """
+    ファイルの監査を予約し、監査結果（_audit.json と同じ形式の辞書）が入る Future を返す。
+    同じファイルへの依頼はまとめて処理する（_schedule_audit() 参照）。
+    write_json（既定 True）の場合は CLI と同じく <ファイル名>_audit.json も書き出す。
+    stream の場合は、指摘が確定するごとに audit/issue 通知を送る。
+    """
+    from .config_manager import load_config
+
+    path = _require_str(params, "path")
+    if not os.path.isfile(path):
+        raise _InvalidParams(f"ファイルが見つかりません: {path}")
+    stream = params.get("stream")
+    if stream is None:
+        stream = load_config()["stream"]
+    return _schedule_audit(
+        os.path.abspath(path),
+        force=bool(params.get("force", False)),
+        write_json=bool(params.get("write_json", True)),
+        notify=notify if stream else None,
+    )
+
+
+# ---------------------------------------------------------------------------
+# audit の依頼のまとめ（ファイルごと）
+# ---------------------------------------------------------------------------
+
+_audits_lock = threading.Lock()
+# ファイルの絶対パス → 監査の状態
+#   waiters:  次の監査の結果を待つ Future のリスト
+#   timer:    待ち時間のタイマー（待機中のみ）
+#   running:  監査中なら True
+#   latest:   監査中にファイルが更新された場合、最新の内容の chunk_id → コードのハッシュ
+#   force / write_json: まとめた依頼のいずれかで指定されていれば True
+#   listeners: audit/issue 通知を送る notify 関数のリスト（同じ接続は1つにまとめる）
+_audits: dict[str, dict] = {}
+
+# serve() の間使い続けるスレッドプール
+#   audit: 待ち時間の過ぎた監査（_run_audit）を実行する
+#   llm:   監査のLLMリクエストを送る（audit_file の executor。監査ごとに作り直さない）
+# スレッドを使い回すことで、スレッドごとの SQLite 接続（cache_manager）と
+# tree-sitter パーサー（ast_parser）も監査をまたいで使い回される
+_pools: dict[str, ThreadPoolExecutor] = {}
+
+# serve() の終了処理が始まったらセットする（以降は監査を受け付けず、スレッドプールにも投入しない）
+_stopping = threading.Event()
+
+
+def _schedule_audit(abs_path: str, force: bool, write_json: bool, notify=None) -> Future:
+    """
+    監査の依頼を受け付ける。監査中でなければ待ち時間のタイマーを（再）設定し、
+    監査中なら古くなったチャンクの送信を止めるため最新の内容を解析しておく。
+    notify を渡した場合は、次の監査で確定した指摘をその接続へ通知する。
+    """
+    future: Future = Future()
+    with _audits_lock:
+        if _stopping.is_set():
+            future.set_exception(RuntimeError("サーバーの終了処理中のため監査を受け付けられません"))
+            return future
+        state = _audits.setdefault(abs_path, {
+            "waiters": [], "timer": None, "running": False, "latest": None,
+            "force": False, "write_json": False, "listeners": [],
+        })
+        state["waiters"].append(future)
+        if notify is not None and notify not in state["listeners"]:
+            state["listeners"].append(notify)
+        state["force"] = state["force"] or force
+        state["write_json"] = state["write_json"] or write_json
+        running = state["running"]
+        if not running:
+            _restart_timer(abs_path, state)
+    if running:
+        state["latest"] = _current_hashes(abs_path)
+    return future
+
+
+def _restart_timer(abs_path: str, state: dict) -> None:
+    """待ち時間のタイマーを設定し直す（_audits_lock を保持して呼ぶ）。"""
+    from .config_manager import load_config
+
+    if state["timer"] is not None:
+        state["timer"].cancel()
+    # タイマーのスレッドは投入するだけで、監査は常駐のスレッドプールで行う
+    delay = load_config()["serve_debounce_ms"] / 1000
+    timer = threading.Timer(delay, lambda: _submit_audit(abs_path, timer))
+    timer.daemon = True
+    state["timer"] = timer
+    timer.start()
+
+
+def _submit_audit(abs_path: str, timer: threading.Timer) -> None:
+    """待ち時間が過ぎたファイルの監査をスレッドプールに投入する（タイマーのスレッドから呼ばれる）。"""
+    with _audits_lock:
+        # 終了処理中はスレッドプールが閉じられているため投入しない（待っている依頼は
+        # _cancel_pending_audits() がエラーにする）。ロック待ちの間に取り消されたタイマーも投入しない
+        state = _audits.get(abs_path)
+        if _stopping.is_set() or state is None or state["timer"] is not timer:
+            return
+        state["timer"] = None
+        _pools["audit"].submit(_run_audit, abs_path)
+
+
+def _cancel_pending_audits() -> None:
+    """
+    終了処理: 以降の監査の受け付けと投入を止め、待ち時間中（未投入）の監査のタイマーを止めて、
+    待っている依頼にエラーを返す。投入済み・監査中のものはそのまま完了させる。
+    """
+    with _audits_lock:
+        _stopping.set()
+        waiters = []
+        for abs_path, state in list(_audits.items()):
+            if state["timer"] is not None:
+                state["timer"].cancel()
+                waiters += state["waiters"]
+                del _audits[abs_path]
+    for future in waiters:
+        future.set_exception(RuntimeError("サーバーを終了するため監査を中止しました"))
+
+
+def _run_audit(abs_path: str) -> None:
+    """
+    待ち時間が過ぎたファイルを監査する。
+    監査中に新しい依頼が届いていれば、結果を返さずに待っていた依頼ごと次の監査に回す。
+    """
+    from .cache_manager import compute_hash
+    from .usecase_a import audit_file, build_audit_output, save_audit_json
+
+    with _audits_lock:
+        state = _audits[abs_path]
+        waiters, force, write_json = state["waiters"], state["force"], state["write_json"]
+        listeners = state["listeners"]
+        state.update(waiters=[], timer=None, running=True, latest=None, force=False, write_json=False,
+                     listeners=[])
+
+    def _is_stale(chunk: dict) -> bool:
+        latest = state["latest"]
+        return latest is not None and latest.get(chunk["chunk_id"]) != compute_hash(chunk["code"])
+
+    def _on_issue(chunk_id: str, wear_type: str, issue: dict) -> None:
+        params = {"path": abs_path, "chunk_id": chunk_id, "wear_type": wear_type, "issue": issue}
+        for notify in listeners:
+            notify("audit/issue", params)
+
+    output = error = None
+    try:
+        results = audit_file(abs_path, force=force, incremental=True, is_stale=_is_stale,
+                             on_issue=_on_issue if listeners else None, executor=_pools["llm"])
+        output = build_audit_output(abs_path, results)
+        output["output_path"] = None
+        if results and write_json:
+            output["output_path"] = save_audit_json(abs_path, results)
+    except BaseException as e:  # 待っている依頼に返す
+        error = e
+
+    with _audits_lock:
+        state["running"] = False
+        # 終了処理中は監査し直さず、監査中に届いた依頼にもこの結果を返す
+        if state["waiters"] and not _stopping.is_set():
+            print(f"[INFO] 監査中に更新されたため、最新の内容で監査し直します: {abs_path}")
+            state["waiters"][:0] = waiters
+            state["force"] = state["force"] or force
+            state["write_json"] = state["write_json"] or write_json
+            state["listeners"] += [n for n in listeners if n not in state["listeners"]]
+            _restart_timer(abs_path, state)
+            return
+        waiters += state["waiters"]
+        del _audits[abs_path]
+
+    for future in waiters:
+        if error is None:
+            future.set_result(output)
+        else:
+            future.set_exception(error)
+
+
+def _current_hashes(abs_path: str) -> dict[str, str]:
+    """ファイルの現在の内容のチャンクごとのコードのハッシュを返す。"""
+    from .cache_manager import compute_hash
+    from .parse_cache import get_chunks
+
+    return {chunk["chunk_id"]: compute_hash(chunk["code"]) for chunk in get_chunks(abs_path)}
+
+
+def _extract_why(params: dict, notify) -> None:
+    from .usecase_b import extract_why
+
+    directory = _require_str(params, "directory")
+    if not os.path.isdir(directory):
+        raise _InvalidParams(f"ディレクトリが見つかりません: {directory}")
+    extract_why(directory, force=bool(params.get("force", False)))
+
+
+def _search_why(params: dict, notify) -> list[dict]:
+    from .usecase_b import search_why
+
+    top_k = params.get("top_k", 5)
+    if not isinstance(top_k, int) or top_k < 1:
+        raise _InvalidParams("top_k は1以上の整数で指定してください")
+    return search_why(_require_str(params, "query"), top_k=top_k)
+
+
+def _stats(params: dict, notify) -> dict:
+    """LLM のトークン使用量と、同時リクエスト数の自動調整の状態・応答時間のパーセンタイルを返す。"""
+    from .llm_client import get_concurrency_stats, get_usage_stats
+
+    return {"usage": get_usage_stats(), "concurrency": get_concurrency_stats()}
+
+
+def _require_str(params: dict, key: str) -> str:
+    value = params.get(key)
+    if not isinstance(value, str) or not value:
+        raise _InvalidParams(f"{key} は空でない文字列で指定してください")
+    return value
+
+
+_METHODS = {
+    "ping": _ping,
+    "audit": _audit,
+    "extract_why": _extract_why,
+    "search_why": _search_why,
+    "stats": _stats,
+}
@@ -10,6 +10,12 @@
 # デフォルトの文字数ハードリミット（日本語・英語混在で約4096トークン相当の安全値）
 DEFAULT_CHAR_LIMIT = 2000
 
+# 1リクエストに束ねる対象とする「小さいチャンク」の上限文字数
+PACK_CHUNK_CHAR_LIMIT = 600
+
+# 束ねたリクエストでチャンクごとに付く見出し・コードフェンスの概算文字数
+_PACK_OVERHEAD_CHARS = 40
+
 
 def estimate_tokens(text: str) -> int:
     """
@@ -61,3 +67,44 @@ def truncate_to_limit(text: str, limit: int = DEFAULT_CHAR_LIMIT) -> str:
         return text
     truncated = text[:limit - 50]
     return truncated + "\n... (トークン制限のため以降省略)"
+
+
+def pack_small_chunks(
+    chunks: list[dict],
+    limit: int = DEFAULT_CHAR_LIMIT,
+    small_limit: int = PACK_CHUNK_CHAR_LIMIT,
+) -> list[list[dict]]:
+    """
+    小さいチャンクを文字数制限内で束ね、1リクエストで送るグループに分ける。
+
+    small_limit 文字以下のチャンクだけを元の順序のまま先頭から詰めていき（First Fit）、
+    それより大きいチャンクは単独のグループにする。グループの並びは元の順序を保つ。
+
+    Args:
+        chunks:      parse_chunks() が返すチャンクのリスト
+        limit:       1グループあたりの最大文字数（デフォルト: 2000）
+        small_limit: 束ねる対象とするチャンクの最大文字数（デフォルト: 600）
+
+    Returns:
+        チャンクのグループのリスト（各グループは1件以上）
+    """
+    groups: list[list[dict]] = []
+    open_groups: list[tuple[list[dict], list[int]]] = []  # (グループ, [使用文字数])
+
+    for chunk in chunks:
+        size = len(chunk["code"]) + _PACK_OVERHEAD_CHARS
+        if len(chunk["code"]) > small_limit:
+            groups.append([chunk])
+            continue
+
+        for group, used in open_groups:
+            if used[0] + size <= limit:
+                group.append(chunk)
+                used[0] += size
+                break
+        else:
+            group = [chunk]
+            groups.append(group)
+            open_groups.append((group, [size]))
+
+    return groups
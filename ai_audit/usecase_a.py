@@ -13,39 +13,97 @@
 """
 import json
 import os
+import queue
 import sys
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Iterable
 
-from .ast_parser import get_lang, parse_chunks, scan_python_files, scan_source_files
+from .ast_parser import get_lang, scan_python_files, scan_source_files
 from .cache_manager import (
+    compute_audit_fingerprint,
     compute_hash,
-    get_audit_results,
-    get_chunk_hash,
+    get_audit_fingerprints_for_file,
+    get_audit_results_for_file,
     init_db,
     save_audit_result,
-    update_chunk_hash,
+    transaction,
+    update_audit_fingerprint,
 )
-from .llm_client import call_llm, parse_json_response
-from .token_counter import truncate_to_limit
-from .wear_manager import get_wear
+from .config_manager import load_config
+from .incremental_parser import parse_incremental
+from .llm_client import StreamCancelled, call_llm, parse_json_response, stream_issues
+from .parse_cache import get_chunks, iter_chunks
+from .token_counter import pack_small_chunks, truncate_to_limit
+from .wear_manager import build_combined_wear, get_wear, get_wear_hash, split_combined_response
+
+# concurrent.futures は logging ごと読み込まれて重いため、LLM監査が必要になるまで import しない
+# （全チャンクがキャッシュヒットする監査では読み込まない）
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
 
 # ユースケースAで使用するウェアのリスト
 AUDIT_WEARS = ["security", "readability"]
 
+# プロンプト中の言語表記とコードブロックの言語指定
+_LANG_LABELS = {"python": "Python", "javascript": "JavaScript", "typescript": "TypeScript"}
+_CODE_BLOCK_LANGS = {"python": "python", "javascript": "javascript", "typescript": "typescript"}
 
-def audit_file(file_path: str, force: bool = False) -> dict:
+# フォルダ一括監査: 探索・解析ステージが先行してよいファイル数
+_PARSE_AHEAD_FILES = 32
+# フォルダ一括監査: LLM未完了チャンク数がワーカー数×この値を超えたら新規投入を止める
+_QUEUE_DEPTH_FACTOR = 4
+# フォルダ一括監査: 完了待ちのポーリング間隔（秒）と進捗表示の最小間隔（秒）
+_POLL_INTERVAL = 0.2
+_PROGRESS_INTERVAL = 5.0
+
+
+class AuditCancelled(RuntimeError):
+    """監査中にファイルが更新され、古い内容のチャンクの監査を中止した。"""
+
+
+def audit_file(
+    file_path: str,
+    force: bool = False,
+    concurrency: int | None = None,
+    combine_wears: bool | None = None,
+    pack_chunks: bool | None = None,
+    incremental: bool = False,
+    is_stale: Callable[[dict], bool] | None = None,
+    on_issue: Callable[[str, str, dict], None] | None = None,
+    executor: "ThreadPoolExecutor | None" = None,
+) -> dict:
     """
     指定ファイルを多重マイクロ監査する。
 
     処理フロー:
       1. ASTパーサーでチャンク抽出
-      2. 各チャンクのSHA-256を計算し、キャッシュと比較
-      3. 変更ありチャンクに対して複数ウェアでLLM監査
-      4. 結果をSQLiteに保存
+      2. チャンク×ウェアごとのフィンガープリント（コード・モデル名・ウェアプロンプトの
+         ハッシュ）を計算し、キャッシュと比較
+      3. 変更のあったチャンク×ウェアだけをLLM監査（チャンク×ウェアを並列送信）
+      4. 結果をSQLiteに保存（送信の完了順ではなくチャンク順×ウェア順で保存）
       5. 全結果を audit.json として返す
 
     Args:
-        file_path: 監査対象のPythonファイルパス
-        force:     True の場合はキャッシュを無視して再監査
+        file_path:   監査対象のPythonファイルパス
+        force:       True の場合はキャッシュを無視して再監査
+        concurrency: LLM への同時リクエスト数（None の場合は LLM_MAX_CONCURRENCY）
+        combine_wears: True の場合は全ウェアを1リクエストにまとめて送る
+                     （None の場合は AI_AUDIT_COMBINE_WEARS）
+        pack_chunks: True の場合は小さいチャンクを束ねて1リクエストで送る
+                     （None の場合は AI_AUDIT_PACK_CHUNKS）
+        incremental: True の場合は前回の解析結果をメモリに保持し、変更箇所だけを解析し直す
+                     （同じファイルを繰り返し監査する常駐プロセス向け。incremental_parser 参照）
+        is_stale:    監査中にファイルが書き換えられた場合に、古い内容のチャンクで True を返す関数。
+                     LLMに送る直前に呼び、True のチャンクは送らずに中止する
+                     （フィンガープリントを更新しないため、次回の監査で新しい内容を監査する）
+        on_issue:    LLMが返した指摘を1件ずつ受け取る関数 on_issue(chunk_id, wear_type, issue)。
+                     指定した場合はLLMの応答をストリーミングで受け取り、1チャンク×1ウェアの
+                     リクエストでは応答の完了を待たずに指摘が閉じた時点で呼ぶ
+                     （ワーカースレッドから呼ばれる。キャッシュヒットした結果では呼ばない）
+        executor:    LLMリクエストを送るスレッドプール（常駐プロセスで監査をまたいで使い回す場合）。
+                     None の場合は concurrency のワーカー数で監査ごとに作成する
 
     Returns:
         監査結果の辞書。キーはchunk_id、値はissuesリスト。
@@ -58,65 +116,508 @@ def audit_file(file_path: str, force: bool = False) -> dict:
         return {}
 
     print(f"[INFO] 監査開始: {abs_path}")
-    chunks = parse_chunks(abs_path)
+    job = _prepare_file(abs_path, force, incremental=incremental)
 
-    if not chunks:
+    if not job["chunks"]:
         print("[INFO] 解析可能な関数・クラスが見つかりませんでした。", file=sys.stderr)
         return {}
 
-    print(f"[INFO] {len(chunks)} チャンクを抽出しました。")
+    print(f"[INFO] {len(job['chunks'])} チャンクを抽出しました。")
+    _print_cache_hits(job)
+
+    if not job["pending"]:
+        return job["results"]
+
+    workers = _resolve_concurrency(concurrency)
+    options = _resolve_options(combine_wears, pack_chunks, force)
+    options["is_stale"] = is_stale
+    options["on_issue"] = on_issue
+    if executor is not None:
+        _submit_file(job, executor, options)
+        return _finalize_file(job)
+    task_count = sum(len(stale) for _, stale in job["pending"])
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(workers, task_count)) as executor:
+        _submit_file(job, executor, options)
+        return _finalize_file(job)
+
+
+def _audit_keys() -> dict[str, tuple[str, str]]:
+    """
+    ウェアごとの (モデル名, ウェアプロンプトのハッシュ) を返す。
+    監査フィンガープリントの材料で、モデルやウェアの変更はそのウェアのキャッシュだけを無効にする。
+    """
+    model = load_config()["model_name"]
+    return {wear_type: (model, get_wear_hash(wear_type)) for wear_type in AUDIT_WEARS}
+
 
-    all_results: dict[str, list] = {}
+def _prepare_file(
+    abs_path: str,
+    force: bool,
+    audit_keys: dict[str, tuple[str, str]] | None = None,
+    incremental: bool = False,
+    chunks: list[dict] | None = None,
+) -> dict:
+    """
+    ファイルをチャンク化し、キャッシュと比較して監査ジョブを組み立てる（LLMは呼ばない）。
+    フィンガープリントと監査結果はファイル単位でまとめて読み出し、判定はメモリ上で行う
+    （変更のないファイルはDBへの問い合わせ2回で済む）。
+
+    Args:
+        abs_path:   ファイルの絶対パス
+        force:      True の場合はキャッシュを無視して全ウェアを再監査
+        audit_keys: _audit_keys() の戻り値（None の場合はここで計算する）
+        incremental: True の場合は incremental_parser で解析する（変更のないチャンクは
+                    前回のハッシュを使い回す）
+        chunks:     解析済みのチャンクリスト（iter_chunks() 等で先に解析した場合。
+                    None の場合はここで解析する）
+
+    Returns:
+        監査ジョブの辞書:
+          - path:    ファイルの絶対パス
+          - chunks:  get_chunks() の戻り値
+          - results: chunk_id → issues（チャンク順。未監査チャンクは空リストで予約）
+          - cached:  全ウェアがキャッシュヒットしたチャンク名のリスト
+          - pending: 監査が必要な (チャンク, {wear_type: 新しいフィンガープリント}) のリスト。
+                     辞書には再監査が必要なウェアだけが入る
+          - stored:  chunk_id → DBに保存済みの監査結果（キャッシュを使うチャンクのみ）
+          - tasks:   (chunk_id, wear_type) → LLMタスク（_submit_file() で設定）。
+                     1タスクが複数ウェアを担当する場合は同じタスクを共有する。
+    """
+    if audit_keys is None:
+        audit_keys = _audit_keys()
+    known_hashes: dict[str, str] = {}
+    if incremental:
+        parsed = parse_incremental(abs_path)
+        chunks, known_hashes = parsed["chunks"], parsed["hashes"]
+    elif chunks is None:
+        chunks = get_chunks(abs_path)
+    job: dict = {
+        "path": abs_path,
+        "chunks": chunks,
+        "results": {},
+        "cached": [],
+        "pending": [],
+        "stored": {},
+        "tasks": {},
+    }
+    if not chunks:
+        return job
+
+    stored_fingerprints = get_audit_fingerprints_for_file(abs_path) if not force else {}
+    reuses_results = False
 
     for chunk in chunks:
         chunk_id = chunk["chunk_id"]
-        code = chunk["code"]
-        current_hash = compute_hash(code)
+        current_hash = known_hashes.get(chunk_id) or compute_hash(chunk["code"])
+        cached = stored_fingerprints.get(chunk_id, {})
+
+        stale: dict[str, str] = {}
+        for wear_type in AUDIT_WEARS:
+            fingerprint = compute_audit_fingerprint(current_hash, *audit_keys[wear_type])
+            if cached.get(wear_type) != fingerprint:
+                stale[wear_type] = fingerprint
+        reuses_results = reuses_results or len(stale) < len(AUDIT_WEARS)
+
+        # 出力順をチャンク順に保つため、先にキーだけ確保しておく
+        job["results"][chunk_id] = []
+        if stale:
+            job["pending"].append((chunk, stale))
+        else:
+            job["cached"].append(chunk["name"])
+
+    if reuses_results:
+        stored = get_audit_results_for_file(abs_path)
+        pending_ids = {chunk["chunk_id"] for chunk, _ in job["pending"]}
+        for chunk_id in job["results"]:
+            if chunk_id in pending_ids:
+                job["stored"][chunk_id] = stored.get(chunk_id, [])
+            else:
+                job["results"][chunk_id] = stored.get(chunk_id, [])
 
-        cached_hash = get_chunk_hash(chunk_id) if not force else None
-        if cached_hash == current_hash:
-            print(f"  [SKIP] {chunk['name']} (キャッシュヒット)")
-            all_results[chunk_id] = get_audit_results(chunk_id)
+    return job
+
+
+def _print_cache_hits(job: dict) -> None:
+    """キャッシュヒットしたチャンクを表示する。"""
+    for name in job["cached"]:
+        print(f"  [SKIP] {name} (キャッシュヒット)")
+
+
+def _submit_file(job: dict, executor: "ThreadPoolExecutor", options: dict) -> None:
+    """
+    ジョブの未監査チャンクをLLMタスクとしてエグゼキューターに投入する。
+
+    通常は再監査が必要なチャンク×ウェアごとに1リクエストを送る。
+      - options["combine_wears"]: チャンクごとに再監査が必要な全ウェアを1リクエストにまとめる
+      - options["pack_chunks"]:   小さいチャンクを文字数制限内で束ねて1リクエストにする
+    束ねる対象は、再監査が必要なウェアの組み合わせが同じチャンク同士に限る。
+    """
+    by_wears: dict[tuple[str, ...], list[dict]] = {}
+    for chunk, stale in job["pending"]:
+        wears = tuple(w for w in AUDIT_WEARS if w in stale)
+        by_wears.setdefault(wears, []).append(chunk)
+
+    for wears, chunks in by_wears.items():
+        groups = pack_small_chunks(chunks) if options["pack_chunks"] else [[chunk] for chunk in chunks]
+        wear_groups = [wears] if options["combine_wears"] else [(w,) for w in wears]
+        _submit_groups(job, executor, options, groups, wear_groups)
+
+
+def _submit_groups(
+    job: dict,
+    executor: "ThreadPoolExecutor",
+    options: dict,
+    groups: list[list[dict]],
+    wear_groups: list[tuple[str, ...]],
+) -> None:
+    """チャンク群×ウェア群の組み合わせごとにLLMタスクを投入し、job["tasks"] に登録する。"""
+    is_stale = options.get("is_stale")
+    on_issue = options.get("on_issue")
+    for group in groups:
+        for wear_types in wear_groups:
+            task = {
+                "chunk_ids": [chunk["chunk_id"] for chunk in group],
+                "wear_types": wear_types,
+                "cancelled": set(),
+            }
+            if is_stale is None:
+                task["future"] = executor.submit(
+                    _audit_chunks, group, wear_types, options["use_cache"], on_issue
+                )
+            else:
+                task["future"] = executor.submit(
+                    _audit_live_chunks, group, wear_types, options["use_cache"], is_stale,
+                    task["cancelled"], on_issue,
+                )
+            for chunk in group:
+                for wear_type in wear_types:
+                    job["tasks"][(chunk["chunk_id"], wear_type)] = task
+
+
+def _unique_futures(tasks) -> list:
+    """タスク群の Future を重複なしで返す（複数ウェア・複数チャンクで共有される場合がある）。"""
+    return list({id(t["future"]): t["future"] for t in tasks}.values())
+
+
+def _job_futures(job: dict) -> list:
+    """ジョブに投入済みの Future の一覧（重複なし）を返す。"""
+    return _unique_futures(job["tasks"].values())
+
+
+def _finalize_file(job: dict) -> dict:
+    """
+    投入済みのLLM監査の完了を待ち、結果をSQLiteに保存する。
+    DBへの保存はメインスレッドでチャンク順×ウェア順に行い、1ファイル分を1トランザクションで
+    コミットする。フィンガープリントは監査に成功したウェアだけ更新するため、失敗したウェアは次回再監査される。
+    再監査が不要だったウェアの結果はDBから読み出して合わせる。
+
+    Returns:
+        監査結果の辞書（audit_file() の戻り値と同形式）
+    """
+    from concurrent.futures import wait
+
+    # ワーカーもレスポンスキャッシュへ書き込むため、書き込みロックは全タスクの完了後に取る
+    wait(_job_futures(job))
+    with transaction():
+        for chunk, stale in job["pending"]:
+            chunk_id = chunk["chunk_id"]
+            print(f"  [AUDIT] {chunk['type']}: {chunk['name']}")
+            chunk_issues: list[dict] = []
+
+            for wear_type in AUDIT_WEARS:
+                if wear_type not in stale:
+                    issues = [r for r in job["stored"][chunk_id] if r["wear_type"] == wear_type]
+                    chunk_issues.extend(issues)
+                    print(f"    [{wear_type}] キャッシュヒット ({len(issues)} 件の指摘)")
+                    continue
+                try:
+                    issues = _task_issues(job["tasks"][(chunk_id, wear_type)], chunk_id, wear_type)
+                    save_audit_result(chunk_id, wear_type, issues)
+                    update_audit_fingerprint(chunk_id, wear_type, stale[wear_type])
+                    chunk_issues.extend(issues)
+                    print(f"    [{wear_type}] {len(issues)} 件の指摘")
+                except AuditCancelled:
+                    print(f"    [CANCEL] {wear_type}: ファイルが更新されたため中止しました")
+                except RuntimeError as e:
+                    print(f"    [ERROR] {wear_type} 監査失敗: {e}", file=sys.stderr)
+
+            job["results"][chunk_id] = chunk_issues
+
+    return job["results"]
+
+
+def _task_issues(task: dict, chunk_id: str, wear_type: str) -> list[dict]:
+    """
+    LLMタスクの結果から指定チャンク・ウェアの issues を取り出す。
+
+    Raises:
+        AuditCancelled: チャンクが古い内容になったため送信を中止した場合
+        RuntimeError: LLM呼び出しが失敗した、またはレスポンスに該当ウェアが含まれない場合
+    """
+    result = task["future"].result()
+    if chunk_id in task["cancelled"]:
+        raise AuditCancelled(chunk_id)
+    issues = result.get(chunk_id, {}).get(wear_type)
+    if issues is None:
+        raise RuntimeError(f"レスポンスに {wear_type} の結果が含まれていません")
+    return issues
+
+
+def _resolve_concurrency(concurrency: int | None) -> int:
+    """引数または LLM_MAX_CONCURRENCY から同時リクエスト数を決定する（最小1）。"""
+    if concurrency is None:
+        concurrency = load_config()["max_concurrency"]
+    return max(1, concurrency)
+
+
+def _resolve_options(combine_wears: bool | None, pack_chunks: bool | None, force: bool) -> dict:
+    """
+    LLMリクエストの送り方のオプションを、引数（None の場合は .env の設定）から決定する。
+    force=True の場合は LLMレスポンスキャッシュも参照しない。
+    """
+    cfg = load_config()
+    return {
+        "combine_wears": cfg["combine_wears"] if combine_wears is None else combine_wears,
+        "pack_chunks":   cfg["pack_chunks"] if pack_chunks is None else pack_chunks,
+        "use_cache":     not force,
+    }
+
+
+def _audit_chunks(
+    chunks: list[dict],
+    wear_types: tuple[str, ...],
+    use_cache: bool = True,
+    on_issue: Callable[[str, str, dict], None] | None = None,
+    is_stale: Callable[[dict], bool] | None = None,
+) -> dict[str, dict[str, list]]:
+    """
+    チャンク群を指定ウェアでLLM監査する（1リクエスト）。
+    ウェアが複数なら観点をまとめ、チャンクが複数なら見出しIDをキーにして束ねて送る。
+    ワーカースレッドから呼ばれるため、DBへの書き込みは行わない。
+
+    on_issue を指定した場合、1チャンク×1ウェアのリクエストは stream_issues() で送り、
+    指摘を受信した順に on_issue に渡す。束ねたリクエストは応答の完了後にまとめて渡す
+    （応答のキー構造を解析し終えるまで、どのチャンク・ウェアの指摘か確定しないため）。
+
+    is_stale を指定した場合も1チャンク×1ウェアのリクエストはストリーミングで受け取り、
+    断片を受信するごとにチャンクが古い内容になっていないか確認する。古くなっていれば
+    受信を中止して（GPU での生成を打ち切らせ、送信枠を返す）AuditCancelled を送出する。
+    束ねたリクエストは送信後には中止できない。
+
+    Returns:
+        {chunk_id: {wear_type: issuesリスト}}。
+        レスポンスに含まれなかったチャンク・ウェアはキーを持たない。
+
+    Raises:
+        AuditCancelled: 受信中にチャンクが古い内容になったため中止した場合
+        RuntimeError: LLM API呼び出しに失敗した場合
+    """
+    if len(wear_types) == 1:
+        system_prompt = get_wear(wear_types[0])
+    else:
+        system_prompt = build_combined_wear(list(wear_types))
+
+    if len(chunks) == 1:
+        user_content = _audit_user_content(chunks[0])
+    else:
+        user_content = _packed_user_content(chunks)
+
+    if (on_issue is not None or is_stale is not None) and len(chunks) == 1 and len(wear_types) == 1:
+        chunk, wear_type = chunks[0], wear_types[0]
+        cancelled = (lambda: is_stale(chunk)) if is_stale is not None else None
+        issues = []
+        try:
+            for issue in stream_issues(system_prompt, user_content, wear_type=wear_type,
+                                       use_cache=use_cache, cancelled=cancelled):
+                issues.append(issue)
+                if on_issue is not None:
+                    on_issue(chunk["chunk_id"], wear_type, issue)
+        except StreamCancelled:
+            raise AuditCancelled(chunk["chunk_id"]) from None
+        return {chunk["chunk_id"]: {wear_type: issues}}
+
+    # 一部のチャンク・ウェアが欠けた応答はキャッシュに保存しない（次回の再監査で同じ応答を返さないため）
+    raw_response = call_llm(
+        system_prompt, user_content, json_mode=True,
+        wear_type="+".join(wear_types), use_cache=use_cache,
+        validate=lambda raw: _is_complete(_parse_audit_response(raw, chunks, wear_types), chunks, wear_types),
+    )
+    result = _parse_audit_response(raw_response, chunks, wear_types)
+    if on_issue is not None:
+        for chunk_id, by_wear in result.items():
+            for wear_type, issues in by_wear.items():
+                for issue in issues:
+                    on_issue(chunk_id, wear_type, issue)
+    return result
+
+
+def _parse_audit_response(
+    raw: str, chunks: list[dict], wear_types: tuple[str, ...]
+) -> dict[str, dict[str, list]]:
+    """
+    監査リクエストの応答を {chunk_id: {wear_type: issuesリスト}} に分解する。
+    束ねたリクエストは見出しID（c1, c2, ...）、統合したリクエストはウェア名をキーに取り出す。
+    """
+    parsed = parse_json_response(raw)
+
+    if len(chunks) == 1:
+        answers = {chunks[0]["chunk_id"]: parsed}
+    else:
+        answers = {chunk["chunk_id"]: parsed.get(f"c{i}") for i, chunk in enumerate(chunks, 1)}
+
+    result: dict[str, dict[str, list]] = {}
+    for chunk_id, answer in answers.items():
+        if not isinstance(answer, dict):
             continue
+        if len(wear_types) == 1:
+            result[chunk_id] = {wear_types[0]: answer.get("issues", [])}
+        else:
+            result[chunk_id] = split_combined_response(answer, list(wear_types))
+    return result
+
+
+def _is_complete(
+    result: dict[str, dict[str, list]], chunks: list[dict], wear_types: tuple[str, ...]
+) -> bool:
+    """応答に全チャンク×全ウェアの結果が含まれているか。"""
+    return all(
+        wear_type in result.get(chunk["chunk_id"], {})
+        for chunk in chunks
+        for wear_type in wear_types
+    )
 
-        print(f"  [AUDIT] {chunk['type']}: {chunk['name']}")
-        truncated_code = truncate_to_limit(code)
-        chunk_issues: list[dict] = []
 
-        lang = chunk.get("lang", "python")
-        lang_label = {"python": "Python", "javascript": "JavaScript", "typescript": "TypeScript"}.get(lang, "Python")
-        code_block_lang = {"python": "python", "javascript": "javascript", "typescript": "typescript"}.get(lang, "python")
+def _audit_live_chunks(
+    chunks: list[dict],
+    wear_types: tuple[str, ...],
+    use_cache: bool,
+    is_stale: Callable[[dict], bool],
+    cancelled: set[str],
+    on_issue: Callable[[str, str, dict], None] | None = None,
+) -> dict[str, dict[str, list]]:
+    """
+    送信直前に is_stale() で古い内容になったチャンクを除き、残りだけを _audit_chunks() で監査する。
+    除いたチャンクの chunk_id は cancelled に入れる（全チャンクが古ければLLMを呼ばない）。
+    送信後に古くなった場合は、受信中のストリーミングを中止する（_audit_chunks() 参照）。
+    """
+    live = []
+    for chunk in chunks:
+        if is_stale(chunk):
+            cancelled.add(chunk["chunk_id"])
+        else:
+            live.append(chunk)
+    if not live:
+        return {}
+    return _audit_chunks(live, wear_types, use_cache, on_issue, is_stale)
 
-        for wear_type in AUDIT_WEARS:
-            system_prompt = get_wear(wear_type)
-            user_content = f"以下の{lang_label}コードを監査してください:\n\n```{code_block_lang}\n{truncated_code}\n```"
 
-            try:
-                raw_response = call_llm(system_prompt, user_content, json_mode=True)
-                parsed = parse_json_response(raw_response)
-                issues = parsed.get("issues", [])
-                save_audit_result(chunk_id, wear_type, issues)
-                chunk_issues.extend(issues)
-                print(f"    [{wear_type}] {len(issues)} 件の指摘")
-            except RuntimeError as e:
-                print(f"    [ERROR] {wear_type} 監査失敗: {e}", file=sys.stderr)
+def _audit_user_content(chunk: dict) -> str:
+    """1チャンク分の監査依頼メッセージを組み立てる。"""
+    truncated_code = truncate_to_limit(chunk["code"])
+    lang = chunk.get("lang", "python")
+    lang_label = _LANG_LABELS.get(lang, "Python")
+    code_block_lang = _CODE_BLOCK_LANGS.get(lang, "python")
+    return f"以下の{lang_label}コードを監査してください:\n\n```{code_block_lang}\n{truncated_code}\n```"
 
-        update_chunk_hash(chunk_id, current_hash)
-        all_results[chunk_id] = chunk_issues
 
-    return all_results
+def _packed_user_content(chunks: list[dict]) -> str:
+    """
+    複数チャンクを束ねた監査依頼メッセージを組み立てる。
+    各コード片には c1, c2, ... の見出しIDを付け、IDをキーにしたJSONで回答させる。
+    """
+    lang = chunks[0].get("lang", "python")
+    lang_label = _LANG_LABELS.get(lang, "Python")
+    code_block_lang = _CODE_BLOCK_LANGS.get(lang, "python")
+
+    # 指示文は件数に依存させず固定にする（プレフィックスキャッシュを効かせるため）
+    lines = [
+        f"以下の{lang_label}コード片を、それぞれ独立に監査してください。",
+        "回答は各見出しのID（c1, c2, ...）をキーにしたJSONオブジェクトとし、"
+        "各値はコード片1つ分の回答形式に従ってください。",
+        '例: {"c1": { ... }, "c2": { ... }}',
+    ]
+    for i, chunk in enumerate(chunks, 1):
+        lines.append(f"\n### chunk: c{i}\n```{code_block_lang}\n{chunk['code'].rstrip()}\n```")
+    return "\n".join(lines)
+
+
+class _AuditProgress:
+    """
+    フォルダ一括監査の進捗カウンター（チャンク単位）。
+    LLMワーカースレッドの完了コールバックから更新されるためロックで保護する。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started_at: float | None = None
+        self._last_report = 0.0
+        self.total = 0
+        self.done = 0
+
+    def add(self, job: dict) -> None:
+        """ジョブの未監査チャンクを進捗の母数に加え、完了時にカウントするよう登録する。"""
+        for chunk, stale in job["pending"]:
+            futures = _unique_futures(job["tasks"][(chunk["chunk_id"], w)] for w in stale)
+            remaining = [len(futures)]
+
+            def _on_done(_future, remaining=remaining) -> None:
+                with self._lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        self.done += 1
+
+            with self._lock:
+                self.total += 1
+                if self._started_at is None:
+                    self._started_at = time.monotonic()
+            for future in futures:
+                future.add_done_callback(_on_done)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self.total - self.done
+
+    def report(self, force: bool = False) -> None:
+        """完了数・残数・ETA を表示する（force=False の場合は一定間隔ごと）。"""
+        now = time.monotonic()
+        if not force and now - self._last_report < _PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+
+        with self._lock:
+            done, total, started_at = self.done, self.total, self._started_at
+        if total == 0:
+            return
+
+        pending = total - done
+        if done and started_at is not None:
+            eta_sec = int((now - started_at) / done * pending)
+            eta = f"{eta_sec // 60:02d}:{eta_sec % 60:02d}"
+        else:
+            eta = "--:--"
+        print(f"[PROGRESS] 完了 {done} / 残り {pending} チャンク (ETA {eta})")
 
 
 def audit_directory(
     directory: str,
     force: bool = False,
     output_dir: str | None = None,
+    concurrency: int | None = None,
+    combine_wears: bool | None = None,
+    pack_chunks: bool | None = None,
+    files: Iterable[str] | None = None,
 ) -> dict[str, dict]:
     """
     指定ディレクトリ配下の全Pythonファイルを一括で多重マイクロ監査する。
 
-    各ファイルに対して audit_file() を呼び出し、
-    ファイルごとの監査結果JSONを出力する。
+    最初にファイルを探索して対象ファイル数を確定し（進捗表示 [i/N] 用）、
+    チャンク化・キャッシュ照合（バックグラウンドスレッド）と、
+    LLM監査（全ファイル共通のワーカープール）を並行して進める。
+    あるファイルのLLM監査を待つ間にも後続ファイルの解析と投入が進むため、
+    LLMサーバーが解析やJSON書き出しの間に遊ぶことはない。
+    結果の保存とファイルごとのJSON出力は探索順に行う。
 
     処理完了後、ディレクトリ全体のサマリーJSONも出力する:
       <output_dir>/_summary_audit.json
@@ -126,6 +627,13 @@ def audit_directory(
         force:      True の場合はキャッシュを無視して再監査
         output_dir: 結果JSONの出力先ディレクトリ。
                     None の場合は各ファイルと同じディレクトリに出力。
+        concurrency: LLM への同時リクエスト数（None の場合は LLM_MAX_CONCURRENCY）
+        combine_wears: True の場合は全ウェアを1リクエストにまとめて送る
+                     （None の場合は AI_AUDIT_COMBINE_WEARS）
+        pack_chunks: True の場合は小さいチャンクを束ねて1リクエストで送る
+                     （None の場合は AI_AUDIT_PACK_CHUNKS）
+        files:       監査するファイルパスのリスト（git_utils.changed_source_files() の結果など）。
+                     None の場合はディレクトリ配下を再帰スキャンする
 
     Returns:
         {ファイルパス: audit_file()の戻り値} の辞書
@@ -135,48 +643,96 @@ def audit_directory(
         print(f"[ERROR] ディレクトリが見つかりません: {abs_dir}", file=sys.stderr)
         return {}
 
-    py_files = list(scan_source_files(abs_dir))
-    if not py_files:
+    paths = list(scan_source_files(abs_dir) if files is None else files)
+    if not paths:
         print("[INFO] 対象のソースファイルが見つかりませんでした。", file=sys.stderr)
         return {}
 
-    if output_dir:
-        os.makedirs(os.path.abspath(output_dir), exist_ok=True)
+    init_db()
+    workers = _resolve_concurrency(concurrency)
+    options = _resolve_options(combine_wears, pack_chunks, force)
+    audit_keys = _audit_keys()
 
     print(f"[INFO] フォルダ一括監査開始: {abs_dir}")
-    print(f"[INFO] 対象ファイル数: {len(py_files)}")
+    print(f"[INFO] 対象ファイル数: {len(paths)}")
     print("=" * 60)
 
-    all_file_results: dict[str, dict] = {}
-    total_issues = 0
-    skipped_files = 0
-
-    for i, file_path in enumerate(py_files, 1):
-        rel_path = os.path.relpath(file_path, abs_dir)
-        print(f"\n[{i}/{len(py_files)}] {rel_path}")
+    # 解析ステージ: ファイルごとの監査ジョブを順にキューへ流す
+    job_queue: queue.Queue = queue.Queue(maxsize=_PARSE_AHEAD_FILES)
+    producer_error: list[BaseException] = []
 
-        results = audit_file(file_path, force=force)
+    def _produce() -> None:
+        try:
+            for file_path, chunks in iter_chunks(paths):
+                job_queue.put(_prepare_file(file_path, force, audit_keys, chunks=chunks))
+        except BaseException as e:  # 例外はメインスレッドで再送出する
+            producer_error.append(e)
+        finally:
+            job_queue.put(None)
 
-        if not results:
-            skipped_files += 1
-            continue
+    producer = threading.Thread(target=_produce, name="ai_audit-scan", daemon=True)
+    producer.start()
 
-        all_file_results[file_path] = results
-        file_issue_count = sum(len(v) for v in results.values())
-        total_issues += file_issue_count
-
-        # ファイルごとのJSONを出力（拡張子を除いた名前に _audit.json を付与）
-        if output_dir:
-            # output_dir 指定時: ディレクトリ構造を保持してそこへ出力
-            rel_no_ext = os.path.splitext(rel_path)[0]
-            out_path = os.path.join(os.path.abspath(output_dir), f"{rel_no_ext}_audit.json")
-            os.makedirs(os.path.dirname(out_path), exist_ok=True)
-            _write_audit_json(file_path, results, out_path)
-        else:
-            save_audit_json(file_path, results)
+    all_file_results: dict[str, dict] = {}
+    total_files = 0
+    total_issues = 0
+    skipped_files = 0
+    progress = _AuditProgress()
+    in_flight: deque[dict] = deque()
+    producer_done = False
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while not producer_done or in_flight:
+            # LLMへの投入待ちが十分にある間は、先頭ファイルの確定を優先する
+            can_take = not producer_done and progress.pending < workers * _QUEUE_DEPTH_FACTOR
+            if can_take:
+                try:
+                    job = job_queue.get(timeout=_POLL_INTERVAL if in_flight else None)
+                except queue.Empty:
+                    job = False
+                if job is None:
+                    producer_done = True
+                elif job:
+                    total_files += 1
+                    job["index"] = total_files
+                    _submit_file(job, executor, options)
+                    progress.add(job)
+                    in_flight.append(job)
+
+            # 探索順の先頭から、LLM監査が終わったファイルを確定する
+            while in_flight and (
+                not can_take or all(f.done() for f in _job_futures(in_flight[0]))
+            ):
+                job = in_flight.popleft()
+                rel_path = os.path.relpath(job["path"], abs_dir)
+                print(f"\n[{job['index']}/{len(paths)}] {rel_path}")
+
+                if not job["chunks"]:
+                    print("[INFO] 解析可能な関数・クラスが見つかりませんでした。", file=sys.stderr)
+                    skipped_files += 1
+                    continue
+
+                print(f"[INFO] {len(job['chunks'])} チャンクを抽出しました。")
+                _print_cache_hits(job)
+                results = _finalize_file(job)
+                progress.report(force=True)
+
+                all_file_results[job["path"]] = results
+                total_issues += sum(len(v) for v in results.values())
+                _save_file_json(job["path"], results, abs_dir, output_dir)
+                can_take = not producer_done and progress.pending < workers * _QUEUE_DEPTH_FACTOR
+
+            progress.report()
+
+    producer.join()
+    if producer_error:
+        raise producer_error[0]
 
     # サマリーJSON
-    summary = _build_summary(abs_dir, all_file_results, len(py_files), skipped_files)
+    summary = _build_summary(abs_dir, all_file_results, total_files, skipped_files)
+    if output_dir:
+        os.makedirs(os.path.abspath(output_dir), exist_ok=True)
     summary_path = os.path.join(
         os.path.abspath(output_dir) if output_dir else abs_dir,
         "_summary_audit.json",
@@ -186,13 +742,25 @@ def audit_directory(
 
     print("\n" + "=" * 60)
     print(f"[INFO] 一括監査完了")
-    print(f"       対象: {len(py_files)} ファイル / スキップ: {skipped_files} ファイル")
+    print(f"       対象: {total_files} ファイル / スキップ: {skipped_files} ファイル")
     print(f"       合計指摘件数: {total_issues} 件")
     print(f"[INFO] サマリーを保存しました: {summary_path}")
 
     return all_file_results
 
 
+def _save_file_json(file_path: str, results: dict, abs_dir: str, output_dir: str | None) -> None:
+    """ファイルごとのJSONを出力する（拡張子を除いた名前に _audit.json を付与）。"""
+    if output_dir:
+        # output_dir 指定時: ディレクトリ構造を保持してそこへ出力
+        rel_no_ext = os.path.splitext(os.path.relpath(file_path, abs_dir))[0]
+        out_path = os.path.join(os.path.abspath(output_dir), f"{rel_no_ext}_audit.json")
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        _write_audit_json(file_path, results, out_path)
+    else:
+        save_audit_json(file_path, results)
+
+
 def _build_summary(
     directory: str,
     all_results: dict[str, dict],
@@ -246,9 +814,9 @@ def save_audit_json(file_path: str, results: dict) -> str:
     return output_path
 
 
-def _write_audit_json(file_path: str, results: dict, output_path: str) -> None:
-    """監査結果を指定パスのJSONファイルに書き出す。"""
-    output = {
+def build_audit_output(file_path: str, results: dict) -> dict:
+    """audit_file() の戻り値を _audit.json と同じ形式の辞書にする。"""
+    return {
         "source_file": os.path.abspath(file_path),
         "chunks": [
             {
@@ -260,6 +828,11 @@ def _write_audit_json(file_path: str, results: dict, output_path: str) -> None:
         "total_issues": sum(len(v) for v in results.values()),
     }
 
+
+def _write_audit_json(file_path: str, results: dict, output_path: str) -> None:
+    """監査結果を指定パスのJSONファイルに書き出す。"""
+    output = build_audit_output(file_path, results)
+
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(output, f, ensure_ascii=False, indent=2)
 
@@ -6,14 +6,18 @@ extract_why: ディレクトリ内の全関数から「なぜそのように書
 
 search_why:  自然言語クエリでベクトル検索し、関連する設計思想を返す。
 """
+import functools
 import hashlib
 import os
 import sys
 from datetime import datetime, timezone
+from typing import Iterable
 
-from .ast_parser import parse_chunks, scan_source_files
-from .llm_client import call_llm
-from .token_counter import truncate_to_limit
+from .ast_parser import scan_source_files
+from .config_manager import load_config, load_env
+from .llm_client import call_llm, parse_json_response
+from .parse_cache import iter_chunks
+from .token_counter import pack_small_chunks, truncate_to_limit
 from .wear_manager import get_wear
 
 # ChromaDBのコレクション名
@@ -28,16 +32,22 @@ def _get_chroma_client():
         print("[ERROR] chromadb がインストールされていません。`pip install chromadb` を実行してください。", file=sys.stderr)
         sys.exit(1)
 
+    load_env()
     data_dir = os.path.expanduser(os.getenv("AI_AUDIT_DATA_DIR", "~/.ai_audit"))
     chroma_path = os.path.join(data_dir, "chroma_data")
-    os.makedirs(chroma_path, exist_ok=True)
+    return _open_collection(chroma_path)
+
 
+@functools.lru_cache(maxsize=None)
+def _open_collection(chroma_path: str):
+    """コレクションを開く（常駐プロセスで繰り返し呼ばれても開き直さない）。"""
+    import chromadb
+    os.makedirs(chroma_path, exist_ok=True)
     client = chromadb.PersistentClient(path=chroma_path)
-    collection = client.get_or_create_collection(
+    return client.get_or_create_collection(
         name=_COLLECTION_NAME,
         metadata={"hnsw:space": "cosine"},
     )
-    return collection
 
 
 def _content_hash(code: str) -> str:
@@ -45,7 +55,12 @@ def _content_hash(code: str) -> str:
     return hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
 
 
-def extract_why(directory: str, force: bool = False) -> None:
+def extract_why(
+    directory: str,
+    force: bool = False,
+    pack_chunks: bool | None = None,
+    files: Iterable[str] | None = None,
+) -> None:
     """
     指定ディレクトリ内の全ソースファイルから設計思想を抽出し、
     ChromaDBに保存する（バッチ実行）。
@@ -57,22 +72,26 @@ def extract_why(directory: str, force: bool = False) -> None:
       - force=True    → ハッシュに関わらず全件再抽出
 
     Args:
-        directory: スキャン対象ディレクトリ
-        force:     True の場合は変更有無に関わらず全件再抽出する
+        directory:   スキャン対象ディレクトリ
+        force:       True の場合は変更有無に関わらず全件再抽出する
+        pack_chunks: True の場合はファイル内の小さいチャンクを束ねて1リクエストで送る
+                     （None の場合は AI_AUDIT_PACK_CHUNKS）
+        files:       対象ファイルパスのリスト（git_utils.changed_source_files() の結果など）。
+                     None の場合はディレクトリ配下を再帰スキャンする
     """
     collection = _get_chroma_client()
-    wear_prompt = get_wear("why_extractor")
+    if pack_chunks is None:
+        pack_chunks = load_config()["pack_chunks"]
     processed = 0
     updated = 0
     skipped = 0
 
-    for file_path in scan_source_files(directory):
-        chunks = parse_chunks(file_path)
+    paths = scan_source_files(directory) if files is None else files
+    for file_path, chunks in iter_chunks(paths):
+        targets: list[tuple[dict, str]] = []  # (チャンク, コンテンツハッシュ)
         for chunk in chunks:
             chunk_id = chunk["chunk_id"]
-            code = chunk["code"]
-            truncated_code = truncate_to_limit(code)
-            current_hash = _content_hash(code)
+            current_hash = _content_hash(chunk["code"])
 
             # 既存エントリの確認（コンテンツハッシュで変更検知）
             if not force:
@@ -85,14 +104,28 @@ def extract_why(directory: str, force: bool = False) -> None:
                     # ハッシュが違う → コードが変更されているので再抽出
                     print(f"  [UPDATE] {chunk['name']}: コード変更を検知、再抽出します")
 
-            lang = chunk.get("lang", "python")
-            user_content = (
-                f"以下の {lang} コードの設計思想を分析してください:\n\n"
-                f"```{lang}\n{truncated_code}\n```"
-            )
+            targets.append((chunk, current_hash))
+
+        target_chunks = [chunk for chunk, _ in targets]
+        groups = pack_small_chunks(target_chunks) if pack_chunks else [[c] for c in target_chunks]
+        hashes = {chunk["chunk_id"]: h for chunk, h in targets}
 
+        for group in groups:
             try:
-                why_text = call_llm(wear_prompt, user_content, json_mode=False)
+                why_texts = _extract_why_texts(group, use_cache=not force)
+            except RuntimeError as e:
+                for chunk in group:
+                    print(f"  [ERROR] {chunk['name']}: {e}", file=sys.stderr)
+                continue
+
+            for chunk in group:
+                chunk_id = chunk["chunk_id"]
+                current_hash = hashes[chunk_id]
+                why_text = why_texts.get(chunk_id)
+                if not why_text:
+                    print(f"  [ERROR] {chunk['name']}: レスポンスに分析結果が含まれていません", file=sys.stderr)
+                    continue
+
                 print(f"  [EXTRACT] {chunk['name']}: {why_text[:60]}...")
 
                 metadata = {
@@ -118,13 +151,62 @@ def extract_why(directory: str, force: bool = False) -> None:
                 else:
                     processed += 1
 
-            except RuntimeError as e:
-                print(f"  [ERROR] {chunk['name']}: {e}", file=sys.stderr)
-
     total_written = processed + updated
     print(f"\n[INFO] 完了: {total_written} 件を保存（新規: {processed}, 更新: {updated}）, {skipped} 件はスキップ（変更なし）")
 
 
+def _extract_why_texts(chunks: list[dict], use_cache: bool = True) -> dict[str, str]:
+    """
+    チャンク群の設計思想を1リクエストでLLMに推論させる。
+    1件ならプレーンテキスト、複数件なら見出しIDをキーにしたJSONで回答させる。
+
+    Returns:
+        {chunk_id: 設計思想テキスト}。レスポンスに含まれなかったチャンクはキーを持たない。
+
+    Raises:
+        RuntimeError: LLM API呼び出しに失敗した場合
+    """
+    if len(chunks) == 1:
+        chunk = chunks[0]
+        lang = chunk.get("lang", "python")
+        truncated_code = truncate_to_limit(chunk["code"])
+        user_content = (
+            f"以下の {lang} コードの設計思想を分析してください:\n\n"
+            f"```{lang}\n{truncated_code}\n```"
+        )
+        # 空の応答は採用しないため、キャッシュにも保存しない（次回の実行で再抽出する）
+        why_text = call_llm(
+            get_wear("why_extractor"), user_content, json_mode=False,
+            wear_type="why_extractor", use_cache=use_cache,
+            validate=lambda raw: bool(raw.strip()),
+        )
+        return {chunk["chunk_id"]: why_text}
+
+    lang = chunks[0].get("lang", "python")
+    lines = [f"以下の {lang} コード片の設計思想を、それぞれ分析してください。"]
+    for i, chunk in enumerate(chunks, 1):
+        lines.append(f"\n### chunk: c{i}\n```{lang}\n{chunk['code'].rstrip()}\n```")
+
+    # 一部のチャンクが欠けた応答はキャッシュに保存しない（次回の実行で同じ応答を返さないため）
+    raw = call_llm(
+        get_wear("why_extractor_packed"), "\n".join(lines), json_mode=True,
+        wear_type="why_extractor_packed", use_cache=use_cache,
+        validate=lambda raw: len(_parse_packed_why(raw, chunks)) == len(chunks),
+    )
+    return _parse_packed_why(raw, chunks)
+
+
+def _parse_packed_why(raw: str, chunks: list[dict]) -> dict[str, str]:
+    """束ねたリクエストの応答から、見出しID（c1, c2, ...）ごとの空でない設計思想テキストを取り出す。"""
+    parsed = parse_json_response(raw)
+    texts: dict[str, str] = {}
+    for i, chunk in enumerate(chunks, 1):
+        text = parsed.get(f"c{i}")
+        if isinstance(text, str) and text.strip():
+            texts[chunk["chunk_id"]] = text
+    return texts
+
+
 def search_why(query: str, top_k: int = 5) -> list[dict]:
     """
     自然言語クエリで設計思想を検索する（コサイン類似度ベース）。
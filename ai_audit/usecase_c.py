@@ -11,8 +11,10 @@ import os
 import sys
 from datetime import datetime
 
-from .ast_parser import generate_skeleton, get_lang, scan_python_files, scan_source_files
-from .llm_client import call_llm
+from .ast_parser import get_lang, scan_python_files, scan_source_files
+from .config_manager import load_config
+from .llm_client import call_llm, stream_llm
+from .parse_cache import iter_skeletons
 from .token_counter import DEFAULT_CHAR_LIMIT, is_within_limit, truncate_to_limit
 from .wear_manager import get_wear
 
@@ -26,29 +28,37 @@ _JSTS_NOTICE = """\
 """
 
 
-def review_architecture(directory: str, output_file: str | None = None) -> str:
+def review_architecture(
+    directory: str,
+    output_file: str | None = None,
+    stream: bool | None = None,
+) -> str:
     """
     指定ディレクトリ内の全Pythonファイルのスケルトンを生成し、
     アーキテクチャレビューをLLMに依頼する。
 
     4096トークン制限を超える場合はファイルを分割して複数回推論し、
     結果を結合してMarkdownレポートとして返す。
+    output_file にはバッチごとに結果を書き足していく。ストリーミング時は
+    LLMの応答を受信しながら書き込むため、生成途中の内容をファイルで確認できる。
 
     Args:
         directory:   対象ディレクトリ
         output_file: 結果を保存するファイルパス（None の場合は保存しない）
+        stream:      True の場合はLLMの応答をストリーミングで受け取る（None の場合は LLM_STREAM）
 
     Returns:
         アーキテクチャレビューのMarkdown文字列
     """
     abs_dir = os.path.abspath(directory)
     wear_prompt = get_wear("architecture_reviewer")
+    if stream is None:
+        stream = load_config()["stream"]
 
     # スケルトンコードを収集（Python / JS / TS）
     skeletons: list[str] = []
     has_jsts = False
-    for file_path in scan_source_files(abs_dir):
-        skeleton = generate_skeleton(file_path)
+    for file_path, skeleton in iter_skeletons(scan_source_files(abs_dir)):
         if not skeleton:
             continue
         lang = get_lang(file_path)
@@ -80,21 +90,6 @@ def review_architecture(directory: str, output_file: str | None = None) -> str:
 
     print(f"[INFO] スケルトン生成完了: {len(skeletons)} ファイル, {len(batches)} バッチで処理")
 
-    # 各バッチをLLMに送信
-    reviews: list[str] = []
-    for i, batch in enumerate(batches, 1):
-        print(f"  [REVIEW] バッチ {i}/{len(batches)} を送信中...")
-        user_content = f"以下のスケルトンコードのアーキテクチャをレビューしてください:\n\n{batch}"
-        user_content = truncate_to_limit(user_content, DEFAULT_CHAR_LIMIT)
-
-        try:
-            result = call_llm(wear_prompt, user_content, json_mode=False)
-            reviews.append(result)
-        except RuntimeError as e:
-            print(f"  [ERROR] バッチ {i} の推論失敗: {e}", file=sys.stderr)
-            reviews.append(f"*バッチ {i} のレビューでエラーが発生しました: {e}*")
-
-    # 結果を結合してMarkdownレポートを作成
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     header = (
         f"# アーキテクチャレビューレポート\n\n"
@@ -105,23 +100,49 @@ def review_architecture(directory: str, output_file: str | None = None) -> str:
     )
     notice = _JSTS_NOTICE if has_jsts else ""
 
-    if len(reviews) == 1:
-        report = header + notice + reviews[0]
-    else:
-        # 複数バッチに分割された場合は、対象ファイル範囲を見出しに付ける
-        files_per_batch = max(1, len(skeletons) // len(reviews))
-        sections = []
-        for i, r in enumerate(reviews):
-            start_file = i * files_per_batch + 1
-            end_file = min((i + 1) * files_per_batch, len(skeletons))
-            if i == len(reviews) - 1:
-                end_file = len(skeletons)
-            sections.append(f"## ファイル {start_file}〜{end_file} のレビュー\n\n{r}")
-        report = header + notice + "\n\n---\n\n".join(sections)
+    # レポートは組み立てた順に output_file へ書き足す
+    parts: list[str] = []
+    out = open(output_file, "w", encoding="utf-8") if output_file else None
+
+    def _emit(text: str) -> None:
+        parts.append(text)
+        if out is not None:
+            out.write(text)
+            out.flush()
+
+    try:
+        _emit(header + notice)
+        # 各バッチをLLMに送信
+        files_per_batch = max(1, len(skeletons) // len(batches))
+        for i, batch in enumerate(batches, 1):
+            if len(batches) > 1:
+                # 複数バッチに分割された場合は、対象ファイル範囲を見出しに付ける
+                start_file = (i - 1) * files_per_batch + 1
+                end_file = len(skeletons) if i == len(batches) else min(i * files_per_batch, len(skeletons))
+                separator = "\n\n---\n\n" if i > 1 else ""
+                _emit(f"{separator}## ファイル {start_file}〜{end_file} のレビュー\n\n")
+
+            print(f"  [REVIEW] バッチ {i}/{len(batches)} を送信中...")
+            user_content = f"以下のスケルトンコードのアーキテクチャをレビューしてください:\n\n{batch}"
+            user_content = truncate_to_limit(user_content, DEFAULT_CHAR_LIMIT)
+
+            emitted = len(parts)
+            try:
+                if stream:
+                    for delta in stream_llm(wear_prompt, user_content, wear_type="architecture_reviewer"):
+                        _emit(delta)
+                else:
+                    _emit(call_llm(wear_prompt, user_content, json_mode=False, wear_type="architecture_reviewer"))
+            except RuntimeError as e:
+                print(f"  [ERROR] バッチ {i} の推論失敗: {e}", file=sys.stderr)
+                # ストリーミングの途中で失敗した場合は、受信済みの部分の後ろに段落を分けて付ける
+                prefix = "\n\n" if len(parts) > emitted else ""
+                _emit(f"{prefix}*バッチ {i} のレビューでエラーが発生しました: {e}*")
+    finally:
+        if out is not None:
+            out.close()
 
     if output_file:
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(report)
         print(f"[INFO] レポートを保存しました: {output_file}")
 
-    return report
+    return "".join(parts)
@@ -10,15 +10,22 @@
   - --force なし: _design_detail.md が存在すれば詳細生成をスキップし概要生成のみ実行
   - --force あり: 両ファイルを上書き（モデル変更・全体やり直し時）
 
+ストリーミング（LLM_STREAM）:
+  - LLMの応答を受信しながら <設計書>.partial に書き込み、完成後に本来の名前へ置き換える
+    （生成中の内容は .partial で確認できる。中断しても書きかけが再開判定に使われない）
+
 JS/TS 固有観点の制限付記:
   - JS/TSファイルが含まれる場合、出力の冒頭に自動で付記を挿入する
 """
 import os
 import sys
 from datetime import datetime
+from typing import TextIO
 
-from .ast_parser import generate_skeleton, get_lang, scan_source_files
-from .llm_client import call_llm
+from .ast_parser import get_lang, scan_source_files
+from .config_manager import load_config
+from .llm_client import call_llm, stream_llm
+from .parse_cache import iter_skeletons
 from .token_counter import DEFAULT_CHAR_LIMIT, truncate_to_limit
 from .wear_manager import get_wear
 
@@ -33,12 +40,15 @@ _JSTS_NOTICE = """\
 
 _DETAIL_FILENAME = "_design_detail.md"
 _OVERVIEW_FILENAME = "_design_overview.md"
+# 生成途中の設計書のファイル名に付ける接尾辞（完成後に本来の名前へ置き換える）
+_PARTIAL_SUFFIX = ".partial"
 
 
 def generate_design_doc(
     directory: str,
     output_dir: str | None = None,
     force: bool = False,
+    stream: bool | None = None,
 ) -> tuple[str, str]:
     """
     指定ディレクトリのソースコードから設計書を生成する。
@@ -47,11 +57,15 @@ def generate_design_doc(
         directory:  対象ソースディレクトリ
         output_dir: 出力先ディレクトリ（None の場合は directory 直下に出力）
         force:      True の場合は既存ファイルを無視して全体を再生成
+        stream:     True の場合はLLMの応答をストリーミングで受け取り、受信しながら書き込む
+                    （None の場合は LLM_STREAM）
 
     Returns:
         (detail_path, overview_path) 生成された設計書ファイルのパス
     """
     abs_dir = os.path.abspath(directory)
+    if stream is None:
+        stream = load_config()["stream"]
     out_dir = os.path.abspath(output_dir) if output_dir else abs_dir
     os.makedirs(out_dir, exist_ok=True)
 
@@ -63,15 +77,15 @@ def generate_design_doc(
         print(f"[INFO] 詳細設計書が既に存在します: {detail_path}")
         print("[INFO] --force なしのため詳細生成をスキップし、概要生成フェーズから再開します。")
     else:
-        _generate_detail(abs_dir, detail_path)
+        _generate_detail(abs_dir, detail_path, use_cache=not force, stream=stream)
 
     # 概要設計書の生成
-    _generate_overview(detail_path, overview_path)
+    _generate_overview(detail_path, overview_path, use_cache=not force, stream=stream)
 
     return detail_path, overview_path
 
 
-def _generate_detail(abs_dir: str, detail_path: str) -> None:
+def _generate_detail(abs_dir: str, detail_path: str, use_cache: bool = True, stream: bool = False) -> None:
     """スケルトンコードから詳細設計書を生成して _design_detail.md に書き込む。"""
     wear_prompt = get_wear("detail_designer")
 
@@ -79,8 +93,7 @@ def _generate_detail(abs_dir: str, detail_path: str) -> None:
     skeletons: list[str] = []
     has_jsts = False
 
-    for file_path in scan_source_files(abs_dir):
-        skeleton = generate_skeleton(file_path)
+    for file_path, skeleton in iter_skeletons(scan_source_files(abs_dir)):
         if not skeleton:
             continue
         lang = get_lang(file_path)
@@ -100,30 +113,6 @@ def _generate_detail(abs_dir: str, detail_path: str) -> None:
     batches = _split_batches(skeletons)
     print(f"[INFO] スケルトン生成完了: {len(skeletons)} ファイル, {len(batches)} バッチで処理")
 
-    # 各バッチをLLMに送信
-    sections: list[str] = []
-    files_per_batch = max(1, len(skeletons) // len(batches))
-    for i, batch in enumerate(batches, 1):
-        start_file = (i - 1) * files_per_batch + 1
-        end_file = min(i * files_per_batch, len(skeletons))
-        if i == len(batches):
-            end_file = len(skeletons)
-        print(f"  [DESIGN] バッチ {i}/{len(batches)} を送信中 (ファイル {start_file}〜{end_file})...")
-
-        user_content = f"以下のスケルトンコードから内部設計書を生成してください:\n\n{batch}"
-        user_content = truncate_to_limit(user_content, DEFAULT_CHAR_LIMIT)
-
-        try:
-            result = call_llm(wear_prompt, user_content, json_mode=False)
-            if len(batches) > 1:
-                sections.append(f"## ファイル {start_file}〜{end_file} の詳細設計\n\n{result}")
-            else:
-                sections.append(result)
-        except RuntimeError as e:
-            print(f"  [ERROR] バッチ {i} の推論失敗: {e}", file=sys.stderr)
-            sections.append(f"*バッチ {i} の生成でエラーが発生しました: {e}*")
-
-    # レポート組み立て
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     header = (
         f"# 詳細設計書（内部設計）\n\n"
@@ -132,17 +121,45 @@ def _generate_detail(abs_dir: str, detail_path: str) -> None:
         f"**対象ファイル数:** {len(skeletons)}\n\n"
         f"---\n\n"
     )
-
     notice = _JSTS_NOTICE if has_jsts else ""
-    body = "\n\n---\n\n".join(sections)
-    report = header + notice + body
 
-    with open(detail_path, "w", encoding="utf-8") as f:
-        f.write(report)
+    # 生成途中の内容は .partial に書き足し、完成してから置き換える
+    # （中断した書きかけのファイルを、再開時に生成済みの詳細設計書と誤認しないため）
+    partial_path = detail_path + _PARTIAL_SUFFIX
+    with open(partial_path, "w", encoding="utf-8") as f:
+        f.write(header + notice)
+
+        # 各バッチをLLMに送信
+        files_per_batch = max(1, len(skeletons) // len(batches))
+        for i, batch in enumerate(batches, 1):
+            start_file = (i - 1) * files_per_batch + 1
+            end_file = min(i * files_per_batch, len(skeletons))
+            if i == len(batches):
+                end_file = len(skeletons)
+            print(f"  [DESIGN] バッチ {i}/{len(batches)} を送信中 (ファイル {start_file}〜{end_file})...")
+            if i > 1:
+                f.write("\n\n---\n\n")
+            if len(batches) > 1:
+                f.write(f"## ファイル {start_file}〜{end_file} の詳細設計\n\n")
+
+            user_content = f"以下のスケルトンコードから内部設計書を生成してください:\n\n{batch}"
+            user_content = truncate_to_limit(user_content, DEFAULT_CHAR_LIMIT)
+
+            written = f.tell()
+            try:
+                _write_generated(f, wear_prompt, user_content, "detail_designer", use_cache, stream)
+            except RuntimeError as e:
+                print(f"  [ERROR] バッチ {i} の推論失敗: {e}", file=sys.stderr)
+                prefix = "\n\n" if f.tell() != written else ""
+                f.write(f"{prefix}*バッチ {i} の生成でエラーが発生しました: {e}*")
+
+    os.replace(partial_path, detail_path)
     print(f"[INFO] 詳細設計書を保存しました: {detail_path}")
 
 
-def _generate_overview(detail_path: str, overview_path: str) -> None:
+def _generate_overview(
+    detail_path: str, overview_path: str, use_cache: bool = True, stream: bool = False
+) -> None:
     """詳細設計書から概要設計書を生成して _design_overview.md に書き込む。"""
     wear_prompt = get_wear("overview_designer")
 
@@ -162,12 +179,6 @@ def _generate_overview(detail_path: str, overview_path: str) -> None:
     # JS/TS付記が詳細設計書に含まれていれば概要設計書にも引き継ぐ
     has_jsts_notice = _JSTS_NOTICE.strip()[:30] in detail_content
 
-    try:
-        result = call_llm(wear_prompt, user_content, json_mode=False)
-    except RuntimeError as e:
-        print(f"[ERROR] 概要設計書の生成失敗: {e}", file=sys.stderr)
-        result = f"*概要設計書の生成でエラーが発生しました: {e}*"
-
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     header = (
         f"# 概要設計書（外部設計）\n\n"
@@ -176,13 +187,45 @@ def _generate_overview(detail_path: str, overview_path: str) -> None:
         f"---\n\n"
     )
     notice = _JSTS_NOTICE if has_jsts_notice else ""
-    report = header + notice + result
 
-    with open(overview_path, "w", encoding="utf-8") as f:
-        f.write(report)
+    partial_path = overview_path + _PARTIAL_SUFFIX
+    with open(partial_path, "w", encoding="utf-8") as f:
+        f.write(header + notice)
+        written = f.tell()
+        try:
+            _write_generated(f, wear_prompt, user_content, "overview_designer", use_cache, stream)
+        except RuntimeError as e:
+            print(f"[ERROR] 概要設計書の生成失敗: {e}", file=sys.stderr)
+            prefix = "\n\n" if f.tell() != written else ""
+            f.write(f"{prefix}*概要設計書の生成でエラーが発生しました: {e}*")
+
+    os.replace(partial_path, overview_path)
     print(f"[INFO] 概要設計書を保存しました: {overview_path}")
 
 
+def _write_generated(
+    f: TextIO,
+    wear_prompt: str,
+    user_content: str,
+    wear_type: str,
+    use_cache: bool,
+    stream: bool,
+) -> None:
+    """
+    LLMが生成したMarkdownを f に書き込む。
+    stream の場合は受信した断片ごとに書き込んで flush する（途中まで書いた後に失敗することがある）。
+
+    Raises:
+        RuntimeError: LLM API呼び出しに失敗した場合
+    """
+    if not stream:
+        f.write(call_llm(wear_prompt, user_content, json_mode=False, wear_type=wear_type, use_cache=use_cache))
+        return
+    for delta in stream_llm(wear_prompt, user_content, wear_type=wear_type, use_cache=use_cache):
+        f.write(delta)
+        f.flush()
+
+
 def _split_batches(skeletons: list[str]) -> list[str]:
     """スケルトンリストをトークン制限内でバッチに分割する。"""
     batches: list[str] = []
@@ -2,7 +2,13 @@
 ウェアマネージャー: LLMに適用するシステムプロンプト（ウェア）の定義と管理
 
 ウェアはLLMの視界を極端に狭め、特定の役割に集中させるためのシステムプロンプト。
+
+複数ウェア統合モード（build_combined_wear）:
+  同じコード片を観点ごとに何度も送るとプロンプトの前処理コストが観点数ぶんかかるため、
+  複数のウェアの観点を1つのシステムプロンプトにまとめ、観点名をキーにした
+  1つのJSONで回答させる。レスポンスは split_combined_response で観点ごとに分割する。
 """
+import hashlib
 
 # ユースケースA: セキュリティ監査ウェア
 SECURITY_WEAR = """\
@@ -50,7 +56,7 @@ READABILITY_WEAR = """\
 """
 
 # ユースケースB: 設計思想・技術的負債アナリストウェア
-WHY_EXTRACTOR_WEAR = """\
+_WHY_EXTRACTOR_BODY = """\
 あなたは優秀なソフトウェアアーキテクトです。
 提供されたコード片を読み、コードの挙動（What）ではなく、\
 その裏にある「設計思想」や「業務上の意図（Why）」を推論して日本語で説明してください。
@@ -61,9 +67,20 @@ WHY_EXTRACTOR_WEAR = """\
 3. この関数が解決しようとしているビジネス上の課題は何か。
 
 コード片のみから確実なことが言えない場合でも、プロフェッショナルとしての推論を記述してください。
+"""
+
+WHY_EXTRACTOR_WEAR = _WHY_EXTRACTOR_BODY + """\
 300文字程度の日本語テキストで回答してください。JSON不要、プレーンテキストで。
 """
 
+# ユースケースB: 複数の小さいコード片をまとめて分析する場合のウェア（見出しIDをキーにしたJSONで回答）
+WHY_EXTRACTOR_PACKED_WEAR = _WHY_EXTRACTOR_BODY + """\
+複数のコード片が「### chunk: c1」のような見出しID付きで提供されます。
+コード片ごとに独立して、300文字程度の日本語テキストで回答してください。
+回答は見出しIDをキー、回答テキストを値とするJSONオブジェクトで返してください。
+例: {"c1": "...", "c2": "..."}
+"""
+
 # ユースケースC: アーキテクチャレビューウェア
 ARCHITECTURE_REVIEWER_WEAR = """\
 あなたはシステム全体の構造設計を評価するシニア・アーキテクトです。
@@ -131,6 +148,7 @@ _WEAR_MAP = {
     "security": SECURITY_WEAR,
     "readability": READABILITY_WEAR,
     "why_extractor": WHY_EXTRACTOR_WEAR,
+    "why_extractor_packed": WHY_EXTRACTOR_PACKED_WEAR,
     "architecture_reviewer": ARCHITECTURE_REVIEWER_WEAR,
     "detail_designer": DETAIL_DESIGNER_WEAR,
     "overview_designer": OVERVIEW_DESIGNER_WEAR,
@@ -143,7 +161,8 @@ def get_wear(wear_type: str) -> str:
 
     Args:
         wear_type: ウェアの種類（"security", "readability", "why_extractor",
-                   "architecture_reviewer", "detail_designer", "overview_designer"）
+                   "why_extractor_packed", "architecture_reviewer",
+                   "detail_designer", "overview_designer"）
 
     Returns:
         システムプロンプト文字列
@@ -156,6 +175,98 @@ def get_wear(wear_type: str) -> str:
     return _WEAR_MAP[wear_type]
 
 
+# 統合モードで各ウェアから観点の説明部分だけを切り出すための区切り
+_JSON_FORMAT_MARKER = "必ず以下のJSON形式で回答してください"
+
+# 複数ウェア統合モードのシステムプロンプト（前置き・回答形式）
+_COMBINED_HEADER = """\
+あなたはコードレビューの専門家チームです。
+提供されたコード片を、以下の各観点それぞれについて独立に監査してください。
+各観点の指示はその観点の指摘にのみ適用し、観点をまたいで指摘を重複させないでください。
+"""
+
+_COMBINED_FORMAT = """\
+必ず以下のJSON形式で回答してください。キーは観点名です（問題がなければその観点のissuesは空配列）:
+{{
+{entries}
+}}
+各issueは次の形式とします:
+{{
+  "type": "観点名",
+  "severity": "high | medium | low",
+  "line_number_offset": null,
+  "description": "日本語での指摘内容",
+  "suggestion": "具体的な修正コード案や改善案"
+}}
+"""
+
+
+def build_combined_wear(wear_types: list[str]) -> str:
+    """
+    複数のJSON出力ウェアを1つのシステムプロンプトに統合する。
+
+    各ウェアから回答形式の指定を除いた観点の説明部分を並べ、
+    観点名をキーにしたJSONで回答させる。同じ wear_types からは常に同じ文字列を返す。
+
+    Args:
+        wear_types: 統合するウェアの種類（例: ["security", "readability"]）
+
+    Returns:
+        統合したシステムプロンプト文字列
+
+    Raises:
+        ValueError: 未定義のウェアタイプ、または JSON 出力でないウェアが指定された場合
+    """
+    sections = []
+    for wear_type in wear_types:
+        wear = get_wear(wear_type)
+        if _JSON_FORMAT_MARKER not in wear:
+            raise ValueError(f"JSON形式で回答するウェアのみ統合できます: {wear_type!r}")
+        perspective = wear.split(_JSON_FORMAT_MARKER, 1)[0].strip()
+        sections.append(f"### 観点: {wear_type}\n{perspective}")
+
+    entries = ",\n".join(f'  "{w}": {{"issues": [ ... ]}}' for w in wear_types)
+    return (
+        _COMBINED_HEADER
+        + "\n"
+        + "\n\n".join(sections)
+        + "\n\n"
+        + _COMBINED_FORMAT.format(entries=entries)
+    )
+
+
+def split_combined_response(parsed: dict, wear_types: list[str]) -> dict[str, list]:
+    """
+    統合モードのレスポンスを観点ごとの issues リストに分割する。
+
+    {"security": {"issues": [...]}} と {"security": [...]} のどちらの形も受け付ける。
+    レスポンスに含まれない観点は戻り値に含めない（呼び出し元で失敗として扱う）。
+
+    Args:
+        parsed:     parse_json_response() の戻り値
+        wear_types: 統合したウェアの種類
+
+    Returns:
+        {wear_type: issuesリスト}
+    """
+    result: dict[str, list] = {}
+    for wear_type in wear_types:
+        section = parsed.get(wear_type)
+        if isinstance(section, dict):
+            section = section.get("issues")
+        if isinstance(section, list):
+            result[wear_type] = section
+    return result
+
+
+def get_wear_hash(wear_type: str) -> str:
+    """
+    ウェアのシステムプロンプトのハッシュを返す。
+    ウェアの文面を変更すると値が変わり、そのウェアの監査キャッシュだけが無効になる。
+    """
+    return hashlib.sha256(get_wear(wear_type).encode("utf-8")).hexdigest()[:16]
+
+
 def list_wears() -> list[str]:
     """利用可能なウェアタイプの一覧を返す。"""
     return list(_WEAR_MAP.keys())
@@ -8,6 +8,7 @@ ai_audit - 120Bモデル×4096トークン環境向け 生成AI活用CLIツー
   extract_why <directory>       ユースケースB: 設計思想の抽出・蓄積
   search_why "<query>"          ユースケースB: 設計思想の自然言語検索
   review_architecture <dir>     ユースケースC: ASTスケルトンによるアーキテクチャレビュー
+  serve                         常駐サーバー（JSON-RPC）: エディタ拡張から監査・抽出・検索を受け付ける
 """
 import argparse
 import io
@@ -20,6 +21,9 @@ if sys.stdout.encoding and sys.stdout.encoding.lower() not in ("utf-8", "utf8"):
 if sys.stderr.encoding and sys.stderr.encoding.lower() not in ("utf-8", "utf8"):
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
 
+# --profile-startup で表示するモジュール数（import 時間の長い順）
+_PROFILE_TOP_MODULES = 20
+
 
 # ---------------------------------------------------------------------------
 # config コマンド
@@ -73,8 +77,8 @@ def cmd_config(args: argparse.Namespace) -> None:
     elif args.config_action == "output-tokens":
         if args.value is None:
             # 表示のみ（validate_env 不要）
-            from dotenv import load_dotenv
-            load_dotenv()
+            from ai_audit.config_manager import load_env
+            load_env()
             raw = os.getenv("LLM_MAX_OUTPUT_TOKENS", "").strip()
             if raw:
                 print(f"現在の最大出力トークン数: {raw}")
@@ -97,8 +101,8 @@ def cmd_config(args: argparse.Namespace) -> None:
 
     # --- サブアクション: show (デフォルト) ---
     else:
-        from dotenv import load_dotenv
-        load_dotenv()
+        from ai_audit.config_manager import load_env
+        load_env()
         env_path = os.path.join(os.getcwd(), ".env")
 
         api_url   = os.getenv("LLM_API_BASE_URL", "（未設定）")
@@ -148,12 +152,24 @@ def cmd_audit(args: argparse.Namespace) -> None:
 
     from ai_audit.usecase_a import audit_directory, audit_file, save_audit_json
 
+    # --concurrency は HTTP 接続プールのサイズにも反映させるため環境変数経由でも渡す
+    if args.concurrency is not None:
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    _apply_parse_workers(args)
+
     path = args.path
 
     if os.path.isdir(path):
-        audit_directory(path, force=args.force, output_dir=args.output_dir)
+        files = _changed_files(args, path)
+        if files is not None and not files:
+            print("[INFO] 変更されたソースファイルはありません。")
+            return
+        audit_directory(path, force=args.force, output_dir=args.output_dir,
+                        concurrency=args.concurrency, combine_wears=args.combine_wears,
+                        pack_chunks=args.pack_chunks, files=files)
     elif os.path.isfile(path):
-        results = audit_file(path, force=args.force)
+        results = audit_file(path, force=args.force, concurrency=args.concurrency,
+                             combine_wears=args.combine_wears, pack_chunks=args.pack_chunks)
         if results:
             save_audit_json(path, results)
     else:
@@ -169,7 +185,12 @@ def cmd_extract_why(args: argparse.Namespace) -> None:
     from ai_audit.config_manager import validate_env
     validate_env()
     from ai_audit.usecase_b import extract_why
-    extract_why(args.directory)
+    _apply_parse_workers(args)
+    files = _changed_files(args, args.directory)
+    if files is not None and not files:
+        print("[INFO] 変更されたソースファイルはありません。")
+        return
+    extract_why(args.directory, pack_chunks=args.pack_chunks, files=files)
 
 
 def cmd_search_why(args: argparse.Namespace) -> None:
@@ -184,11 +205,53 @@ def cmd_review_architecture(args: argparse.Namespace) -> None:
     from ai_audit.config_manager import validate_env
     validate_env()
     from ai_audit.usecase_c import review_architecture
-    report = review_architecture(args.directory, output_file=args.output)
+    _apply_parse_workers(args)
+    report = review_architecture(args.directory, output_file=args.output, stream=args.stream or None)
     if not args.output:
         print(report)
 
 
+def cmd_serve(args: argparse.Namespace) -> None:
+    from ai_audit.config_manager import validate_env
+    validate_env()
+    from ai_audit.server import serve
+    _apply_parse_workers(args)
+    serve(port=args.port)
+
+
+def _changed_files(args: argparse.Namespace, directory: str) -> list[str] | None:
+    """
+    --since / --changed-only 指定時は git の差分から対象ファイルを取得して返す。
+    どちらも指定されていない場合は None（ディレクトリ全体をスキャンする）。
+    """
+    if args.since is None and not args.changed_only:
+        return None
+    from ai_audit.git_utils import changed_source_files
+    try:
+        files = changed_source_files(directory, since=args.since)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    base = args.since if args.since is not None else "HEAD"
+    print(f"[INFO] {base} からの変更ファイル: {len(files)} 件")
+    return files
+
+
+def _add_changed_args(parser: argparse.ArgumentParser) -> None:
+    """--since / --changed-only を追加する（audit / extract_why 共通）。"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--since", default=None, metavar="REF",
+                       help="REF（ブランチ・タグ・コミット）との merge-base から変更されたファイルだけを処理する")
+    group.add_argument("--changed-only", dest="changed_only", action="store_true", default=False,
+                       help="未コミットの変更（HEAD との差分・未追跡ファイル）があるファイルだけを処理する")
+
+
+def _apply_parse_workers(args: argparse.Namespace) -> None:
+    """--parse-workers を解析キャッシュ（parse_cache）が参照する環境変数に反映する。"""
+    if args.parse_workers is not None:
+        os.environ["AI_AUDIT_PARSE_WORKERS"] = str(args.parse_workers)
+
+
 # ---------------------------------------------------------------------------
 # パーサー定義
 # ---------------------------------------------------------------------------
@@ -210,6 +273,7 @@ def build_parser() -> argparse.ArgumentParser:
   python main.py audit src/user_service.py        # 単一ファイル
   python main.py audit ./src                      # フォルダ一括
   python main.py audit ./src --output-dir ./audit_results
+  python main.py audit ./src --since origin/main  # main ブランチからの変更ファイルのみ
 
   # ユースケースB
   python main.py extract_why ./src
@@ -217,9 +281,16 @@ def build_parser() -> argparse.ArgumentParser:
 
   # ユースケースC
   python main.py review_architecture ./src --output report.md
+  python main.py review_architecture ./src --output report.md --stream  # 生成しながら書き込む
+
+  # 起動時間の計測（モジュールごとの import 時間を表示）
+  python main.py --profile-startup audit src/user_service.py
 """,
     )
 
+    parser.add_argument("--profile-startup", dest="profile_startup", action="store_true", default=False,
+                        help="コマンドを実行し、モジュールごとの import 時間を標準エラー出力に表示する")
+
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # --- config ---
@@ -275,12 +346,25 @@ def build_parser() -> argparse.ArgumentParser:
 出力先:
   --output-dir 未指定: 各ファイルと同じディレクトリに _audit.json を出力
   --output-dir 指定:   ディレクトリ構造を保持して指定先に集約出力
+
+変更ファイルのみ（フォルダ一括監査時のみ有効。git リポジトリ内で使用）:
+  --since REF      REF との merge-base 以降に変更されたファイル（CI のプルリクエスト検証向け）
+  --changed-only   未コミットの変更があるファイル
 """,
     )
     p_audit.add_argument("path", help="監査対象のPythonファイルまたはディレクトリ")
     p_audit.add_argument("--force", action="store_true", default=False, help="キャッシュを無視して再監査する")
     p_audit.add_argument("--output-dir", dest="output_dir", default=None, metavar="DIR",
                          help="結果JSONの出力先ディレクトリ（フォルダ一括監査時のみ有効）")
+    p_audit.add_argument("--concurrency", type=int, default=None, metavar="N",
+                         help="LLM への同時リクエスト数（省略時: .env の LLM_MAX_CONCURRENCY、未設定なら 4）")
+    p_audit.add_argument("--combine-wears", dest="combine_wears", action="store_true", default=None,
+                         help="セキュリティ・可読性の観点を1リクエストにまとめて送る（プロンプト量を約半減）")
+    p_audit.add_argument("--pack-chunks", dest="pack_chunks", action="store_true", default=None,
+                         help="小さい関数・クラスを束ねて1リクエストで送る（リクエスト数を削減）")
+    p_audit.add_argument("--parse-workers", dest="parse_workers", type=int, default=None, metavar="N",
+                         help="ソース解析に使うプロセス数（省略時: .env の AI_AUDIT_PARSE_WORKERS、未設定なら CPU コア数）")
+    _add_changed_args(p_audit)
     p_audit.set_defaults(func=cmd_audit)
 
     # --- extract_why ---
@@ -289,6 +373,11 @@ def build_parser() -> argparse.ArgumentParser:
         help="ユースケースB: ディレクトリ内の全関数の設計思想を抽出してDBに蓄積する",
     )
     p_extract.add_argument("directory", help="スキャン対象のディレクトリ")
+    p_extract.add_argument("--pack-chunks", dest="pack_chunks", action="store_true", default=None,
+                           help="小さい関数を束ねて1リクエストで送る（リクエスト数を削減）")
+    p_extract.add_argument("--parse-workers", dest="parse_workers", type=int, default=None, metavar="N",
+                           help="ソース解析に使うプロセス数（省略時: .env の AI_AUDIT_PARSE_WORKERS、未設定なら CPU コア数）")
+    _add_changed_args(p_extract)
     p_extract.set_defaults(func=cmd_extract_why)
 
     # --- search_why ---
@@ -308,16 +397,114 @@ def build_parser() -> argparse.ArgumentParser:
     p_review.add_argument("directory", help="レビュー対象のディレクトリ")
     p_review.add_argument("--output", "-o", default=None,
                           help="レポートを保存するMarkdownファイルパス（省略時は標準出力）")
+    p_review.add_argument("--parse-workers", dest="parse_workers", type=int, default=None, metavar="N",
+                          help="ソース解析に使うプロセス数（省略時: .env の AI_AUDIT_PARSE_WORKERS、未設定なら CPU コア数）")
+    p_review.add_argument("--stream", action="store_true", default=False,
+                          help="LLMの応答をストリーミングで受け取り、受信しながら --output のファイルに書き込む"
+                               "（省略時: .env の LLM_STREAM）")
     p_review.set_defaults(func=cmd_review_architecture)
 
+    # --- serve ---
+    p_serve = subparsers.add_parser(
+        "serve",
+        help="常駐サーバーとして起動し、JSON-RPC で監査・抽出・検索のリクエストを受け付ける",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+プロトコル:
+  1行に1つの JSON-RPC 2.0 メッセージ（UTF-8）。ログは標準エラー出力に出る。
+  メソッド: ping / audit {path, force?, write_json?, stream?} / extract_why {directory, force?}
+            search_why {query, top_k?} / stats / shutdown
+
+例:
+  echo '{"jsonrpc":"2.0","id":1,"method":"audit","params":{"path":"src/app.py"}}' | python main.py serve
+""",
+    )
+    p_serve.add_argument("--port", type=int, default=None, metavar="N",
+                         help="127.0.0.1:N の TCP で待ち受ける（省略時: 標準入出力）")
+    p_serve.add_argument("--parse-workers", dest="parse_workers", type=int, default=None, metavar="N",
+                         help="ソース解析に使うプロセス数（省略時: .env の AI_AUDIT_PARSE_WORKERS、未設定なら CPU コア数）")
+    p_serve.set_defaults(func=cmd_serve)
+
     return parser
 
 
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
+    if args.profile_startup:
+        sys.exit(_run_with_import_profile())
     args.func(args)
+    _print_llm_usage()
+
+
+def _run_with_import_profile() -> int:
+    """
+    --profile-startup: 同じコマンドを import 時間の計測付き（PYTHONPROFILEIMPORTTIME）の子プロセスで実行し、
+    終了後にモジュールごとの import 時間を標準エラー出力に表示する。
+
+    Returns:
+        子プロセスの終了コード
+    """
+    import subprocess
+    import time
+
+    argv = [a for a in sys.argv[1:] if a != "--profile-startup"]
+    if getattr(sys, "frozen", False):
+        cmd = [sys.executable, *argv]
+    else:
+        cmd = [sys.executable, os.path.abspath(sys.argv[0]), *argv]
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME="1")
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stderr=subprocess.PIPE, text=True,
+                            encoding="utf-8", errors="replace")
+    # (モジュール名, 自身の時間 μs, 配下を含む時間 μs, import の入れ子の深さ)
+    records: list[tuple[str, int, int, int]] = []
+    for line in proc.stderr:
+        if not line.startswith("import time:"):
+            sys.stderr.write(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 見出し行
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    returncode = proc.wait()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    total_ms = sum(r[1] for r in records) / 1000
+    own_ms = sum(r[1] for r in records if r[0].split(".")[0] == "ai_audit") / 1000
+    print(f"\n[PROFILE] 実行時間 {elapsed_ms:.0f} ms / import 合計 {total_ms:.1f} ms"
+          f"（ai_audit {own_ms:.1f} ms, {len(records)} モジュール）", file=sys.stderr)
+    print(f"[PROFILE] {'自身(ms)':>9} {'配下込み(ms)':>12}  モジュール（import 時間の長い順）", file=sys.stderr)
+    top_level = sorted((r for r in records if r[3] == 0), key=lambda r: r[2], reverse=True)
+    for name, self_us, cumulative_us, _ in top_level[:_PROFILE_TOP_MODULES]:
+        print(f"[PROFILE] {self_us / 1000:9.1f} {cumulative_us / 1000:12.1f}  {name}", file=sys.stderr)
+    return returncode
+
+
+def _print_llm_usage() -> None:
+    """
+    LLM を呼び出したコマンドの場合、トークン使用量（プロンプトキャッシュの内訳付き）と
+    同時リクエスト数・応答時間のパーセンタイルを表示する。
+    """
+    llm_client = sys.modules.get("ai_audit.llm_client")
+    if llm_client is None:
+        return
+    stats = llm_client.get_usage_stats()
+    if stats["requests"] or stats["response_cache_hits"]:
+        print(f"[INFO] {llm_client.format_usage_stats(stats)}")
+    concurrency = llm_client.get_concurrency_stats()
+    if concurrency["peak_in_flight"]:
+        print(f"[INFO] {llm_client.format_concurrency_stats(concurrency)}")
 
 
 if __name__ == "__main__":
+    # PyInstaller でビルドしたバイナリでは、並列解析（parse_cache）の spawn した子プロセスが
+    # この実行ファイルを起動し直すため、子プロセスの場合はここでワーカーとして動かす
+    # （multiprocessing の import は起動時間に響くため、ビルドしたバイナリの場合だけ行う）
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     main()
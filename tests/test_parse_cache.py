@@ -0,0 +1,56 @@
+"""
+解析キャッシュ: 内容ハッシュの計算と解析の間にファイルが書き換えられた場合の確認
+
+実行: python -m unittest discover -s tests
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ai_audit import cache_manager, parse_cache
+
+_OLD_SOURCE = "def old_function():\n    return 1\n"
+_NEW_SOURCE = "def new_function():\n    return 2\n"
+
+
+class ContentChangedDuringParseTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ, {"AI_AUDIT_DATA_DIR": os.path.join(self._tmp.name, "data")})
+        env.start()
+        self.addCleanup(env.stop)
+        cache_manager.init_db()
+
+    def tearDown(self) -> None:
+        cache_manager.close_db()
+        self._tmp.cleanup()
+
+    def _write(self, name: str, source: str) -> str:
+        path = os.path.join(self._tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        return path
+
+    def test_new_content_is_not_stored_under_old_hash(self) -> None:
+        path = self._write("edited.py", _OLD_SOURCE)
+        original = parse_cache._content_hash
+
+        def _hash_then_save(abs_path: str) -> str | None:
+            # ハッシュを計算した直後にエディタが保存し直した状況を再現する
+            content_hash = original(abs_path)
+            self._write("edited.py", _NEW_SOURCE)
+            return content_hash
+
+        with mock.patch.object(parse_cache, "_content_hash", _hash_then_save):
+            chunks = parse_cache.get_chunks(path)
+        self.assertEqual([c["name"] for c in chunks], ["new_function"])
+
+        # 古い内容のファイルは、新しい内容の解析結果ではなく自身の内容のチャンクを返す
+        copy = self._write("copy.py", _OLD_SOURCE)
+        self.assertEqual([c["name"] for c in parse_cache.get_chunks(copy)], ["old_function"])
+        self.assertEqual([c["name"] for c in parse_cache.get_chunks(path)], ["new_function"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+LLMレスポンスキャッシュ: 呼び出し元が採用しなかった応答を保存しないことの確認
+
+実行: python -m unittest discover -s tests
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ai_audit import cache_manager, llm_client, usecase_a
+
+
+class _FakeResponse:
+    def __init__(self, content: str) -> None:
+        self._content = content
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> dict:
+        return {"choices": [{"message": {"content": self._content}}]}
+
+
+class _FakeSession:
+    """post() のたびに用意した応答を順に返し、呼び出し回数を数える。"""
+
+    def __init__(self, contents: list[str]) -> None:
+        self._contents = list(contents)
+        self.calls = 0
+
+    def post(self, url, headers=None, json=None, timeout=None, stream=False):
+        self.calls += 1
+        return _FakeResponse(self._contents.pop(0))
+
+
+class CombinedResponseCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ, {
+            "AI_AUDIT_DATA_DIR": self._tmp.name,
+            "LLM_API_BASE_URL": "http://llm.invalid/v1",
+            "LLM_API_KEY": "test",
+            "LLM_MODEL_NAME": "test-model",
+            "LLM_RESPONSE_CACHE": "1",
+            "LLM_ADAPTIVE_CONCURRENCY": "0",
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        cache_manager.init_db()
+
+    def tearDown(self) -> None:
+        cache_manager.close_db()
+        self._tmp.cleanup()
+
+    def _audit(self, session: _FakeSession) -> dict:
+        chunk = {"chunk_id": "/tmp/example.py:f", "name": "f", "type": "function", "code": "def f():\n    pass\n"}
+        with mock.patch.object(llm_client, "_get_session", return_value=session):
+            return usecase_a._audit_chunks([chunk], ("security", "readability"))
+
+    def test_missing_wear_is_not_cached(self) -> None:
+        partial = json.dumps({"security": {"issues": []}})
+        complete = json.dumps({"security": {"issues": []}, "readability": {"issues": []}})
+        session = _FakeSession([partial, complete])
+
+        first = self._audit(session)
+        self.assertNotIn("readability", first["/tmp/example.py:f"])
+        self.assertEqual(session.calls, 1)
+
+        # 1回目の応答はキャッシュされていないため、2回目は LLM に送り直す
+        second = self._audit(session)
+        self.assertIn("readability", second["/tmp/example.py:f"])
+        self.assertEqual(session.calls, 2)
+
+        # 全ウェアがそろった応答はキャッシュされ、3回目は LLM に送らない
+        third = self._audit(session)
+        self.assertEqual(third, second)
+        self.assertEqual(session.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
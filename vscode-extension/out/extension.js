@@ -66,9 +66,16 @@ const SUPPORTED_LANGUAGES = [
 // グローバル状態
 // ---------------------------------------------------------------------------
 let diagnosticCollection;
-const runningAudits = new Set();
 let statusBarItem;
 let extensionPath;
+// 常駐サーバー（監査）用
+let auditServer;
+// ファイルごとの依頼中の件数
+const pendingAudits = new Map();
+// ファイルごとに audit/issue 通知で届いた指摘（chunk_id → 指摘リスト）
+const streamedIssues = new Map();
+// ファイルごとに最後に受け取った監査結果
+const lastAuditResults = new Map();
 // 設計思想 CodeLens + TreeView 用
 let whyLensProvider;
 let whyTreeProvider;
@@ -347,9 +354,14 @@ function activate(context) {
         if (e.affectsConfiguration("aiAudit.showWhyLens")) {
             whyLensProvider?.refresh();
         }
+        // 接続設定は起動時に環境変数で渡しているため、次の監査で新しい設定のサーバーを起動し直す
+        if (["apiBaseUrl", "apiKey", "modelName", "maxOutputTokens"].some((key) => e.affectsConfiguration(`aiAudit.${key}`))) {
+            stopAuditServer();
+        }
     }));
 }
 function deactivate() {
+    stopAuditServer();
     diagnosticCollection.clear();
 }
 // ---------------------------------------------------------------------------
@@ -515,10 +527,6 @@ function resolveBackendBinary() {
 // 監査実行
 // ---------------------------------------------------------------------------
 function runAudit(filePath, force) {
-    if (runningAudits.has(filePath)) {
-        return;
-    }
-    runningAudits.add(filePath);
     const cfg = vscode.workspace.getConfiguration("aiAudit");
     const apiUrl = cfg.get("apiBaseUrl", "").trim();
     const apiKey = cfg.get("apiKey", "").trim();
@@ -534,7 +542,6 @@ function runAudit(filePath, force) {
     }
     if (missing.length > 0) {
         vscode.window.showErrorMessage(`ai_audit: 設定が不足しています。コマンドパレットから "ai_audit: 接続設定を開く" を実行して設定してください。\n未入力: ${missing.join(", ")}`);
-        runningAudits.delete(filePath);
         return;
     }
     // 拡張機能に同梱されたバイナリのパスを解決
@@ -542,13 +549,8 @@ function runAudit(filePath, force) {
     if (!binaryPath || !fs.existsSync(binaryPath)) {
         vscode.window.showErrorMessage(`ai_audit: バイナリが見つかりません（${binaryPath}）。\n` +
             `お使いのOSに対応した VSIX を再インストールしてください。`);
-        runningAudits.delete(filePath);
         return;
     }
-    const args = ["audit", filePath];
-    if (force) {
-        args.push("--force");
-    }
     // VSCode 設定を環境変数として渡す（.env が不要になる）
     const env = {
         ...process.env,
@@ -563,41 +565,150 @@ function runAudit(filePath, force) {
     if (maxTokens !== null && maxTokens !== undefined) {
         env["LLM_MAX_OUTPUT_TOKENS"] = String(maxTokens);
     }
+    const server = getAuditServer(binaryPath, env);
     const shortName = path.basename(filePath);
     statusBarItem.text = `$(sync~spin) ai_audit: ${shortName} を監査中...`;
-    const proc = cp.spawn(binaryPath, args, {
+    pendingAudits.set(filePath, (pendingAudits.get(filePath) ?? 0) + 1);
+    // 保存の連打はサーバー側で1回の監査にまとめられ、まとめられた依頼にはすべて最新の結果が返る
+    // stream: 指摘が確定するごとに audit/issue 通知が届く（onStreamedIssue で途中経過を表示する）
+    callAuditServer(server, "audit", { path: filePath, force, stream: true }).then((auditResult) => {
+        const remaining = finishPendingAudit(filePath);
+        lastAuditResults.set(filePath, auditResult);
+        if (remaining === 0) {
+            streamedIssues.delete(filePath);
+        }
+        applyDiagnostics(filePath, auditResult);
+        const total = auditResult.total_issues ?? 0;
+        statusBarItem.text = total > 0
+            ? `$(warning) ai_audit: ${total} 件の指摘`
+            : "$(pass) ai_audit: 問題なし";
+    }, (err) => {
+        // まとめられた依頼には同じエラーが返るため、最後の1件だけ表示する
+        if (finishPendingAudit(filePath) > 0) {
+            return;
+        }
+        streamedIssues.delete(filePath);
+        statusBarItem.text = "$(shield) ai_audit";
+        vscode.window.showErrorMessage(`ai_audit エラー: ${err.message.slice(0, 300)}`);
+    });
+}
+/** 依頼中の件数を1減らし、そのファイルの残りの件数を返す。 */
+function finishPendingAudit(filePath) {
+    const remaining = (pendingAudits.get(filePath) ?? 1) - 1;
+    if (remaining > 0) {
+        pendingAudits.set(filePath, remaining);
+    }
+    else {
+        pendingAudits.delete(filePath);
+    }
+    return remaining;
+}
+/**
+ * audit/issue 通知で届いた指摘を、結果のレスポンスを待たずに波線に反映する。
+ * 指摘が届いたチャンクは届いた指摘で置き換え、まだ届いていないチャンクは前回の結果を表示しておく
+ * （最終的な結果はレスポンスで置き換える）。
+ */
+function onStreamedIssue(filePath, chunkId, issue) {
+    if (!pendingAudits.has(filePath)) {
+        return;
+    }
+    let byChunk = streamedIssues.get(filePath);
+    if (!byChunk) {
+        byChunk = new Map();
+        streamedIssues.set(filePath, byChunk);
+    }
+    byChunk.set(chunkId, [...(byChunk.get(chunkId) ?? []), issue]);
+    const streamed = byChunk;
+    const chunks = (lastAuditResults.get(filePath)?.chunks ?? []).filter((c) => !streamed.has(c.chunk_id));
+    for (const [chunk_id, issues] of streamed) {
+        chunks.push({ chunk_id, issues });
+    }
+    applyDiagnostics(filePath, { chunks });
+}
+/** 起動済みのサーバーを返す（未起動、または終了していた場合は起動する）。 */
+function getAuditServer(binaryPath, env) {
+    if (auditServer) {
+        return auditServer;
+    }
+    const proc = cp.spawn(binaryPath, ["serve"], {
         cwd: path.dirname(binaryPath),
         env,
     });
-    const stderrChunks = [];
-    proc.stderr.on("data", (data) => { stderrChunks.push(data); });
-    proc.on("close", (code) => {
-        runningAudits.delete(filePath);
-        statusBarItem.text = "$(shield) ai_audit";
-        if (code !== 0) {
-            const stderr = decodeBuffer(stderrChunks);
-            vscode.window.showErrorMessage(`ai_audit エラー: ${stderr.slice(0, 300)}`);
-            return;
-        }
-        const auditJsonPath = filePath.replace(/\.py$/, "_audit.json");
-        if (!fs.existsSync(auditJsonPath)) {
-            diagnosticCollection.set(vscode.Uri.file(filePath), []);
-            return;
+    const server = { proc, nextId: 1, pending: new Map(), stderrTail: "" };
+    auditServer = server;
+    let buffered = "";
+    proc.stdout.setEncoding("utf-8");
+    proc.stdout.on("data", (data) => {
+        buffered += data;
+        let newline;
+        while ((newline = buffered.indexOf("\n")) >= 0) {
+            const line = buffered.slice(0, newline).trim();
+            buffered = buffered.slice(newline + 1);
+            if (line) {
+                handleServerMessage(server, line);
+            }
         }
-        try {
-            const raw = fs.readFileSync(auditJsonPath, "utf-8");
-            const auditResult = JSON.parse(raw);
-            applyDiagnostics(filePath, auditResult);
-            const total = auditResult.total_issues ?? 0;
-            statusBarItem.text = total > 0
-                ? `$(warning) ai_audit: ${total} 件の指摘`
-                : "$(pass) ai_audit: 問題なし";
+    });
+    // 標準エラー出力はサーバーのログ。パイプが詰まらないよう読み続け、異常終了時の表示用に末尾だけ残す
+    proc.stderr.on("data", (data) => {
+        server.stderrTail = (server.stderrTail + decodeBuffer([data])).slice(-2000);
+    });
+    proc.stdin.on("error", () => { });
+    const onClose = (message) => {
+        if (auditServer === server) {
+            auditServer = undefined;
         }
-        catch (e) {
-            vscode.window.showErrorMessage(`ai_audit: 結果の読み込みに失敗しました: ${e}`);
+        for (const { reject } of server.pending.values()) {
+            reject(new Error(message));
         }
+        server.pending.clear();
+    };
+    proc.on("error", (err) => onClose(`起動エラー: ${err.message}`));
+    proc.on("close", (code) => onClose(`サーバーが終了しました（終了コード ${code}）: ${server.stderrTail.slice(-300)}`));
+    return server;
+}
+/** サーバーにリクエストを送り、レスポンスの result で解決する Promise を返す。 */
+function callAuditServer(server, method, params) {
+    const id = server.nextId++;
+    return new Promise((resolve, reject) => {
+        server.pending.set(id, { resolve, reject });
+        server.proc.stdin.write(JSON.stringify({ jsonrpc: "2.0", id, method, params }) + "\n");
     });
 }
+function handleServerMessage(server, line) {
+    let message;
+    try {
+        message = JSON.parse(line);
+    }
+    catch {
+        return;
+    }
+    if (message.method === "audit/issue") {
+        const params = message.params ?? {};
+        onStreamedIssue(params.path, params.chunk_id, params.issue);
+        return;
+    }
+    const request = server.pending.get(message.id);
+    if (!request) {
+        return;
+    }
+    server.pending.delete(message.id);
+    if (message.error) {
+        request.reject(new Error(message.error.message));
+    }
+    else {
+        request.resolve(message.result);
+    }
+}
+/** サーバーを終了させる（受け付け済みの監査の結果を返してから終了する）。 */
+function stopAuditServer() {
+    const server = auditServer;
+    if (!server) {
+        return;
+    }
+    auditServer = undefined;
+    server.proc.stdin.end(JSON.stringify({ jsonrpc: "2.0", method: "shutdown" }) + "\n");
+}
 // ---------------------------------------------------------------------------
 // フォルダ一括監査
 // ---------------------------------------------------------------------------
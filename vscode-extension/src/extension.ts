@@ -37,10 +37,18 @@ const SUPPORTED_LANGUAGES: Array<{
 // グローバル状態
 // ---------------------------------------------------------------------------
 let diagnosticCollection: vscode.DiagnosticCollection;
-const runningAudits = new Set<string>();
 let statusBarItem: vscode.StatusBarItem;
 let extensionPath: string;
 
+// 常駐サーバー（監査）用
+let auditServer: AuditServer | undefined;
+// ファイルごとの依頼中の件数
+const pendingAudits = new Map<string, number>();
+// ファイルごとに audit/issue 通知で届いた指摘（chunk_id → 指摘リスト）
+const streamedIssues = new Map<string, Map<string, AuditIssue[]>>();
+// ファイルごとに最後に受け取った監査結果
+const lastAuditResults = new Map<string, AuditResult>();
+
 // 設計思想 CodeLens + TreeView 用
 let whyLensProvider: AiAuditWhyLensProvider | undefined;
 let whyTreeProvider: AiAuditWhyTreeProvider | undefined;
@@ -432,11 +440,18 @@ export function activate(context: vscode.ExtensionContext) {
       if (e.affectsConfiguration("aiAudit.showWhyLens")) {
         whyLensProvider?.refresh();
       }
+      // 接続設定は起動時に環境変数で渡しているため、次の監査で新しい設定のサーバーを起動し直す
+      if (["apiBaseUrl", "apiKey", "modelName", "maxOutputTokens"].some(
+        (key) => e.affectsConfiguration(`aiAudit.${key}`)
+      )) {
+        stopAuditServer();
+      }
     })
   );
 }
 
 export function deactivate() {
+  stopAuditServer();
   diagnosticCollection.clear();
 }
 
@@ -634,9 +649,6 @@ function resolveBackendBinary(): string | null {
 // 監査実行
 // ---------------------------------------------------------------------------
 function runAudit(filePath: string, force: boolean): void {
-  if (runningAudits.has(filePath)) { return; }
-  runningAudits.add(filePath);
-
   const cfg          = vscode.workspace.getConfiguration("aiAudit");
   const apiUrl       = cfg.get<string>("apiBaseUrl", "").trim();
   const apiKey       = cfg.get<string>("apiKey", "").trim();
@@ -651,7 +663,6 @@ function runAudit(filePath: string, force: boolean): void {
     vscode.window.showErrorMessage(
       `ai_audit: 設定が不足しています。コマンドパレットから "ai_audit: 接続設定を開く" を実行して設定してください。\n未入力: ${missing.join(", ")}`
     );
-    runningAudits.delete(filePath);
     return;
   }
 
@@ -663,13 +674,9 @@ function runAudit(filePath: string, force: boolean): void {
       `ai_audit: バイナリが見つかりません（${binaryPath}）。\n` +
       `お使いのOSに対応した VSIX を再インストールしてください。`
     );
-    runningAudits.delete(filePath);
     return;
   }
 
-  const args = ["audit", filePath];
-  if (force) { args.push("--force"); }
-
   // VSCode 設定を環境変数として渡す（.env が不要になる）
   const env: NodeJS.ProcessEnv = {
     ...process.env,
@@ -683,48 +690,163 @@ function runAudit(filePath: string, force: boolean): void {
     env["LLM_MAX_OUTPUT_TOKENS"] = String(maxTokens);
   }
 
+  const server = getAuditServer(binaryPath, env);
+
   const shortName = path.basename(filePath);
   statusBarItem.text = `$(sync~spin) ai_audit: ${shortName} を監査中...`;
+  pendingAudits.set(filePath, (pendingAudits.get(filePath) ?? 0) + 1);
+
+  // 保存の連打はサーバー側で1回の監査にまとめられ、まとめられた依頼にはすべて最新の結果が返る
+  // stream: 指摘が確定するごとに audit/issue 通知が届く（onStreamedIssue で途中経過を表示する）
+  callAuditServer(server, "audit", { path: filePath, force, stream: true }).then(
+    (auditResult: AuditResult) => {
+      const remaining = finishPendingAudit(filePath);
+      lastAuditResults.set(filePath, auditResult);
+      if (remaining === 0) { streamedIssues.delete(filePath); }
+      applyDiagnostics(filePath, auditResult);
 
-  const proc = cp.spawn(binaryPath, args, {
+      const total = auditResult.total_issues ?? 0;
+      statusBarItem.text = total > 0
+        ? `$(warning) ai_audit: ${total} 件の指摘`
+        : "$(pass) ai_audit: 問題なし";
+    },
+    (err: Error) => {
+      // まとめられた依頼には同じエラーが返るため、最後の1件だけ表示する
+      if (finishPendingAudit(filePath) > 0) { return; }
+      streamedIssues.delete(filePath);
+      statusBarItem.text = "$(shield) ai_audit";
+      vscode.window.showErrorMessage(`ai_audit エラー: ${err.message.slice(0, 300)}`);
+    }
+  );
+}
+
+/** 依頼中の件数を1減らし、そのファイルの残りの件数を返す。 */
+function finishPendingAudit(filePath: string): number {
+  const remaining = (pendingAudits.get(filePath) ?? 1) - 1;
+  if (remaining > 0) {
+    pendingAudits.set(filePath, remaining);
+  } else {
+    pendingAudits.delete(filePath);
+  }
+  return remaining;
+}
+
+/**
+ * audit/issue 通知で届いた指摘を、結果のレスポンスを待たずに波線に反映する。
+ * 指摘が届いたチャンクは届いた指摘で置き換え、まだ届いていないチャンクは前回の結果を表示しておく
+ * （最終的な結果はレスポンスで置き換える）。
+ */
+function onStreamedIssue(filePath: string, chunkId: string, issue: AuditIssue): void {
+  if (!pendingAudits.has(filePath)) { return; }
+  let byChunk = streamedIssues.get(filePath);
+  if (!byChunk) {
+    byChunk = new Map();
+    streamedIssues.set(filePath, byChunk);
+  }
+  byChunk.set(chunkId, [...(byChunk.get(chunkId) ?? []), issue]);
+
+  const streamed = byChunk;
+  const chunks = (lastAuditResults.get(filePath)?.chunks ?? []).filter((c) => !streamed.has(c.chunk_id));
+  for (const [chunk_id, issues] of streamed) {
+    chunks.push({ chunk_id, issues });
+  }
+  applyDiagnostics(filePath, { chunks });
+}
+
+// ---------------------------------------------------------------------------
+// 常駐サーバー（main serve）
+// ---------------------------------------------------------------------------
+// 保存のたびに main を起動し直さず、1つの serve プロセスに監査を依頼する
+// （パーサー・DB 接続・HTTP 接続プール・前回の解析結果がプロセス内に残り、2回目以降はすぐに始まる）。
+// プロトコルは標準入出力で1行に1つの JSON-RPC 2.0 メッセージ（ai_audit/server.py 参照）。
+type AuditServer = {
+  proc: cp.ChildProcess;
+  nextId: number;
+  pending: Map<number, { resolve: (result: any) => void; reject: (err: Error) => void }>;
+  stderrTail: string;
+};
+
+/** 起動済みのサーバーを返す（未起動、または終了していた場合は起動する）。 */
+function getAuditServer(binaryPath: string, env: NodeJS.ProcessEnv): AuditServer {
+  if (auditServer) { return auditServer; }
+
+  const proc = cp.spawn(binaryPath, ["serve"], {
     cwd: path.dirname(binaryPath),
     env,
   });
+  const server: AuditServer = { proc, nextId: 1, pending: new Map(), stderrTail: "" };
+  auditServer = server;
+
+  let buffered = "";
+  proc.stdout!.setEncoding("utf-8");
+  proc.stdout!.on("data", (data: string) => {
+    buffered += data;
+    let newline: number;
+    while ((newline = buffered.indexOf("\n")) >= 0) {
+      const line = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      if (line) { handleServerMessage(server, line); }
+    }
+  });
+  // 標準エラー出力はサーバーのログ。パイプが詰まらないよう読み続け、異常終了時の表示用に末尾だけ残す
+  proc.stderr!.on("data", (data: Buffer) => {
+    server.stderrTail = (server.stderrTail + decodeBuffer([data])).slice(-2000);
+  });
+  proc.stdin!.on("error", () => { /* 終了済みのサーバーへの書き込み。close で処理する */ });
 
-  const stderrChunks: Buffer[] = [];
-  proc.stderr.on("data", (data: Buffer) => { stderrChunks.push(data); });
+  const onClose = (message: string) => {
+    if (auditServer === server) { auditServer = undefined; }
+    for (const { reject } of server.pending.values()) {
+      reject(new Error(message));
+    }
+    server.pending.clear();
+  };
+  proc.on("error", (err) => onClose(`起動エラー: ${err.message}`));
+  proc.on("close", (code) => onClose(
+    `サーバーが終了しました（終了コード ${code}）: ${server.stderrTail.slice(-300)}`
+  ));
+  return server;
+}
 
-  proc.on("close", (code) => {
-    runningAudits.delete(filePath);
-    statusBarItem.text = "$(shield) ai_audit";
+/** サーバーにリクエストを送り、レスポンスの result で解決する Promise を返す。 */
+function callAuditServer(server: AuditServer, method: string, params: object): Promise<any> {
+  const id = server.nextId++;
+  return new Promise((resolve, reject) => {
+    server.pending.set(id, { resolve, reject });
+    server.proc.stdin!.write(JSON.stringify({ jsonrpc: "2.0", id, method, params }) + "\n");
+  });
+}
 
-    if (code !== 0) {
-      const stderr = decodeBuffer(stderrChunks);
-      vscode.window.showErrorMessage(
-        `ai_audit エラー: ${stderr.slice(0, 300)}`
-      );
-      return;
-    }
+function handleServerMessage(server: AuditServer, line: string): void {
+  let message: any;
+  try {
+    message = JSON.parse(line);
+  } catch {
+    return;
+  }
 
-    const auditJsonPath = filePath.replace(/\.py$/, "_audit.json");
-    if (!fs.existsSync(auditJsonPath)) {
-      diagnosticCollection.set(vscode.Uri.file(filePath), []);
-      return;
-    }
+  if (message.method === "audit/issue") {
+    const params = message.params ?? {};
+    onStreamedIssue(params.path, params.chunk_id, params.issue);
+    return;
+  }
 
-    try {
-      const raw = fs.readFileSync(auditJsonPath, "utf-8");
-      const auditResult = JSON.parse(raw);
-      applyDiagnostics(filePath, auditResult);
+  const request = server.pending.get(message.id);
+  if (!request) { return; }
+  server.pending.delete(message.id);
+  if (message.error) {
+    request.reject(new Error(message.error.message));
+  } else {
+    request.resolve(message.result);
+  }
+}
 
-      const total = auditResult.total_issues ?? 0;
-      statusBarItem.text = total > 0
-        ? `$(warning) ai_audit: ${total} 件の指摘`
-        : "$(pass) ai_audit: 問題なし";
-    } catch (e) {
-      vscode.window.showErrorMessage(`ai_audit: 結果の読み込みに失敗しました: ${e}`);
-    }
-  });
+/** サーバーを終了させる（受け付け済みの監査の結果を返してから終了する）。 */
+function stopAuditServer(): void {
+  const server = auditServer;
+  if (!server) { return; }
+  auditServer = undefined;
+  server.proc.stdin!.end(JSON.stringify({ jsonrpc: "2.0", method: "shutdown" }) + "\n");
 }
 
 // ---------------------------------------------------------------------------
@@ -834,18 +956,20 @@ function severityToDiagnosticSeverity(severity: string): vscode.DiagnosticSeveri
   }
 }
 
-function applyDiagnostics(filePath: string, auditResult: {
-  chunks: Array<{
-    chunk_id: string;
-    issues: Array<{
-      type: string;
-      severity: string;
-      line_number_offset: number | null;
-      description: string;
-      suggestion: string;
-    }>;
-  }>;
-}): void {
+type AuditIssue = {
+  type: string;
+  severity: string;
+  line_number_offset: number | null;
+  description: string;
+  suggestion: string;
+};
+
+type AuditResult = {
+  chunks: Array<{ chunk_id: string; issues: AuditIssue[] }>;
+  total_issues?: number;
+};
+
+function applyDiagnostics(filePath: string, auditResult: AuditResult): void {
   const cfg = vscode.workspace.getConfiguration("aiAudit");
   // 監査波線表示が OFF の場合は何もしない
   if (!cfg.get<boolean>("showAuditDiagnostics", true)) {